@@ -0,0 +1,235 @@
+"""Read-only HTTP/JSON API over jobs and their WBS lines.
+
+For scripts such as the Salesforce sync and reports, which would otherwise
+open job_master.db directly or scrape the app:
+
+    GET /jobs?branch=0508&fields=job_number,job_name&limit=100
+    GET /jobs/<job number>
+    GET /jobs/<job number>/wbs?service_line=Coatings&fields=id,qty&limit=500
+
+Lists come back as ``{"data": [...], "next": "<URL of the next page>"}``, with
+``next`` null on the last page. Pages are keyset-paginated (``after`` is the
+last job number or wbs.id of the previous page), so a deep page costs the same
+as the first. ``fields`` picks the columns to return. WBS lines filter on the
+same columns as View Data: service_line, wbs_task, contract_vs_co, fpa_type
+and fpa_subtype.
+
+Every response carries an ETag made from the database write generation, which
+changes whenever jobs or wbs do. A client that sends it back in If-None-Match
+gets an empty 304 until something changes. The request is still checked
+first (an unknown path or job is a 404 either way), but the page query is
+skipped, so a 304 costs the generation read plus, for a job, one primary-key
+read.
+
+    python api.py                    # http://127.0.0.1:8502
+    python api.py --host 0.0.0.0 --port 9000 --db /data/job_master.db
+"""
+import argparse
+import json
+import sys
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlencode, urlsplit
+
+import database
+import jobs
+import wbs
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8502
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+class ApiError(Exception):
+    """An error reported to the client as ``{"error": message}`` with a status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _etag(generation):
+    return f'"g{generation}"'
+
+
+def _matches(header, etag):
+    """Whether an If-None-Match header lists this ETag (weak or strong) or is *."""
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def _param(query, name, default=None):
+    values = query.get(name)
+    return values[-1] if values else default
+
+
+def _limit(query):
+    text = _param(query, "limit", str(DEFAULT_LIMIT))
+    if not text.isdigit() or not 1 <= int(text) <= MAX_LIMIT:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"limit must be a whole number from 1 to {MAX_LIMIT}")
+    return int(text)
+
+
+def _fields(query, allowed):
+    text = _param(query, "fields")
+    return [name.strip() for name in text.split(",") if name.strip()] if text else list(allowed)
+
+
+def _check_params(query, allowed):
+    unknown = set(query) - set(allowed)
+    if unknown:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"Unknown parameter(s): {', '.join(sorted(unknown))}")
+
+
+def _page(conn, sql, params, fields, key, limit, path, query):
+    """Run a keyset page query built for limit + 1 rows; returns the response body.
+
+    The extra row only tells whether there is a next page. The key column is
+    always selected, so the next link can be built when the client leaves it
+    out of ``fields``.
+    """
+    rows = conn.execute(sql, params).fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    columns = fields if key in fields else [key] + fields
+    data = [dict(zip(columns, row)) for row in rows]
+    next_url = None
+    if more:
+        next_query = {**query, "after": [str(data[-1][key])]}
+        next_url = f"{path}?{urlencode(next_query, doseq=True)}"
+    if key not in fields:
+        for item in data:
+            del item[key]
+    return {"data": data, "next": next_url}
+
+
+def list_jobs(conn, query, path):
+    """Validate a job list request; returns a function that reads the page."""
+    _check_params(query, ["after", "limit", "fields", "branch"])
+    fields = _fields(query, jobs.FIELDS)
+    limit = _limit(query)
+    sql, params = jobs.page_query(_param(query, "after", ""), limit + 1, _param(query, "branch"),
+                                  fields if "job_number" in fields else ["job_number"] + fields)
+    return lambda: _page(conn, sql, params, fields, "job_number", limit, path, query)
+
+
+def get_job(conn, job_number):
+    row = jobs.get_job(conn, job_number)
+    if row is None:
+        raise ApiError(HTTPStatus.NOT_FOUND, f"No job {job_number!r}")
+    return dict(zip(jobs.FIELDS, row))
+
+
+def list_wbs(conn, job_number, query, path):
+    """Validate a WBS list request and its job; returns a function that reads the page."""
+    _check_params(query, ["after", "limit", "fields", *wbs.FACETS])
+    get_job(conn, job_number)
+    fields = _fields(query, wbs.FIELDS)
+    limit = _limit(query)
+    after = _param(query, "after", "0")
+    if not after.isdigit():
+        raise ApiError(HTTPStatus.BAD_REQUEST, "after must be a WBS line id")
+    filters = {column: _param(query, column) for column in wbs.FACETS if column in query}
+    sql, params = wbs.page_query(job_number, filters, int(after), limit + 1,
+                                 fields if "id" in fields else ["id"] + fields)
+    return lambda: _page(conn, sql, params, fields, "id", limit, path, query)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "ProjectTrackerAPI/1.0"
+    # Headers and body are written separately; with Nagle's algorithm the
+    # body waits for the client's delayed ACK, adding ~40 ms per request.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        try:
+            with self.server.pool.connection() as conn:
+                # Read before the query, as cache.read does: the body is never
+                # older than the generation it is tagged with.
+                etag = _etag(database.data_generation(conn))
+                # Unknown paths, bad parameters and missing jobs are errors
+                # whatever the client has cached, so resolve before comparing.
+                fetch = self._route(conn, parts, query, url.path)
+                if _matches(self.headers.get("If-None-Match", ""), etag):
+                    self._send(HTTPStatus.NOT_MODIFIED, None, etag)
+                    return
+                body = fetch()
+        except ApiError as e:
+            self._send(e.status, {"error": str(e)})
+        except ValueError as e:
+            self._send(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+        else:
+            self._send(HTTPStatus.OK, body, etag)
+
+    def _route(self, conn, parts, query, path):
+        """Resolve a request; returns a function that reads the response body.
+
+        Raises ApiError (or ValueError) for anything that is not a valid
+        request for an existing resource. Page queries run only when called,
+        so a 304 skips them.
+        """
+        if parts == ["jobs"]:
+            return list_jobs(conn, query, path)
+        if len(parts) == 2 and parts[0] == "jobs":
+            _check_params(query, [])
+            job = get_job(conn, parts[1])
+            return lambda: job
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "wbs":
+            return list_wbs(conn, parts[1], query, f"/jobs/{quote(parts[1])}/wbs")
+        raise ApiError(HTTPStatus.NOT_FOUND, f"No such resource: {path}")
+
+    def _send(self, status, body, etag=None):
+        payload = b"" if body is None else json.dumps(body, separators=(",", ":")).encode()
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        if body is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class ApiServer(ThreadingHTTPServer):
+    """Serves each request on its own thread, reading through a connection pool."""
+
+    def __init__(self, address, db_path=database.DB_PATH, pool_size=database.POOL_SIZE, quiet=False):
+        self.pool = database.ConnectionPool(db_path, pool_size)
+        with self.pool.connection() as conn:
+            database.migrate(conn)
+        self.quiet = quiet
+        super().__init__(address, Handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve jobs and WBS lines as read-only JSON.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db", default=database.DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--pool-size", type=int, default=database.POOL_SIZE, help="pooled connections")
+    parser.add_argument("--quiet", action="store_true", help="do not log each request")
+    args = parser.parse_args()
+
+    server = ApiServer((args.host, args.port), args.db, args.pool_size, args.quiet)
+    print(f"Serving {args.db} on http://{args.host}:{server.server_port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,331 @@
+"""Cold storage for closed jobs.
+
+A job is open while work is budgeted against it and closed once it is done
+(jobs.set_status, or Job Info). Archiving moves every closed job, with its WBS
+lines and revision history, out of job_master.db into an archive file beside
+it, one per year: ``job_master.db-archive/2026.db``. Page queries, the
+summary, the snapshot, reconciliation and the API then only ever read the jobs
+still in use, however many years of finished work pile up.
+
+``archived_jobs`` in the main database lists each archived job and the file
+holding it, with its own full-text index, so the job picker can still find
+it. An archive file has the main database's wbs, lookup, revision and jobs
+tables and the wbs_lines view: once attached with attach(), the wbs functions
+read it when given the returned schema name. Files are attached read-only,
+and a pooled connection detaches them when it is returned.
+
+Archiving copies first and deletes second, in separate transactions, because
+commits across attached WAL databases are not atomic. A closed job's lines
+cannot change in between: the wbs_closed_* triggers and wbs.save_changes
+reject every write to them. The delete still checks each job is closed and
+unchanged since its copy (its wbs_changed_jobs stamp), so a job reopened and
+edited between the two is left in place and its copy removed; a crash
+between them leaves a copy that the next run replaces.
+
+    python archive.py --close 20725 20726    # mark jobs closed
+    python archive.py                        # archive every closed job
+    python archive.py --vacuum               # then give the freed pages back
+    python archive.py --list                 # archive files and what they hold
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from urllib.parse import quote
+
+import database
+import jobs
+
+# Jobs moved per delete transaction, so writers wait on the archive briefly.
+BATCH_SIZE = 200
+
+# Tables an archive file holds, copied from the main database's schema with
+# their indexes; plus the wbs_lines view the page queries read.
+LOOKUP_TABLES = ["service_lines", "units_of_measure", "contract_types", "fpa_types", "fpa_subtypes"]
+TABLES = ["jobs", "wbs", "wbs_revisions", "wbs_history", *LOOKUP_TABLES]
+SCHEMA_SQL = """
+    SELECT sql FROM main.sqlite_schema
+    WHERE tbl_name IN (SELECT value FROM json_each(?))
+        AND type IN ('table', 'index', 'view') AND sql IS NOT NULL
+    ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END
+"""
+ATTACHED_SQL = "SELECT name FROM pragma_database_list"
+COLUMNS_SQL = "SELECT name FROM pragma_table_info(?, ?)"
+
+CLOSED_SQL = "SELECT job_number FROM jobs WHERE status = 'closed' ORDER BY job_number"
+STAMPS_SQL = """
+    SELECT job_number, generation FROM wbs_changed_jobs
+    WHERE job_number IN (SELECT value FROM json_each(?))
+"""
+STILL_CLOSED_SQL = """
+    SELECT job_number FROM jobs
+    WHERE job_number IN (SELECT value FROM json_each(?)) AND status = 'closed'
+"""
+CATALOGUE_SQL = """
+    INSERT INTO archived_jobs (job_number, branch_number, job_name, salesforce_id, archive, archived, lines)
+    SELECT job_number, branch_number, job_name, salesforce_id, ?, ?,
+        (SELECT count(*) FROM wbs WHERE wbs.job_number = jobs.job_number)
+    FROM jobs
+    WHERE job_number IN (SELECT value FROM json_each(?))
+"""
+_IN_JOBS = "job_number IN (SELECT value FROM json_each(?))"
+# History first, so the wbs delete triggers no longer log the lines for a
+# next revision.
+DELETE_SQL = [
+    f"DELETE FROM {{schema}}wbs_history WHERE revision_id IN "
+    f"(SELECT id FROM {{schema}}wbs_revisions WHERE {_IN_JOBS})",
+    f"DELETE FROM {{schema}}wbs_revisions WHERE {_IN_JOBS}",
+    f"DELETE FROM {{schema}}wbs WHERE {_IN_JOBS}",
+    f"DELETE FROM {{schema}}jobs WHERE {_IN_JOBS}",
+]
+CLEAR_UNREVISED_SQL = f"DELETE FROM wbs_unrevised WHERE {_IN_JOBS}"
+COPY_LOOKUP_SQL = "INSERT OR IGNORE INTO {schema}.{table} (id, name) SELECT id, name FROM main.{table}"
+COPY_SQL = f"""
+    INSERT INTO {{schema}}.{{table}} ({{columns}})
+    SELECT {{columns}} FROM main.{{table}} WHERE {_IN_JOBS}
+"""
+# Revisions get new ids in the archive; history rows follow them by revision.
+COPY_HISTORY_SQL = f"""
+    INSERT INTO {{schema}}.wbs_history (revision_id, {{columns}})
+    SELECT a.id, {{selected}}
+    FROM main.wbs_revisions AS r
+    JOIN main.wbs_history AS h ON h.revision_id = r.id
+    JOIN {{schema}}.wbs_revisions AS a ON a.job_number = r.job_number AND a.revision = r.revision
+    WHERE r.{_IN_JOBS}
+"""
+
+ARCHIVE_OF_SQL = "SELECT archive, archived FROM archived_jobs WHERE job_number = ?"
+GET_SQL = """
+    SELECT job_number, branch_number, job_name, salesforce_id
+    FROM archived_jobs
+    WHERE job_number = ?
+"""
+FIRST_SQL = "SELECT job_number, job_name FROM archived_jobs ORDER BY job_number LIMIT ?"
+SEARCH_SQL = """
+    SELECT job_number, job_name
+    FROM archived_jobs_fts
+    WHERE archived_jobs_fts MATCH ?
+    ORDER BY rank
+    LIMIT ?
+"""
+BRANCHES_SQL = """
+    SELECT DISTINCT branch_number FROM archived_jobs
+    WHERE branch_number IS NOT NULL
+    ORDER BY branch_number
+"""
+FILES_SQL = """
+    SELECT archive, count(*), sum(lines), min(archived), max(archived)
+    FROM archived_jobs
+    GROUP BY archive
+    ORDER BY archive
+"""
+
+
+def archive_dir(conn):
+    """The directory holding the archive files of the connection's database."""
+    path = conn.execute("SELECT file FROM pragma_database_list WHERE name = 'main'").fetchone()[0]
+    return f"{path}-archive"
+
+
+def schema_name(archive):
+    """The schema an archive file is attached as, e.g. ``archive_2026``."""
+    return "archive_" + re.sub(r"\W", "_", os.path.splitext(archive)[0])
+
+
+def attach(conn, archive, readonly=True):
+    """Attach an archive file (if it is not already); returns its schema name."""
+    schema = schema_name(archive)
+    if schema not in {row[0] for row in conn.execute(ATTACHED_SQL)}:
+        path = os.path.join(archive_dir(conn), archive)
+        uri = f"file:{quote(path)}" + ("?mode=ro" if readonly else "")
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", (uri,))
+    return schema
+
+
+def detach(conn, archive):
+    conn.execute(f"DETACH DATABASE {schema_name(archive)}")
+
+
+@contextmanager
+def attached(conn, archive):
+    """Attach an archive file read-only for the enclosed reads: ``with attached(conn, name) as schema:``"""
+    was_attached = schema_name(archive) in {row[0] for row in conn.execute(ATTACHED_SQL)}
+    schema = attach(conn, archive)
+    try:
+        yield schema
+    finally:
+        if not was_attached:
+            conn.execute(f"DETACH DATABASE {schema}")
+
+
+def archive_of(conn, job_number):
+    """Return (archive file, archived time) for an archived job, or None."""
+    return conn.execute(ARCHIVE_OF_SQL, (job_number,)).fetchone()
+
+
+def get_job(conn, job_number):
+    """Return an archived job as (job_number, branch_number, job_name, salesforce_id), or None."""
+    return conn.execute(GET_SQL, (job_number,)).fetchone()
+
+
+def search_jobs(conn, text, limit=50, branch=None):
+    """Return up to ``limit`` archived (job_number, job_name) pairs; see jobs.search_jobs."""
+    expression = jobs.match_expression(text or "", branch)
+    if not expression:
+        return conn.execute(FIRST_SQL, (limit,)).fetchall()
+    return conn.execute(SEARCH_SQL, (expression, limit)).fetchall()
+
+
+def branches(conn):
+    return [row[0] for row in conn.execute(BRANCHES_SQL)]
+
+
+def files(conn):
+    """Return (archive, jobs, lines, first archived, last archived) for each archive file."""
+    return conn.execute(FILES_SQL).fetchall()
+
+
+def closed_jobs(conn):
+    return [row[0] for row in conn.execute(CLOSED_SQL)]
+
+
+def _create(conn, path):
+    """Create an archive file with the main database's archived tables, unless it exists."""
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    statements = [row[0] for row in conn.execute(SCHEMA_SQL, (json.dumps(TABLES + ["wbs_lines"]),))]
+    # Built under another name and renamed, so a half-made file is never attached.
+    partial = f"{path}.partial"
+    target = sqlite3.connect(partial, isolation_level=None)
+    try:
+        with database.transaction(target):
+            for statement in statements:
+                target.execute(statement)
+    finally:
+        target.close()
+    os.replace(partial, path)
+
+
+def _columns(conn, schema, table, exclude=()):
+    return [row[0] for row in conn.execute(COLUMNS_SQL, (table, schema)) if row[0] not in exclude]
+
+
+def _copy(conn, schema, job_numbers):
+    """Copy the jobs into an attached archive, replacing any copy already there."""
+    batch = json.dumps(job_numbers)
+    for table in LOOKUP_TABLES:
+        conn.execute(COPY_LOOKUP_SQL.format(schema=schema, table=table))
+    for sql in DELETE_SQL:
+        conn.execute(sql.format(schema=f"{schema}."), (batch,))
+    for table in ["jobs", "wbs"]:
+        columns = ", ".join(_columns(conn, schema, table))
+        conn.execute(COPY_SQL.format(schema=schema, table=table, columns=columns), (batch,))
+    columns = ", ".join(_columns(conn, schema, "wbs_revisions", exclude={"id"}))
+    conn.execute(COPY_SQL.format(schema=schema, table="wbs_revisions", columns=columns), (batch,))
+    columns = _columns(conn, schema, "wbs_history", exclude={"revision_id"})
+    conn.execute(COPY_HISTORY_SQL.format(schema=schema, columns=", ".join(columns),
+                                         selected=", ".join(f"h.{name}" for name in columns)), (batch,))
+
+
+def _stamps(conn, job_numbers):
+    return dict(conn.execute(STAMPS_SQL, (json.dumps(job_numbers),)).fetchall())
+
+
+def _archive_batch(conn, archive, job_numbers):
+    """Move a batch of closed jobs into an archive file; returns the job numbers moved."""
+    schema = attach(conn, archive, readonly=False)
+    try:
+        # 1. Copy, reading the main database from one snapshot. Every write to
+        # a job restamps it in wbs_changed_jobs, so the stamps read here tell
+        # step 2 whether the job changed after it was copied.
+        with database.transaction(conn, "DEFERRED"):
+            stamps = _stamps(conn, job_numbers)
+            _copy(conn, schema, job_numbers)
+
+        # 2. Catalogue and delete the jobs still as they were copied.
+        with database.transaction(conn):
+            closed = {row[0] for row in conn.execute(STILL_CLOSED_SQL, (json.dumps(job_numbers),))}
+            now = _stamps(conn, job_numbers)
+            moved = [job for job in job_numbers if job in closed and now.get(job) == stamps.get(job)]
+            batch = json.dumps(moved)
+            conn.execute(CATALOGUE_SQL, (archive, time.time(), batch))
+            for sql in DELETE_SQL:
+                conn.execute(sql.format(schema=""), (batch,))
+            conn.execute(CLEAR_UNREVISED_SQL, (batch,))
+
+        # 3. Drop the copies of the jobs left in place.
+        skipped = sorted(set(job_numbers) - set(moved))
+        if skipped:
+            with database.transaction(conn):
+                for sql in DELETE_SQL:
+                    conn.execute(sql.format(schema=f"{schema}."), (json.dumps(skipped),))
+    finally:
+        detach(conn, archive)
+    return moved
+
+
+def archive_closed(conn, progress=None):
+    """Move every closed job into this year's archive file; returns the number moved.
+
+    ``progress`` is called with (jobs done, jobs to archive) after each batch.
+    A job edited or reopened while it is being archived stays where it is.
+    """
+    job_numbers = closed_jobs(conn)
+    if not job_numbers:
+        return 0
+    archive = f"{time.strftime('%Y')}.db"
+    _create(conn, os.path.join(archive_dir(conn), archive))
+    moved = 0
+    for start in range(0, len(job_numbers), BATCH_SIZE):
+        moved += len(_archive_batch(conn, archive, job_numbers[start:start + BATCH_SIZE]))
+        if progress is not None:
+            progress(min(start + BATCH_SIZE, len(job_numbers)), len(job_numbers))
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive closed jobs out of the main database.")
+    parser.add_argument("--close", nargs="+", metavar="JOB", help="mark jobs closed instead of archiving")
+    parser.add_argument("--reopen", nargs="+", metavar="JOB", help="mark jobs open instead of archiving")
+    parser.add_argument("--list", action="store_true", help="list the archive files instead of archiving")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the database after archiving")
+    parser.add_argument("--db", default=database.DB_PATH, help="database file (default: %(default)s)")
+    args = parser.parse_args()
+
+    conn = database.connect(args.db)
+    database.migrate(conn)
+    if args.close or args.reopen:
+        status = "closed" if args.close else "open"
+        for job_number in args.close or args.reopen:
+            if not jobs.set_status(conn, job_number, status):
+                print(f"❌ No job {job_number}")
+                return 1
+        print(f"✅ Marked {len(args.close or args.reopen)} job(s) {status}")
+        return 0
+    if args.list:
+        rows = files(conn)
+        for archive, count, lines, first, last in rows:
+            print(f"{archive}  {count:>8,} jobs  {lines:>12,} lines  archived "
+                  f"{time.strftime('%Y-%m-%d', time.localtime(first))} to "
+                  f"{time.strftime('%Y-%m-%d', time.localtime(last))}")
+        if not rows:
+            print("No archived jobs.")
+        return 0
+
+    start = time.perf_counter()
+    closed = len(closed_jobs(conn))
+    moved = archive_closed(conn)
+    print(f"✅ Archived {moved:,} of {closed:,} closed job(s) in {time.perf_counter() - start:.1f}s")
+    if args.vacuum:
+        conn.execute("VACUUM")
+        print("✅ Vacuumed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Benchmark archiving closed jobs: page queries and full passes, before and after.
+
+For each amount of closed history, builds a portfolio of the same open jobs
+plus that many closed ones, times the queries a page issues for an open job
+and the passes that read every line (reconciliation, the rollup snapshot, an
+export count), archives the closed jobs and times them again. Before
+archiving, full passes grow with the history; after, every size reads the
+same hot set, so the times stay flat.
+
+    python benchmarks/bench_archive.py --open 500 --closed 0 1500 4500 --lines 100
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import archive  # noqa: E402
+import create_sample_db  # noqa: E402
+import database  # noqa: E402
+import export  # noqa: E402
+import jobs  # noqa: E402
+import reconcile  # noqa: E402
+import snapshot  # noqa: E402
+import summary  # noqa: E402
+import wbs  # noqa: E402
+
+OPEN_JOB = str(create_sample_db.FIRST_SYNTHETIC_JOB)
+
+
+def timed(fn, *args, repeat=5, **kwargs):
+    """Median seconds of fn(*args, **kwargs) over ``repeat`` runs."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args, **kwargs)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def measure(conn):
+    """{name: seconds} for the page queries and full passes."""
+    return {
+        "open a job (filtered lines)": timed(wbs.load_filtered, conn, OPEN_JOB, repeat=20),
+        "job facets": timed(wbs.facet_values, conn, OPEN_JOB, "wbs_task", repeat=20),
+        "job search": timed(jobs.search_jobs, conn, "scvwa fil", repeat=20),
+        "summary statistics": timed(summary.read_summary, conn, repeat=20),
+        "export count (all lines)": timed(export.count_rows, conn),
+        "reconciliation": timed(reconcile.run, conn, 1, repeat=3),
+        "snapshot rebuild": timed(snapshot.refresh, conn, rebuild=True, repeat=3),
+    }
+
+
+def file_mib(path):
+    return os.path.getsize(path) / 2**20
+
+
+def run(open_jobs, closed, lines):
+    """Build, measure, archive and measure again for one amount of history."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        conn = database.connect(path)
+        database.migrate(conn)
+        create_sample_db.generate(conn, open_jobs + closed, lines)
+        with database.transaction(conn):
+            conn.execute("UPDATE jobs SET status = 'closed' WHERE CAST(job_number AS INTEGER) >= ?",
+                         (create_sample_db.FIRST_SYNTHETIC_JOB + open_jobs,))
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        print(f"\n{open_jobs:,} open and {closed:,} closed jobs of {lines} lines")
+
+        before, size_before = measure(conn), file_mib(path)
+        start = time.perf_counter()
+        moved = archive.archive_closed(conn)
+        archive_s = time.perf_counter() - start
+        start = time.perf_counter()
+        conn.execute("VACUUM")
+        vacuum_s = time.perf_counter() - start
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        after, size_after = measure(conn), file_mib(path)
+
+        print(f"{'':<28} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+        for name in before:
+            print(f"{name:<28} {before[name] * 1000:>10.2f} {after[name] * 1000:>10.2f} "
+                  f"{before[name] / after[name]:>7.1f}x")
+        archives = sum(file_mib(os.path.join(archive.archive_dir(conn), name))
+                       for name, *_ in archive.files(conn))
+        print(f"\narchived {moved:,} jobs in {archive_s:.1f} s, VACUUM {vacuum_s:.1f} s")
+        print(f"job_master.db {size_before:.1f} MiB -> {size_after:.1f} MiB, archive files {archives:.1f} MiB")
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--open", type=int, default=500, help="open jobs")
+    parser.add_argument("--closed", type=int, nargs="+", default=[0, 1500, 4500],
+                        help="closed jobs to archive, one run per value")
+    parser.add_argument("--lines", type=int, default=100, help="WBS lines per job")
+    args = parser.parse_args()
+    for closed in args.closed:
+        run(args.open, closed, args.lines)
+
+
+if __name__ == "__main__":
+    main()
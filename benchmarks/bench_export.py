@@ -0,0 +1,81 @@
+"""Benchmark portfolio export throughput and peak memory.
+
+Each export runs in its own child process so its peak RSS (resident memory)
+can be read from the kernel with os.wait4. The old approach, which loads the
+whole result into a DataFrame and builds the CSV string in memory, is
+measured alongside the streaming CSV and Parquet exports.
+
+    python benchmarks/bench_export.py --jobs 2000 --lines 250
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import export  # noqa: E402
+import query_plans  # noqa: E402
+
+MODES = ("in-memory csv", "streaming csv", "streaming parquet")
+
+
+def run_child(mode, db_path, out_path, chunk_size):
+    conn = database.connect(db_path)
+    with open(out_path, "wb") as out:
+        if mode == "in-memory csv":
+            import pandas as pd
+            sql, params = export.export_query()
+            df = pd.DataFrame(conn.execute(sql, params).fetchall(), columns=export.LABELS)
+            out.write(df.to_csv(index=False).encode("utf-8"))
+            rows = len(df)
+        else:
+            fmt = mode.split()[-1]
+            rows = export.export(conn, out, fmt, chunk_size)
+    print(rows)
+
+
+def measure(mode, db_path, out_path, chunk_size):
+    """Run one export in a child process; return (rows, seconds, peak RSS in MiB)."""
+    start = time.perf_counter()
+    child = subprocess.Popen(
+        [sys.executable, __file__, "--child", mode, db_path, out_path, str(chunk_size)],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    )
+    output = child.stdout.read()
+    _, status, usage = os.wait4(child.pid, 0)
+    elapsed = time.perf_counter() - start
+    if status != 0:
+        raise RuntimeError(f"{mode} export failed with status {status}")
+    # ru_maxrss is in KiB on Linux.
+    return int(output.split()[-1]), elapsed, usage.ru_maxrss / 1024
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        mode, db_path, out_path, chunk_size = sys.argv[2:6]
+        run_child(mode, db_path, out_path, int(chunk_size))
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=250, help="WBS lines per job")
+    parser.add_argument("--chunk-size", type=int, default=export.DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        query_plans.build_database(db_path, args.jobs, args.lines).close()
+        print(f"{args.jobs * args.lines:,} WBS lines, chunk size {args.chunk_size:,}")
+        print(f"{'mode':<18} {'rows/s':>12} {'seconds':>9} {'peak RSS (MiB)':>15}")
+        for mode in MODES:
+            out_path = os.path.join(tmp, "export.out")
+            rows, seconds, rss = measure(mode, db_path, out_path, args.chunk_size)
+            print(f"{mode:<18} {rows / seconds:>12,.0f} {seconds:>9.2f} {rss:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
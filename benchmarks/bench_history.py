@@ -0,0 +1,144 @@
+"""Benchmark WBS revision history: storage, save overhead, rebuild and diff.
+
+Builds one job, then saves it many times through wbs.save_changes, each save
+touching 1% of the lines (half updated, a quarter deleted, a quarter added).
+Reports:
+
+- rows and bytes stored in wbs_history against keeping a full copy per save
+- the time history.record adds to each save
+- rebuild and diff times for revisions at increasing depth; these stay flat
+  because a rebuild reads one checkpoint and at most CHECKPOINT_INTERVAL - 1
+  deltas, however many revisions come before it
+
+    python benchmarks/bench_history.py --lines 5000 --revisions 300
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import history  # noqa: E402
+import wbs  # noqa: E402
+
+JOB = "H0001"
+TABLE_BYTES_SQL = """
+    SELECT sum(pgsize) FROM dbstat
+    WHERE name IN (SELECT name FROM sqlite_schema WHERE tbl_name = ?)
+"""
+
+
+def make_job(conn, lines):
+    rows = [
+        (JOB, f"Service {i % 7}", f"Task {i % 97}", f"Subtask {i}", float(i % 500),
+         "Linear Ft", "Contract" if i % 5 else "CO", "Services", "Labor",
+         1000.0 + i, float(i % 40), 500.0 + i)
+        for i in range(lines)
+    ]
+    with database.transaction(conn):
+        conn.executemany(wbs.INSERT_SQL, rows)
+
+
+def edit(df, revision):
+    """Touch 1% of the lines: update half, delete a quarter, add a quarter."""
+    n = max(len(df) // 100, 4)
+    start = (revision * n) % max(len(df) - n, 1)
+    edited = df.copy()
+    edited.loc[edited.index[start:start + n // 2], "Budgeted Cost"] += 1
+    edited = edited.drop(edited.index[-(n // 4):])
+    added = pd.DataFrame([{"id": None, "Service Line": "New", "WBS Task": f"Rev {revision}",
+                           "WBS Subtask": str(i), "QTY": 1.0} for i in range(n // 4)])
+    return pd.concat([edited, added], ignore_index=True)
+
+
+def table_bytes(conn, table):
+    """Bytes a table and its indexes take, or None without the dbstat table."""
+    try:
+        return conn.execute(TABLE_BYTES_SQL, (table,)).fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+
+
+def timed(fn, *args, repeat=5):
+    """Median seconds of fn(*args) over ``repeat`` runs, and its last result."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=5000, help="WBS lines in the job")
+    parser.add_argument("--revisions", type=int, default=300, help="saves to record")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = database.connect(os.path.join(tmp, "bench.db"))
+        database.migrate(conn)
+        make_job(conn, args.lines)
+
+        # Time the recording on its own by wrapping it for the run.
+        record, record_times, save_times = history.record, [], []
+
+        def timed_record(*a, **kw):
+            start = time.perf_counter()
+            try:
+                return record(*a, **kw)
+            finally:
+                record_times.append(time.perf_counter() - start)
+
+        history.record = timed_record
+        try:
+            for revision in range(1, args.revisions + 1):
+                original = wbs.load_job_wbs(conn, JOB)
+                changes = wbs.diff_wbs(original, edit(original, revision))
+                start = time.perf_counter()
+                wbs.save_changes(conn, JOB, changes)
+                save_times.append(time.perf_counter() - start)
+        finally:
+            history.record = record
+
+        revisions = history.revisions(conn, JOB)
+        stored = int(revisions["Rows Stored"].sum())
+        lines = conn.execute(wbs.COUNT_SQL, (JOB,)).fetchone()[0]
+        full = lines * len(revisions)
+        checkpoints = int(revisions["Checkpoint"].sum())
+        print(f"{lines:,} lines, {len(revisions)} revisions "
+              f"({checkpoints} checkpoints, interval {history.CHECKPOINT_INTERVAL})\n")
+
+        history_bytes, wbs_bytes = table_bytes(conn, "wbs_history"), table_bytes(conn, "wbs")
+        print(f"history rows stored  {stored:>12,}   full copy per save {full:>12,}   "
+              f"({stored / full:.1%})")
+        if history_bytes and wbs_bytes:
+            print(f"history size (MiB)   {history_bytes / 2**20:>12.1f}   full copy per save "
+                  f"{wbs_bytes * len(revisions) / 2**20:>12.1f}")
+        steady = sorted(save_times[1:])
+        print(f"\nsave p50 / p95 (ms)  {statistics.median(steady) * 1000:>7.1f} / "
+              f"{steady[int(len(steady) * 0.95)] * 1000:.1f}, of which history.record "
+              f"{statistics.median(record_times[1:]) * 1000:.1f} ms median\n")
+
+        print(f"{'revision':>9} {'deltas read':>12} {'rebuild ms':>11} {'diff vs prev ms':>16}")
+        depths = sorted({1, *(args.revisions * i // 8 for i in range(1, 9))} - {0})
+        for revision in depths:
+            checkpoint = conn.execute(history.CHECKPOINT_OF_SQL, (JOB, revision)).fetchone()[0]
+            rebuild_s, rebuilt = timed(history.rebuild, conn, JOB, revision)
+            diff_s = timed(history.diff, conn, JOB, max(revision - 1, 1), revision)[0]
+            print(f"{revision:>9} {revision - checkpoint:>12} {rebuild_s * 1000:>11.1f} {diff_s * 1000:>16.1f}")
+        assert len(rebuilt) == lines
+        diff_s, changed = timed(history.diff, conn, JOB, 1, args.revisions)
+        print(f"\ndiff revision 1 vs {args.revisions}: {diff_s * 1000:.1f} ms, {len(changed):,} lines differ")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Measure what the WBS lookup tables save in file size and DataFrame memory.
+
+A synthetic portfolio is written at schema version 8, where every WBS line
+stores its service line, unit, contract type and FPA type/subtype as text,
+then migrated to the lookup-table schema. Both files are VACUUMed before their
+size is read. Memory is the deep pandas memory_usage of every WBS line loaded
+with plain object columns versus the categorical columns the pages now use.
+
+    python benchmarks/bench_lookups.py --jobs 2000 --lines 250
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_sample_db  # noqa: E402
+import database  # noqa: E402
+import jobs  # noqa: E402
+import wbs  # noqa: E402
+
+TEXT_SCHEMA_VERSION = 8
+TEXT_INSERT_SQL = f"""
+    INSERT INTO wbs (job_number, {", ".join(wbs.COLUMNS)})
+    VALUES (?, {", ".join("?" for _ in wbs.COLUMNS)})
+"""
+PORTFOLIO_SQL = f"SELECT {', '.join(wbs.COLUMNS)} FROM wbs_lines"
+
+
+def build_text_database(db_path, job_count, lines_per_job, seed):
+    """Write the synthetic portfolio with the pre-lookup, all-text wbs table."""
+    conn = database.connect(db_path)
+    database.migrate(conn, target=TEXT_SCHEMA_VERSION)
+    job_rows = list(create_sample_db.synthetic_jobs(job_count, seed))
+    with database.transaction(conn):
+        conn.executemany(jobs.INSERT_SQL, job_rows)
+        conn.executemany(TEXT_INSERT_SQL, create_sample_db.synthetic_wbs(
+            [row[0] for row in job_rows], lines_per_job, seed))
+    return conn
+
+
+def vacuumed_size(conn, db_path):
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(db_path)
+
+
+def frame_memory(conn):
+    """Return the deep memory of all WBS lines as object and as categorical columns."""
+    import pandas as pd
+
+    df = pd.DataFrame(conn.execute(PORTFOLIO_SQL).fetchall(), columns=wbs.LABELS)
+    for label in wbs.TEXT_COLUMNS:
+        df[label] = df[label].astype(object)
+    before = df.memory_usage(deep=True).sum()
+    after = wbs._categorize(conn, df).memory_usage(deep=True).sum()
+    return before, after
+
+
+def _mib(size):
+    return size / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=250, help="WBS lines per job")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        text_path = os.path.join(tmp, "text.db")
+        conn = build_text_database(text_path, args.jobs, args.lines, args.seed)
+        text_size = vacuumed_size(conn, text_path)
+        conn.close()
+
+        lookup_path = os.path.join(tmp, "lookup.db")
+        shutil.copy(text_path, lookup_path)
+        conn = database.connect(lookup_path)
+        start = time.perf_counter()
+        database.migrate(conn)
+        migrate_seconds = time.perf_counter() - start
+        lookup_size = vacuumed_size(conn, lookup_path)
+        frame_before, frame_after = frame_memory(conn)
+        conn.close()
+
+    print(f"{args.jobs * args.lines:,} WBS lines; migration took {migrate_seconds:.1f} s")
+    print(f"{'':<22} {'text (MiB)':>11} {'lookup (MiB)':>13} {'reduction':>10}")
+    for name, before, after in (("database file", text_size, lookup_size),
+                                ("DataFrame memory", frame_before, frame_after)):
+        print(f"{name:<22} {_mib(before):>11.1f} {_mib(after):>13.1f} {1 - after / before:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
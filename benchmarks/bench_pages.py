@@ -0,0 +1,181 @@
+"""Benchmark page render latency and query counts at several data sizes.
+
+Each page's show() is driven headlessly with Streamlit's AppTest against a
+synthetic database from create_sample_db.generate. Every size runs in its own
+child process, started in a directory holding that size's job_master.db, so
+the pages use their normal connection pool. For each page the first render
+after clearing the query cache ("cold") and the median of repeated renders
+("warm") are recorded, along with the SQL statements each one ran.
+
+    python benchmarks/bench_pages.py --sizes 100x50 1000x250 --out pages.json
+    python benchmarks/bench_pages.py --compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import create_sample_db  # noqa: E402
+import database  # noqa: E402
+import snapshot  # noqa: E402
+
+# name -> (page module, interaction applied before measuring, or None)
+SCENARIOS = {
+    "job_info": ("Job_Info", None),
+    "job_info_saved_jobs": ("Job_Info", lambda at: at.checkbox[0].check()),
+    "create_wbs": ("Create_WBS", None),
+    "view_data": ("View_Data", None),
+    "view_data_filtered": ("View_Data", lambda at: at.selectbox[2].select_index(1)),
+    "portfolio_rollup": ("Portfolio_Rollup", None),
+}
+DEFAULT_SIZES = ["100x50", "1000x250"]
+
+
+class QueryCounter:
+    """Counts statements run on every connection the pool opens."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, statement):
+        # Statements run by triggers are reported with a leading comment.
+        if not statement.startswith("--"):
+            self.count += 1
+
+
+def _timed_run(at, counter):
+    counter.count = 0
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return elapsed * 1000, counter.count
+
+
+def run_child(repeats):
+    """Render every scenario against job_master.db in the working directory."""
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    counter = QueryCounter()
+    connect = database.connect
+
+    def counting_connect(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(counter)
+        return conn
+
+    database.connect = counting_connect
+
+    results = {}
+    for name, (module, interact) in SCENARIOS.items():
+        at = AppTest.from_string(f"from pages import {module}\n{module}.show()\n", default_timeout=300)
+        at.run()
+        if interact:
+            interact(at)
+        st.cache_data.clear()
+        cold_ms, cold_queries = _timed_run(at, counter)
+        warm = [_timed_run(at, counter) for _ in range(repeats)]
+        results[name] = {
+            "cold_ms": round(cold_ms, 2),
+            "cold_queries": cold_queries,
+            "warm_ms": round(statistics.median(ms for ms, _ in warm), 2),
+            "warm_queries": warm[-1][1],
+        }
+    print(json.dumps(results))
+
+
+def measure(size, tmp, seed, repeats):
+    job_count, lines_per_job = (int(part) for part in size.split("x"))
+    workdir = os.path.join(tmp, size)
+    os.makedirs(workdir)
+    conn = database.connect(os.path.join(workdir, "job_master.db"))
+    database.migrate(conn)
+    create_sample_db.generate(conn, job_count, lines_per_job, seed)
+    # Portfolio Rollup builds a missing snapshot in the background; time the
+    # page itself, not the placeholder it shows meanwhile.
+    snapshot.refresh(conn)
+    conn.close()
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", str(repeats)],
+        cwd=workdir, capture_output=True, text=True, check=True,
+    ).stdout
+    return {"jobs": job_count, "lines_per_job": lines_per_job,
+            "pages": json.loads(output.splitlines()[-1])}
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(sizes):
+    print(f"{'size':<12} {'page':<22} {'cold ms':>9} {'queries':>8} {'warm ms':>9} {'queries':>8}")
+    for size in sizes:
+        label = f"{size['jobs']}x{size['lines_per_job']}"
+        for page, r in size["pages"].items():
+            print(f"{label:<12} {page:<22} {r['cold_ms']:>9.1f} {r['cold_queries']:>8} "
+                  f"{r['warm_ms']:>9.1f} {r['warm_queries']:>8}")
+
+
+def compare(before_path, after_path):
+    """Print after/before latency ratios for the sizes and pages both files have."""
+    with open(before_path) as f:
+        before = {f"{s['jobs']}x{s['lines_per_job']}": s["pages"] for s in json.load(f)["sizes"]}
+    with open(after_path) as f:
+        after = {f"{s['jobs']}x{s['lines_per_job']}": s["pages"] for s in json.load(f)["sizes"]}
+    print(f"{'size':<12} {'page':<22} {'cold':>8} {'warm':>8} {'queries':>10}")
+    for size in (size for size in before if size in after):
+        for page in (page for page in before[size] if page in after[size]):
+            b, a = before[size][page], after[size][page]
+            print(f"{size:<12} {page:<22} {a['cold_ms'] / b['cold_ms']:>7.2f}x "
+                  f"{a['warm_ms'] / b['warm_ms']:>7.2f}x "
+                  f"{b['cold_queries']:>4} -> {a['cold_queries']:<4}")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        run_child(int(sys.argv[2]))
+        return 0
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, metavar="JOBSxLINES",
+                        help="data sizes as jobs x WBS lines per job (default: %(default)s)")
+    parser.add_argument("--repeats", type=int, default=5, help="warm renders per page")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="compare two result files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    results = {"commit": _commit(), "python": platform.python_version(),
+               "seed": args.seed, "repeats": args.repeats, "sizes": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            results["sizes"].append(measure(size, tmp, args.seed, args.repeats))
+    print_results(results["sizes"])
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
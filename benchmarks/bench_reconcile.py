@@ -0,0 +1,57 @@
+"""Benchmark portfolio reconciliation against checking one job at a time.
+
+Builds a synthetic portfolio, then runs reconcile.run with each worker count
+and, for comparison, the same checks job by job (read one job's lines, check
+them), the way the totals on Create WBS are computed today.
+
+    python benchmarks/bench_reconcile.py --jobs 2000 --lines 200 --workers 1 2 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_sample_db  # noqa: E402
+import database  # noqa: E402
+import reconcile  # noqa: E402
+
+
+def per_job(conn):
+    """Check each job on its own; returns (seconds, findings)."""
+    start = time.perf_counter()
+    found = 0
+    for (job_number,) in conn.execute("SELECT job_number FROM jobs ORDER BY job_number").fetchall():
+        found += len(reconcile.check_lines(*reconcile.read_range(conn, job_number, job_number)))
+    return time.perf_counter() - start, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=200, help="WBS lines per job")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = database.connect(os.path.join(tmp, "bench.db"))
+        database.migrate(conn)
+        create_sample_db.generate(conn, args.jobs, args.lines)
+        print(f"{args.jobs * args.lines:,} WBS lines in {args.jobs:,} jobs, {os.cpu_count()} CPU(s)\n")
+
+        print(f"{'run':<14} {'seconds':>8} {'lines/s':>11} {'findings':>9}")
+        for workers in args.workers:
+            reconcile.run(conn, workers)
+            latest = reconcile.latest_run(conn)
+            found = sum(count for count, _ in latest["counts"].values())
+            print(f"{f'{workers} worker(s)':<14} {latest['seconds']:>8.2f} "
+                  f"{latest['lines'] / latest['seconds']:>11,.0f} {found:>9,}")
+        seconds, found = per_job(conn)
+        print(f"{'job by job':<14} {seconds:>8.2f} {args.jobs * args.lines / seconds:>11,.0f} {found:>9,}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Benchmark portfolio rollups from the columnar snapshot against SQLite.
+
+Builds a synthetic portfolio, then times:
+
+- building the snapshot from scratch, and refreshing it after one job's save
+- each rollup from the memory-mapped snapshot (median of repeats)
+- the same totals as a SQLite GROUP BY, and by loading every line into
+  pandas and grouping there (what a portfolio view would otherwise do)
+
+    python benchmarks/bench_snapshot.py --jobs 4000 --lines 500
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_sample_db  # noqa: E402
+import database  # noqa: E402
+import snapshot  # noqa: E402
+import wbs  # noqa: E402
+
+ROLLUPS = [
+    ["branch"],
+    ["service_line", "fpa_type"],
+    ["branch", "service_line", "fpa_type", "fpa_subtype"],
+    ["job"],
+]
+SQL_COLUMNS = {"branch": "j.branch_number", "job": "l.job_number",
+               **{name: f"l.{name}" for name in wbs.LOOKUPS}}
+PANDAS_SQL = f"""
+    SELECT {", ".join(f"{column} AS {name}" for name, column in SQL_COLUMNS.items())},
+           {", ".join(snapshot.VALUE_COLUMNS)}
+    FROM wbs_lines AS l LEFT JOIN jobs AS j ON j.job_number = l.job_number
+"""
+
+
+def group_by_sql(by):
+    columns = ", ".join(SQL_COLUMNS[name] for name in by)
+    return f"""
+        SELECT {columns}, {", ".join(f"sum({name})" for name in snapshot.VALUE_COLUMNS)}, count(*)
+        FROM wbs_lines AS l LEFT JOIN jobs AS j ON j.job_number = l.job_number
+        GROUP BY {columns}
+    """
+
+
+def timed(fn, repeats=1):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=4000)
+    parser.add_argument("--lines", type=int, default=500, help="WBS lines per job")
+    parser.add_argument("--repeats", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = database.connect(os.path.join(tmp, "bench.db"))
+        database.migrate(conn)
+        create_sample_db.generate(conn, args.jobs, args.lines)
+        print(f"{args.jobs * args.lines:,} WBS lines")
+
+        build_ms = timed(lambda: snapshot.refresh(conn, rebuild=True))
+        job = str(create_sample_db.FIRST_SYNTHETIC_JOB)
+        original = wbs.load_job_wbs(conn, job)
+        edited = original.copy()
+        edited["Budgeted Cost"] += 1
+        wbs.save_changes(conn, job, wbs.diff_wbs(original, edited))
+        refresh_ms = timed(lambda: snapshot.refresh(conn))
+        print(f"snapshot build {build_ms:,.0f} ms; refresh after one job's save {refresh_ms:,.1f} ms")
+
+        snap = snapshot.current(conn)
+        pandas_ms = timed(lambda: pd.DataFrame(conn.execute(PANDAS_SQL).fetchall()))
+        print(f"loading every line into pandas: {pandas_ms:,.0f} ms\n")
+
+        print(f"{'group by':<44} {'groups':>7} {'snapshot ms':>12} {'sqlite ms':>10} {'speedup':>8}")
+        for by in ROLLUPS:
+            groups = len(snap.rollup(by))
+            snap_ms = timed(lambda: snap.rollup(by), args.repeats)
+            sql_ms = timed(lambda: conn.execute(group_by_sql(by)).fetchall())
+            print(f"{', '.join(by):<44} {groups:>7,} {snap_ms:>12.1f} {sql_ms:>10.0f} {sql_ms / snap_ms:>7.0f}x")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
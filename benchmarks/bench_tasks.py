@@ -0,0 +1,115 @@
+"""Measure how background tasks affect interactive page queries.
+
+Builds a synthetic portfolio, then times the queries behind opening a job in
+Create WBS (load one job's lines, read the summary counts) in a loop:
+
+- with nothing running in the background
+- while full-portfolio exports run on a runner limited to tasks.MAX_WORKERS
+- while as many exports run at once as there are queued (no limit)
+
+Each background phase queues the same number of exports and ends when they
+have all finished; it reports their wall time alongside the query latencies.
+
+    python benchmarks/bench_tasks.py --jobs 2000 --lines 200 --exports 6
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_sample_db  # noqa: E402
+import database  # noqa: E402
+import summary  # noqa: E402
+import tasks  # noqa: E402
+import wbs  # noqa: E402
+
+
+def page_queries(conn, job_numbers, stop):
+    """Open jobs in turn until stop is set; returns the latencies in ms."""
+    latencies = []
+    i = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        wbs.load_job_wbs(conn, job_numbers[i % len(job_numbers)])
+        summary.read_summary(conn)
+        latencies.append((time.perf_counter() - start) * 1000)
+        i += 1
+    return latencies
+
+
+def run_phase(db_path, job_numbers, exports, workers, seconds):
+    """Time page queries while ``exports`` exports run on ``workers`` threads."""
+    conn = database.connect(db_path)
+    runner = tasks.Runner(db_path, workers) if exports else None
+    ids = [
+        conn.execute(tasks.INSERT_SQL, ("export", f"bench {i}", json.dumps(
+            {"format": "csv", "filters": {}}), time.time())).lastrowid
+        for i in range(exports)
+    ]
+    stop = threading.Event()
+    result = {}
+    reader = threading.Thread(target=lambda: result.update(latencies=page_queries(
+        database.connect(db_path), job_numbers, stop)))
+    start = time.perf_counter()
+    reader.start()
+    for task_id in ids:
+        runner.submit(task_id)
+    if exports:
+        placeholders = ", ".join("?" for _ in ids)
+        while conn.execute(f"SELECT count(*) FROM tasks WHERE id IN ({placeholders}) "
+                           f"AND status IN ('queued', 'running')", ids).fetchone()[0]:
+            time.sleep(0.1)
+    else:
+        time.sleep(seconds)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    reader.join()
+    failed = conn.execute("SELECT count(*) FROM tasks WHERE status = 'failed'").fetchone()[0]
+    conn.close()
+    latencies = sorted(result["latencies"])
+    return {
+        "elapsed": elapsed,
+        "queries": len(latencies),
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95)],
+        "failed": failed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=200, help="WBS lines per job")
+    parser.add_argument("--exports", type=int, default=6, help="exports queued in each background phase")
+    parser.add_argument("--seconds", type=float, default=5, help="length of the idle phase")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        conn = database.connect(db_path)
+        database.migrate(conn)
+        create_sample_db.generate(conn, args.jobs, args.lines)
+        job_numbers = [row[0] for row in conn.execute("SELECT job_number FROM jobs LIMIT 200")]
+        conn.close()
+        print(f"{args.jobs * args.lines:,} WBS lines; {args.exports} full exports per background phase\n")
+
+        print(f"{'background':<28} {'wall s':>7} {'queries':>8} {'p50 ms':>7} {'p95 ms':>7}")
+        for name, exports, workers in (
+            ("none", 0, 0),
+            (f"{tasks.MAX_WORKERS} workers (tasks.MAX_WORKERS)", args.exports, tasks.MAX_WORKERS),
+            (f"{args.exports} workers (unlimited)", args.exports, args.exports),
+        ):
+            phase = run_phase(db_path, job_numbers, exports, workers, args.seconds)
+            print(f"{name:<28} {phase['elapsed']:>7.1f} {phase['queries']:>8,} "
+                  f"{phase['p50']:>7.1f} {phase['p95']:>7.1f}"
+                  + (f"  ({phase['failed']} failed)" if phase["failed"] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark WBS save latency as a job grows.
+
+Compares the old save (delete the job's rows, then one autocommit INSERT per
+row) with the delta save in wbs.py for a typical edit touching 1% of the lines.
+
+    python benchmarks/bench_wbs_save.py --sizes 1000 5000 20000 50000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import wbs  # noqa: E402
+
+JOB = "B0001"
+
+
+def make_job(conn, lines):
+    rows = [
+        (JOB, f"Service {i % 7}", f"Task {i % 97}", f"Subtask {i}", float(i % 500),
+         "Linear Ft", "Contract" if i % 5 else "CO", "Services", "Labor",
+         1000.0 + i, float(i % 40), 500.0 + i)
+        for i in range(lines)
+    ]
+    with database.transaction(conn):
+        conn.executemany(wbs.INSERT_SQL, rows)
+
+
+def edit(df):
+    """Touch 1% of the lines: update half, delete a quarter, add a quarter."""
+    n = max(len(df) // 100, 4)
+    edited = df.copy()
+    edited.loc[edited.index[: n // 2], "Budgeted Cost"] += 1
+    edited = edited.drop(edited.index[-(n // 4):])
+    added = pd.DataFrame([{"id": None, "Service Line": "New", "WBS Task": "Added",
+                           "WBS Subtask": str(i), "QTY": 1.0} for i in range(n // 4)])
+    return pd.concat([edited, added], ignore_index=True)
+
+
+def legacy_save(conn, edited):
+    conn.execute("DELETE FROM wbs WHERE job_number = ?", (JOB,))
+    for _, row in edited.iterrows():
+        if not row[wbs.KEY_COLUMNS].isnull().all():
+            conn.execute(wbs.INSERT_SQL, (JOB,) + tuple(
+                (0 if pd.isnull(row[label]) else row[label]) if label in wbs.NUMERIC_COLUMNS
+                else row[label]
+                for label in wbs.LABELS
+            ))
+
+
+def delta_save(conn, original, edited):
+    return wbs.save_changes(conn, JOB, wbs.diff_wbs(original, edited))
+
+
+def run(size):
+    results = {}
+    for name in ("legacy", "delta"):
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = database.connect(os.path.join(tmp, "bench.db"))
+            database.migrate(conn)
+            make_job(conn, size)
+            original = wbs.load_job_wbs(conn, JOB)
+            edited = edit(original)
+            start = time.perf_counter()
+            if name == "legacy":
+                legacy_save(conn, edited)
+            else:
+                delta_save(conn, original, edited)
+            results[name] = time.perf_counter() - start
+            conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000, 50000])
+    args = parser.parse_args()
+
+    print(f"{'lines':>8} {'legacy (s)':>12} {'delta (s)':>12} {'speedup':>9}")
+    for size in args.sizes:
+        r = run(size)
+        print(f"{size:>8} {r['legacy']:>12.3f} {r['delta']:>12.3f} {r['legacy'] / r['delta']:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
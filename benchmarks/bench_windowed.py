@@ -0,0 +1,104 @@
+"""Benchmark windowed (keyset-paginated) WBS reads against loading the whole job.
+
+For jobs of increasing size, times reading every line into a frame (what
+Create WBS and View Data did for any job) against reading one page with
+wbs.load_window, at the start of the job and at its end, in both orders. Also
+compares the budget totals summed by SQLite (wbs.job_totals) with summing the
+loaded frame, and the frames' memory. The window columns should stay flat as
+the job grows.
+
+    python benchmarks/bench_windowed.py --lines 10000 50000 200000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import wbs  # noqa: E402
+
+JOB = "W0001"
+SERVICE_LINES = ["Coatings", "Materials", "Equipment", "Insulation", None]
+
+
+def make_job(conn, lines):
+    rows = [
+        (JOB, SERVICE_LINES[i % len(SERVICE_LINES)], f"Task {i % 97}", f"Subtask {i}", float(i % 500),
+         "Linear Ft", "Contract" if i % 5 else "CO", "Services", "Labor",
+         1000.0 + i, float(i % 40), 500.0 + i)
+        for i in range(lines)
+    ]
+    with database.transaction(conn):
+        # A neighbouring job, so pages are read from the middle of the indexes
+        conn.executemany(wbs.INSERT_SQL, [("W0000",) + row[1:] for row in rows[:1000]])
+        conn.executemany(wbs.INSERT_SQL, rows)
+        conn.executemany(wbs.INSERT_SQL, [("W0002",) + row[1:] for row in rows[:1000]])
+    conn.execute("ANALYZE")
+
+
+def last_cursor(conn, order, lines):
+    """The cursor the job's last full page starts after."""
+    keys = wbs.ORDERS[order] + ["id"]
+    return conn.execute(
+        f"SELECT {', '.join(keys)} FROM wbs WHERE job_number = ? ORDER BY {', '.join(keys)} LIMIT 1 OFFSET ?",
+        (JOB, lines - wbs.PAGE_SIZE - 1),
+    ).fetchone()
+
+
+def timed(fn, *args, repeat=5):
+    """(median seconds, last result) of fn(*args) over ``repeat`` runs."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def mib(frame):
+    return frame.memory_usage(deep=True).sum() / 2**20
+
+
+def run(lines):
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = database.connect(os.path.join(tmp, "bench.db"))
+        database.migrate(conn)
+        make_job(conn, lines)
+
+        full_s, full = timed(wbs.load_job_wbs, conn, JOB, repeat=3)
+        frame_totals_s, _ = timed(lambda: {label: full[label].sum() for label in wbs.TOTAL_LABELS})
+        sql_totals_s, (count, totals) = timed(wbs.job_totals, conn, JOB)
+        assert count == lines and all(abs(totals[label] - full[label].sum()) < 1e-6 * totals[label]
+                                      for label in wbs.TOTAL_LABELS)
+        pages = {}
+        for order in wbs.ORDERS:
+            first_s, (page, _) = timed(wbs.load_window, conn, JOB, None, None, wbs.PAGE_SIZE, order)
+            last_s, (last, next_cursor) = timed(wbs.load_window, conn, JOB, None, last_cursor(conn, order, lines),
+                                                wbs.PAGE_SIZE, order)
+            assert len(last) == wbs.PAGE_SIZE and next_cursor is None
+            pages[order] = (first_s, last_s)
+        conn.close()
+
+    print(f"{lines:>8,} {full_s * 1000:>9.1f} {mib(full):>8.1f} "
+          + " ".join(f"{first * 1000:>10.2f} {last * 1000:>9.2f}" for first, last in pages.values())
+          + f" {mib(page):>8.2f} {frame_totals_s * 1000:>12.2f} {sql_totals_s * 1000:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, nargs="+", default=[10000, 50000, 200000])
+    args = parser.parse_args()
+
+    print(f"milliseconds and MiB; pages of {wbs.PAGE_SIZE} lines, first and last, in id and service line order\n")
+    print(f"{'lines':>8} {'full read':>9} {'full MiB':>8} {'id first':>10} {'id last':>9} "
+          f"{'sort first':>10} {'sort last':>9} {'page MiB':>8} {'frame totals':>12} {'SQL totals':>10}")
+    for lines in args.lines:
+        run(lines)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Benchmark the Create WBS working copy against recomputing from the whole frame.
+
+For jobs of increasing size, replays a session that edits one line per rerun
+and compares, per rerun and per save:
+
+- before: totals summed over the whole edited frame each rerun, the job's
+  lines read again whenever the cache is invalidated, and a save that diffs
+  every line (wbs.diff_wbs)
+- after: working_copy.WorkingCopy.apply on the editor's state, and a save of
+  the dirty lines only (WorkingCopy.changes)
+
+    python benchmarks/bench_working_copy.py --lines 1000 10000 50000 --edits 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import wbs  # noqa: E402
+import working_copy  # noqa: E402
+
+JOB = "W0001"
+
+
+def make_job(conn, lines):
+    rows = [
+        (JOB, f"Service {i % 7}", f"Task {i % 97}", f"Subtask {i}", float(i % 500),
+         "Linear Ft", "Contract" if i % 5 else "CO", "Services", "Labor",
+         1000.0 + i, float(i % 40), 500.0 + i)
+        for i in range(lines)
+    ]
+    with database.transaction(conn):
+        conn.executemany(wbs.INSERT_SQL, rows)
+
+
+def editor_states(lines, edits):
+    """The editor's state after each of ``edits`` reruns, one more line edited each time."""
+    step = max(lines // edits, 1)
+    state = {"edited_rows": {}, "added_rows": [], "deleted_rows": []}
+    for n in range(edits):
+        state = {**state, "edited_rows": {**state["edited_rows"], n * step: {"Budgeted Cost": 1.0 + n}}}
+        yield state
+
+
+def edited_frame(df, state):
+    """The frame st.data_editor returns for a state (built by Streamlit either way)."""
+    edited = df.copy()
+    for pos, values in state["edited_rows"].items():
+        for label, value in values.items():
+            edited.iat[pos, edited.columns.get_loc(label)] = value
+    return edited
+
+
+def ms(seconds):
+    return f"{seconds * 1000:.2f}"
+
+
+def run(lines, edits):
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = database.connect(os.path.join(tmp, "bench.db"))
+        database.migrate(conn)
+        make_job(conn, lines)
+
+        start = time.perf_counter()
+        df = wbs.load_job_wbs(conn, JOB)
+        read_s = time.perf_counter() - start
+        start = time.perf_counter()
+        copy = working_copy.WorkingCopy(JOB, df, "bench")
+        load_s = time.perf_counter() - start
+
+        before, after = [], []
+        for state in editor_states(lines, edits):
+            edited = edited_frame(df, state)
+            start = time.perf_counter()
+            [float(edited[label].fillna(0).sum()) for label in working_copy.TOTALS]
+            before.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            copy.apply(state)
+            after.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        diffed = wbs.diff_wbs(df, edited)
+        diff_s = time.perf_counter() - start
+        start = time.perf_counter()
+        changes = copy.changes()
+        changes_s = time.perf_counter() - start
+        assert sorted(changes.updates) == sorted(diffed.updates)
+        for label in working_copy.TOTALS:
+            assert abs(copy.totals[label] - edited[label].sum()) < 1e-6 * max(1.0, abs(copy.totals[label]))
+        start = time.perf_counter()
+        wbs.save_changes(conn, JOB, changes)
+        write_s = time.perf_counter() - start
+        conn.close()
+
+    print(f"{lines:>8,} {ms(read_s):>10} {ms(load_s):>10} {ms(statistics.median(before)):>13} "
+          f"{ms(statistics.median(after)):>12} {ms(diff_s):>10} {ms(changes_s):>12} {ms(write_s):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--edits", type=int, default=20, help="reruns, each editing one more line")
+    args = parser.parse_args()
+
+    print("milliseconds; a read happens on every cache invalidation before, once per job and save after\n")
+    print(f"{'lines':>8} {'read job':>10} {'load copy':>10} {'totals/rerun':>13} {'apply/rerun':>12} "
+          f"{'diff_wbs':>10} {'changes()':>12} {'write':>9}")
+    for lines in args.lines:
+        run(lines, args.edits)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Load-test the read-only HTTP API and report requests per second.
+
+Builds a synthetic portfolio, starts ``api.py`` on it in a separate process,
+then runs each scenario for a fixed time with several client threads, each on
+its own keep-alive connection:
+
+- jobs: a page of 100 jobs from a random starting job number
+- wbs: one job's first 500 WBS lines
+- wbs_filtered: one job's Coatings lines, 100 at a time
+- poll: the wbs request repeated with If-None-Match, answered 304 while the
+  data is unchanged (what a sync script polling for changes costs)
+
+    python benchmarks/load_api.py --jobs 2000 --lines 200 --clients 8 --seconds 5
+"""
+import argparse
+import http.client
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import create_sample_db  # noqa: E402
+import database  # noqa: E402
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/jobs?limit=1")
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("API server did not start")
+
+
+def scenarios(job_numbers):
+    """Scenario name -> function(rng, etags) returning (path, headers)."""
+    def jobs_page(rng, etags):
+        return f"/jobs?limit=100&after={rng.choice(job_numbers)}", {}
+
+    def wbs(rng, etags):
+        return f"/jobs/{rng.choice(job_numbers)}/wbs?limit=500", {}
+
+    def wbs_filtered(rng, etags):
+        return f"/jobs/{rng.choice(job_numbers)}/wbs?limit=100&service_line=Coatings", {}
+
+    def poll(rng, etags):
+        path = f"/jobs/{rng.choice(job_numbers[:50])}/wbs?limit=500"
+        return path, {"If-None-Match": etags[path]} if path in etags else {}
+
+    return {"jobs": jobs_page, "wbs": wbs, "wbs_filtered": wbs_filtered, "poll": poll}
+
+
+def run_client(port, request, seconds, seed, results):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    etags, latencies, statuses, sent = {}, [], {}, 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        path, headers = request(rng, etags)
+        start = time.perf_counter()
+        conn.request("GET", path, headers=headers)
+        response = conn.getresponse()
+        body = response.read()
+        latencies.append((time.perf_counter() - start) * 1000)
+        statuses[response.status] = statuses.get(response.status, 0) + 1
+        sent += len(body)
+        if response.getheader("ETag"):
+            etags[path] = response.getheader("ETag")
+    conn.close()
+    results.append((latencies, statuses, sent))
+
+
+def run_scenario(port, request, clients, seconds):
+    results = []
+    threads = [threading.Thread(target=run_client, args=(port, request, seconds, seed, results))
+               for seed in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies = sorted(ms for r in results for ms in r[0])
+    statuses = {}
+    for r in results:
+        for status, count in r[1].items():
+            statuses[status] = statuses.get(status, 0) + count
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95)],
+        "kib": sum(r[2] for r in results) / len(latencies) / 1024,
+        "statuses": statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=200, help="WBS lines per job")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent client connections")
+    parser.add_argument("--seconds", type=float, default=5, help="length of each scenario")
+    parser.add_argument("--pool-size", type=int, default=database.POOL_SIZE, help="server connection pool size")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "api.db")
+        conn = database.connect(db_path)
+        database.migrate(conn)
+        create_sample_db.generate(conn, args.jobs, args.lines)
+        job_numbers = [row[0] for row in conn.execute("SELECT job_number FROM jobs")]
+        conn.close()
+
+        port = _free_port()
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "api.py"), "--db", db_path, "--port", str(port),
+             "--pool-size", str(args.pool_size), "--quiet"],
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            _wait_until_up(port)
+            print(f"{args.jobs * args.lines:,} WBS lines; {args.clients} clients, "
+                  f"{args.seconds:.0f} s per scenario, pool of {args.pool_size}\n")
+            print(f"{'scenario':<14} {'req/s':>8} {'p50 ms':>7} {'p95 ms':>7} {'KiB/req':>8}  statuses")
+            for name, request in scenarios(job_numbers).items():
+                result = run_scenario(port, request, args.clients, args.seconds)
+                statuses = ", ".join(f"{status}: {count:,}" for status, count in sorted(result["statuses"].items()))
+                print(f"{name:<14} {result['rps']:>8,.0f} {result['p50']:>7.1f} {result['p95']:>7.1f} "
+                      f"{result['kib']:>8.1f}  {statuses}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
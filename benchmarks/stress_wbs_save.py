@@ -0,0 +1,135 @@
+"""Stress concurrent WBS saves from several processes and check nothing is lost.
+
+Every worker process repeatedly loads one shared job, adds 1 to the QTY of a
+random line and saves it the way the Create WBS page does (wbs.diff_wbs then
+wbs.save_changes). Every few saves it also adds a line of its own. A save
+rejected with ConflictError is reloaded and tried again. At the end:
+
+- the job's total QTY must equal the number of increments that were saved
+- every line a worker added must be present
+
+With ``--unchecked`` the saves skip the version check. This is the
+last-writer-wins behaviour optimistic versioning replaces; it loses
+increments, which shows what the check prevents.
+
+    python benchmarks/stress_wbs_save.py --workers 8 --seconds 10
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import wbs  # noqa: E402
+
+JOB = "S0001"
+ADD_EVERY = 5
+TOTALS_SQL = "SELECT count(*), coalesce(sum(qty), 0) FROM wbs WHERE job_number = ?"
+ADDED_SQL = "SELECT count(*) FROM wbs WHERE job_number = ? AND wbs_task = 'Added'"
+
+
+def make_job(conn, lines):
+    rows = [(JOB, "Coatings", f"Task {i % 10}", f"Subtask {i}", 0.0, "Sq Ft", "Contract",
+             "Services", "Labor", 0.0, 0.0, 0.0) for i in range(lines)]
+    with database.transaction(conn):
+        conn.executemany(wbs.INSERT_SQL, rows)
+
+
+def run_worker(worker, db_path, seconds, start_at, unchecked):
+    rng = random.Random(worker)
+    conn = database.connect(db_path)
+    stats = {"saves": 0, "increments": 0, "added": 0, "conflicts": 0, "errors": 0, "latencies": []}
+    time.sleep(max(0.0, start_at - time.time()))
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        original = wbs.load_job_wbs(conn, JOB)
+        edited = original.copy()
+        edited.loc[rng.randrange(len(edited)), "QTY"] += 1
+        add = stats["saves"] % ADD_EVERY == 0
+        if add:
+            edited.loc[len(edited)] = {"Service Line": "Coatings", "WBS Task": "Added",
+                                       "WBS Subtask": f"worker {worker} line {stats['added']}", "QTY": 0.0}
+        changes = wbs.diff_wbs(original, edited)
+        if unchecked:
+            changes.versions = {}
+        start = time.perf_counter()
+        try:
+            wbs.save_changes(conn, JOB, changes)
+        except wbs.ConflictError:
+            stats["conflicts"] += 1
+            continue
+        except Exception:
+            stats["errors"] += 1
+            continue
+        stats["latencies"].append((time.perf_counter() - start) * 1000)
+        stats["saves"] += 1
+        stats["increments"] += 1
+        stats["added"] += add
+    conn.close()
+    print(json.dumps(stats))
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        worker, db_path, seconds, start_at, unchecked = sys.argv[2:7]
+        run_worker(int(worker), db_path, float(seconds), float(start_at), unchecked == "1")
+        return 0
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=8, help="concurrent saving processes")
+    parser.add_argument("--seconds", type=float, default=10, help="how long each worker saves for")
+    parser.add_argument("--lines", type=int, default=50, help="lines in the shared job")
+    parser.add_argument("--unchecked", action="store_true", help="save without the version check")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "stress.db")
+        conn = database.connect(db_path)
+        database.migrate(conn)
+        make_job(conn, args.lines)
+
+        # Start every worker at the same moment, after Python and pandas load.
+        start_at = time.time() + 3
+        children = [
+            subprocess.Popen([sys.executable, __file__, "--child", str(worker), db_path,
+                              str(args.seconds), str(start_at), "1" if args.unchecked else "0"],
+                             stdout=subprocess.PIPE, text=True)
+            for worker in range(args.workers)
+        ]
+        results = [json.loads(child.communicate()[0].splitlines()[-1]) for child in children]
+        lines, total_qty = conn.execute(TOTALS_SQL, (JOB,)).fetchone()
+        added_lines = conn.execute(ADDED_SQL, (JOB,)).fetchone()[0]
+        conn.close()
+
+    saves = sum(r["saves"] for r in results)
+    increments = sum(r["increments"] for r in results)
+    added = sum(r["added"] for r in results)
+    conflicts = sum(r["conflicts"] for r in results)
+    errors = sum(r["errors"] for r in results)
+    latencies = sorted(ms for r in results for ms in r["latencies"])
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0.0
+
+    print(f"{args.workers} workers for {args.seconds:.0f} s on one {args.lines}-line job"
+          f"{' (unchecked saves)' if args.unchecked else ''}")
+    print(f"saves: {saves:,} ({saves / args.seconds:,.0f}/s), conflicts: {conflicts:,}, errors: {errors}")
+    if latencies:
+        print(f"save latency: p50 {statistics.median(latencies):.1f} ms, p95 {p95:.1f} ms")
+    lost = increments - round(total_qty)
+    print(f"increments saved: {increments:,}, in the database: {total_qty:,.0f}, lost: {lost:,}")
+    print(f"lines added: {added:,}, in the database: {added_lines:,} ({lines:,} lines in all)")
+    if lost or added_lines != added or errors:
+        print("❌ Concurrent saves lost or failed to write updates.")
+        return 1
+    print("✅ No updates were lost.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
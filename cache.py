@@ -0,0 +1,72 @@
+"""Query results shared by every Streamlit session.
+
+Pages read through ``cache.read(conn, fn, *args)``. Results are held by
+``st.cache_data``, keyed by the read function, its arguments and the database
+write generation. Triggers bump the generation on every change to jobs or wbs
+(see database.MIGRATIONS), so a save from any session, import or script makes
+every cached result unreachable and the next read goes back to SQLite.
+
+Reading the generation is a primary-key lookup on a one-row table.
+``PRAGMA data_version`` would be as cheap, but it only reports commits made
+through other connections, and the pool hands a session the same connection
+it may just have written through.
+"""
+import threading
+
+import streamlit as st
+
+import database
+
+MAX_ENTRIES = 1000
+
+
+class CacheStats:
+    """Hit and miss counts for the shared cache, since the process started."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self):
+        return f"{self.hits:,} hits, {self.misses:,} misses ({self.hit_rate():.0%} hit rate)"
+
+
+@st.cache_resource
+def stats():
+    return CacheStats()
+
+
+# Set by _read when its body runs, i.e. on a miss, for the calling thread.
+_missed = threading.local()
+
+
+@st.cache_data(max_entries=MAX_ENTRIES, show_spinner=False)
+def _read(name, args, kwargs, generation, _conn, _fn):
+    _missed.value = True
+    return _fn(_conn, *args, **kwargs)
+
+
+def read(conn, fn, *args, **kwargs):
+    """Return ``fn(conn, *args, **kwargs)``, cached until the next write.
+
+    The generation is read before the query, so a result is never older than
+    the generation it is stored under; at worst a write landing in between is
+    already reflected in it.
+    """
+    _missed.value = False
+    name = f"{fn.__module__}.{fn.__qualname__}"
+    result = _read(name, args, kwargs, database.data_generation(conn), conn, fn)
+    stats().record(hit=not _missed.value)
+    return result
@@ -1,5 +1,5 @@
 @echo off
 echo Creating job_master.db database...
-sqlite3 job_master.db < create_db.sql
+python create_sample_db.py
 echo Database created successfully!
 pause 
\ No newline at end of file
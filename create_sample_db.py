@@ -1,101 +1,163 @@
+"""Create job_master.db with sample data, or with synthetic data at scale.
+
+    python create_sample_db.py                                  # 5 sample jobs
+    python create_sample_db.py --jobs 2000 --lines 250 --seed 7 # synthetic portfolio
+
+Synthetic jobs get realistic mixes of service lines, tasks, units and FPA
+types from a seeded generator, so the same arguments always produce the same
+database. Rows are written with executemany in one transaction.
+"""
+import argparse
+import random
 import sqlite3
-import os
+import sys
+
+import database
+import jobs
+import summary
+import wbs
+
+SAMPLE_JOBS = [
+    ("20725", "0508", "SCVWA Filters", "100000"),
+    ("20726", "0508", "SCVWA Filters", "100001"),
+    ("20727", "0509", "Industrial Coating", "100002"),
+    ("20728", "0510", "Pipeline Protection", "100003"),
+    ("20729", "0511", "Tank Coating", "100004")
+]
+
+SAMPLE_WBS = [
+    # Job 20725
+    ("20725", "Coatings", "1st Fl Coating", "1st Fl Small Pipe", 5000.0, "Linear Ft", "Contract", "Services", "Labor", 20000.0, 100.0, 10000.0),
+    ("20725", "Coatings", "2nd Fl Coating", "2nd Fl Storm Pipe", 300.0, "Linear Ft", "CO", "Services", "Labor", 10000.0, 65.0, 6500.0),
+    ("20725", "Coatings", "3rd Fl Coating", "3rd Fl Large Pipe", 800.0, "Linear Ft", "Contract", "Services", "Labor", 15000.0, 80.0, 8000.0),
+    ("20725", "Materials", "Surface Prep", "Cleaning", 1.0, "Lot", "Contract", "Materials", "Other", 5000.0, 20.0, 3000.0),
+    ("20725", "Equipment", "Scaffolding", "Setup", 1.0, "Lot", "Contract", "Equipment", "Other", 8000.0, 40.0, 4000.0),
+    # Job 20726
+    ("20726", "Coatings", "Primary Coating", "Main Structure", 2000.0, "Sq Ft", "Contract", "Services", "Labor", 25000.0, 120.0, 12000.0),
+    ("20726", "Coatings", "Secondary Coating", "Support Beams", 500.0, "Sq Ft", "CO", "Services", "Labor", 12000.0, 60.0, 6000.0),
+    ("20726", "Materials", "Primer", "Application", 1.0, "Lot", "Contract", "Materials", "Other", 3000.0, 15.0, 2000.0)
+]
+
+# --- Synthetic data distributions ---
+# Service line -> (weight, tasks, units, FPA type). Earlier tasks are more common.
+SERVICE_LINES = {
+    "Coatings": (40, ["Floor Coating", "Wall Coating", "Pipe Coating", "Tank Lining", "Touch Up"],
+                 ["Sq Ft", "Linear Ft"], "Services"),
+    "Surface Prep": (15, ["Abrasive Blast", "Power Tool Clean", "Pressure Wash", "Containment"],
+                     ["Sq Ft", "Lot"], "Services"),
+    "Materials": (20, ["Primer", "Topcoat", "Abrasive", "Consumables"], ["Gallon", "Lot", "Each"], "Materials"),
+    "Equipment": (12, ["Scaffolding", "Lifts", "Compressors", "Dehumidification"], ["Day", "Lot"], "Equipment"),
+    "Inspection": (8, ["Holiday Testing", "DFT Readings", "Third Party QA"], ["Hours", "Each"], "Services"),
+    "Mobilization": (5, ["Mobilize", "Demobilize"], ["Lot"], "Services"),
+}
+FPA_SUBTYPES = {
+    "Services": (["Labor", "Subcontract", "Other"], [70, 20, 10]),
+    "Materials": (["Material", "Freight", "Other"], [80, 12, 8]),
+    "Equipment": (["Rental", "Owned", "Other"], [60, 30, 10]),
+}
+CHANGE_ORDER_SHARE = 0.15
+BRANCH_COUNT = 40
+CLIENTS = ["SCVWA", "LADWP", "Metro", "Port of LA", "Chevron", "Caltrans", "OCSD", "IEUA", "SDG&E", "Kinder Morgan"]
+ASSETS = ["Filters", "Clearwell", "Pump Station", "Storage Tank", "Pipeline", "Bridge", "Digester", "Headworks"]
+FIRST_SYNTHETIC_JOB = 30000
+
+
+def _task_weights(tasks):
+    return [1 / (rank + 1) for rank in range(len(tasks))]
+
+
+def synthetic_jobs(job_count, seed=0):
+    """Yield (job_number, branch_number, job_name, salesforce_id) for job_count jobs."""
+    rng = random.Random(seed)
+    for j in range(job_count):
+        number = FIRST_SYNTHETIC_JOB + j
+        # A few large branches carry most of the work.
+        branch = 500 + min(int(rng.paretovariate(1.2)) - 1, BRANCH_COUNT - 1)
+        name = f"{rng.choice(CLIENTS)} {rng.choice(ASSETS)}"
+        yield str(number), f"{branch:04d}", name, str(200000 + j)
+
 
-def create_sample_database():
+def synthetic_wbs(job_numbers, lines_per_job, seed=0):
+    """Yield wbs.INSERT_SQL rows: lines_per_job lines for each job number."""
+    rng = random.Random(seed + 1)
+    names = list(SERVICE_LINES)
+    weights = [SERVICE_LINES[name][0] for name in names]
+    for job_number in job_numbers:
+        for i in range(lines_per_job):
+            service_line = rng.choices(names, weights)[0]
+            _, tasks, units, fpa_type = SERVICE_LINES[service_line]
+            task = rng.choices(tasks, _task_weights(tasks))[0]
+            subtypes, subtype_weights = FPA_SUBTYPES[fpa_type]
+            qty = round(rng.lognormvariate(4, 1.5), 1)
+            revenue = round(qty * rng.uniform(2, 40), 2)
+            cost = round(revenue * rng.uniform(0.5, 0.85), 2)
+            hours = round(cost / rng.uniform(60, 110), 1) if fpa_type == "Services" else 0.0
+            yield (
+                job_number, service_line, task, f"{task} {i + 1}", qty, rng.choice(units),
+                "CO" if rng.random() < CHANGE_ORDER_SHARE else "Contract",
+                fpa_type, rng.choices(subtypes, subtype_weights)[0],
+                revenue, hours, cost,
+            )
+
+
+def generate(conn, job_count, lines_per_job, seed=0):
+    """Insert job_count synthetic jobs with lines_per_job WBS lines each.
+
+    Summary counts and the cache generation are updated once for the whole
+    load rather than per row (see summary.bulk_insert).
+    """
+    job_rows = list(synthetic_jobs(job_count, seed))
+    with database.transaction(conn):
+        conn.executemany(jobs.INSERT_SQL, job_rows)
+        with summary.bulk_insert(conn):
+            conn.executemany(wbs.INSERT_SQL, synthetic_wbs([row[0] for row in job_rows], lines_per_job, seed))
+    conn.execute("ANALYZE")
+
+
+def create_sample_database(db_path=database.DB_PATH):
     """Create a sample job_master.db with sample data"""
-    
-    # Connect to database (will create if doesn't exist)
-    db_path = os.path.join(os.getcwd(), "job_master.db")
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    
-    # Create jobs table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS jobs (
-            job_number TEXT PRIMARY KEY,
-            branch_number TEXT,
-            job_name TEXT,
-            salesforce_id TEXT
-        )
-    ''')
-    
-    # Create wbs table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS wbs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            job_number TEXT,
-            service_line TEXT,
-            wbs_task TEXT,
-            wbs_subtask TEXT,
-            qty REAL,
-            unit_of_measure TEXT,
-            contract_vs_co TEXT,
-            fpa_type TEXT,
-            fpa_subtype TEXT,
-            budgeted_revenue REAL,
-            budgeted_hours REAL,
-            budgeted_cost REAL
-        )
-    ''')
-    
-    # Insert sample jobs
-    sample_jobs = [
-        ("20725", "0508", "SCVWA Filters", "100000"),
-        ("20726", "0508", "SCVWA Filters", "100001"),
-        ("20727", "0509", "Industrial Coating", "100002"),
-        ("20728", "0510", "Pipeline Protection", "100003"),
-        ("20729", "0511", "Tank Coating", "100004")
-    ]
-    
-    for job in sample_jobs:
-        try:
-            c.execute("INSERT INTO jobs VALUES (?, ?, ?, ?)", job)
-        except sqlite3.IntegrityError:
-            print(f"Job {job[0]} already exists, skipping...")
-    
-    # Insert sample WBS data for job 20725
-    sample_wbs = [
-        ("20725", "Coatings", "1st Fl Coating", "1st Fl Small Pipe", 5000.0, "Linear Ft", "Contract", "Services", "Labor", 20000.0, 100.0, 10000.0),
-        ("20725", "Coatings", "2nd Fl Coating", "2nd Fl Storm Pipe", 300.0, "Linear Ft", "CO", "Services", "Labor", 10000.0, 65.0, 6500.0),
-        ("20725", "Coatings", "3rd Fl Coating", "3rd Fl Large Pipe", 800.0, "Linear Ft", "Contract", "Services", "Labor", 15000.0, 80.0, 8000.0),
-        ("20725", "Materials", "Surface Prep", "Cleaning", 1.0, "Lot", "Contract", "Materials", "Other", 5000.0, 20.0, 3000.0),
-        ("20725", "Equipment", "Scaffolding", "Setup", 1.0, "Lot", "Contract", "Equipment", "Other", 8000.0, 40.0, 4000.0)
-    ]
-    
-    for wbs_item in sample_wbs:
-        c.execute('''
-            INSERT INTO wbs (
-                job_number, service_line, wbs_task, wbs_subtask, qty,
-                unit_of_measure, contract_vs_co, fpa_type, fpa_subtype,
-                budgeted_revenue, budgeted_hours, budgeted_cost
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', wbs_item)
-    
-    # Insert sample WBS data for job 20726
-    sample_wbs_20726 = [
-        ("20726", "Coatings", "Primary Coating", "Main Structure", 2000.0, "Sq Ft", "Contract", "Services", "Labor", 25000.0, 120.0, 12000.0),
-        ("20726", "Coatings", "Secondary Coating", "Support Beams", 500.0, "Sq Ft", "CO", "Services", "Labor", 12000.0, 60.0, 6000.0),
-        ("20726", "Materials", "Primer", "Application", 1.0, "Lot", "Contract", "Materials", "Other", 3000.0, 15.0, 2000.0)
-    ]
-    
-    for wbs_item in sample_wbs_20726:
-        c.execute('''
-            INSERT INTO wbs (
-                job_number, service_line, wbs_task, wbs_subtask, qty,
-                unit_of_measure, contract_vs_co, fpa_type, fpa_subtype,
-                budgeted_revenue, budgeted_hours, budgeted_cost
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', wbs_item)
-    
-    # Commit changes and close
-    conn.commit()
+
+    # Connect to database (will create if doesn't exist) and bring the
+    # schema up to date through the same migrations the app runs
+    conn = database.connect(db_path)
+    database.migrate(conn)
+    with database.transaction(conn):
+        for job in SAMPLE_JOBS:
+            try:
+                conn.execute(jobs.INSERT_SQL, job)
+            except sqlite3.IntegrityError:
+                print(f"Job {job[0]} already exists, skipping...")
+        conn.executemany(wbs.INSERT_SQL, SAMPLE_WBS)
     conn.close()
-    
+
     print("✅ Sample database 'job_master.db' created successfully!")
     print("📊 Sample data includes:")
     print("   - 5 sample jobs")
     print("   - WBS data for jobs 20725 and 20726")
     print("   - Various service lines, tasks, and budget information")
 
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=database.DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--jobs", type=int, help="generate this many synthetic jobs instead of the samples")
+    parser.add_argument("--lines", type=int, default=250, help="WBS lines per synthetic job")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.jobs is None:
+        create_sample_database(args.db)
+        return 0
+    conn = database.connect(args.db)
+    database.migrate(conn)
+    try:
+        generate(conn, args.jobs, args.lines, args.seed)
+    except sqlite3.IntegrityError:
+        print(f"❌ {args.db} already has synthetic jobs; use a new database file.")
+        return 1
+    print(f"✅ Generated {args.jobs:,} jobs with {args.jobs * args.lines:,} WBS lines in {args.db}")
+    return 0
+
+
 if __name__ == "__main__":
-    create_sample_database() 
\ No newline at end of file
+    sys.exit(main())
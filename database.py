@@ -0,0 +1,1017 @@
+"""Shared SQLite access for the Project Tracker pages.
+
+Every page talks to ``job_master.db`` through a small process-wide connection
+pool held by ``st.cache_resource``. Connection pragmas are applied once per
+connection and the schema is brought up to date once, when the pool is first
+created, by the versioned migrations below.
+"""
+import functools
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import streamlit as st
+
+import profiling
+
+DB_PATH = os.path.join(os.getcwd(), "job_master.db")
+POOL_SIZE = 4
+BUSY_TIMEOUT_MS = 5000
+# A write still locked out after the busy timeout is retried this many times
+# in all, backing off exponentially (with jitter) from WRITE_RETRY_DELAY seconds.
+WRITE_ATTEMPTS = 4
+WRITE_RETRY_DELAY = 0.1
+
+# --- Schema Migrations ---
+# Each entry is (version, migration). A migration is either a SQL script or a
+# callable taking the connection. Versions are tracked in PRAGMA user_version,
+# so append new entries here and never edit one that has shipped.
+MIGRATIONS = [
+    (1, """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_number TEXT PRIMARY KEY,
+            branch_number TEXT,
+            job_name TEXT,
+            salesforce_id TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS wbs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_number TEXT,
+            service_line TEXT,
+            wbs_task TEXT,
+            wbs_subtask TEXT,
+            qty REAL,
+            unit_of_measure TEXT,
+            contract_vs_co TEXT,
+            fpa_type TEXT,
+            fpa_subtype TEXT,
+            budgeted_revenue REAL,
+            budgeted_hours REAL,
+            budgeted_cost REAL
+        );
+    """),
+    # Portfolio counts for View Data's summary statistics, kept current by
+    # triggers so the page never has to scan wbs. Dimension 'wbs' holds the
+    # total line count; the others hold lines per distinct non-NULL value.
+    (2, """
+        CREATE TABLE wbs_summary (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            line_count INTEGER NOT NULL,
+            PRIMARY KEY (dimension, value)
+        );
+
+        CREATE INDEX wbs_summary_top ON wbs_summary (dimension, line_count);
+
+        CREATE TRIGGER wbs_summary_insert AFTER INSERT ON wbs
+        BEGIN
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'wbs', '', 1 WHERE true
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'job', NEW.job_number, 1 WHERE NEW.job_number IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'service_line', NEW.service_line, 1 WHERE NEW.service_line IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'wbs_task', NEW.wbs_task, 1 WHERE NEW.wbs_task IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+        END;
+
+        CREATE TRIGGER wbs_summary_delete AFTER DELETE ON wbs
+        BEGIN
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'wbs' AND value = '';
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'job' AND value = OLD.job_number;
+            DELETE FROM wbs_summary
+            WHERE dimension = 'job' AND value = OLD.job_number AND line_count <= 0;
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'service_line' AND value = OLD.service_line;
+            DELETE FROM wbs_summary
+            WHERE dimension = 'service_line' AND value = OLD.service_line AND line_count <= 0;
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'wbs_task' AND value = OLD.wbs_task;
+            DELETE FROM wbs_summary
+            WHERE dimension = 'wbs_task' AND value = OLD.wbs_task AND line_count <= 0;
+        END;
+
+        CREATE TRIGGER wbs_summary_update
+        AFTER UPDATE OF job_number, service_line, wbs_task ON wbs
+        BEGIN
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'job' AND value = OLD.job_number;
+            DELETE FROM wbs_summary
+            WHERE dimension = 'job' AND value = OLD.job_number AND line_count <= 0;
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'service_line' AND value = OLD.service_line;
+            DELETE FROM wbs_summary
+            WHERE dimension = 'service_line' AND value = OLD.service_line AND line_count <= 0;
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'wbs_task' AND value = OLD.wbs_task;
+            DELETE FROM wbs_summary
+            WHERE dimension = 'wbs_task' AND value = OLD.wbs_task AND line_count <= 0;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'job', NEW.job_number, 1 WHERE NEW.job_number IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'service_line', NEW.service_line, 1 WHERE NEW.service_line IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'wbs_task', NEW.wbs_task, 1 WHERE NEW.wbs_task IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+        END;
+
+        INSERT INTO wbs_summary (dimension, value, line_count)
+        SELECT 'wbs', '', count(*) FROM wbs
+        UNION ALL
+        SELECT 'job', job_number, count(*) FROM wbs
+        WHERE job_number IS NOT NULL GROUP BY job_number
+        UNION ALL
+        SELECT 'service_line', service_line, count(*) FROM wbs
+        WHERE service_line IS NOT NULL GROUP BY service_line
+        UNION ALL
+        SELECT 'wbs_task', wbs_task, count(*) FROM wbs
+        WHERE wbs_task IS NOT NULL GROUP BY wbs_task;
+    """),
+    # Per-job access paths. wbs_job serves lookups in id order (the rowid is
+    # the implicit last key); wbs_job_sort serves View Data's display order.
+    (3, """
+        CREATE INDEX wbs_job ON wbs (job_number);
+        CREATE INDEX wbs_job_sort ON wbs (job_number, service_line, wbs_task, wbs_subtask);
+        ANALYZE;
+    """),
+    # Full-text index over jobs for the job picker, kept in sync by triggers.
+    # External content: the text lives in jobs, the index maps tokens to rowids.
+    (4, """
+        CREATE VIRTUAL TABLE jobs_fts USING fts5(
+            job_number, job_name, branch_number, salesforce_id,
+            content='jobs', content_rowid='rowid', prefix='2 3'
+        );
+
+        CREATE TRIGGER jobs_fts_insert AFTER INSERT ON jobs
+        BEGIN
+            INSERT INTO jobs_fts (rowid, job_number, job_name, branch_number, salesforce_id)
+            VALUES (NEW.rowid, NEW.job_number, NEW.job_name, NEW.branch_number, NEW.salesforce_id);
+        END;
+
+        CREATE TRIGGER jobs_fts_delete AFTER DELETE ON jobs
+        BEGIN
+            INSERT INTO jobs_fts (jobs_fts, rowid, job_number, job_name, branch_number, salesforce_id)
+            VALUES ('delete', OLD.rowid, OLD.job_number, OLD.job_name, OLD.branch_number, OLD.salesforce_id);
+        END;
+
+        CREATE TRIGGER jobs_fts_update AFTER UPDATE ON jobs
+        BEGIN
+            INSERT INTO jobs_fts (jobs_fts, rowid, job_number, job_name, branch_number, salesforce_id)
+            VALUES ('delete', OLD.rowid, OLD.job_number, OLD.job_name, OLD.branch_number, OLD.salesforce_id);
+            INSERT INTO jobs_fts (rowid, job_number, job_name, branch_number, salesforce_id)
+            VALUES (NEW.rowid, NEW.job_number, NEW.job_name, NEW.branch_number, NEW.salesforce_id);
+        END;
+
+        INSERT INTO jobs_fts (jobs_fts) VALUES ('rebuild');
+    """),
+    # Adds FPA type to wbs_summary and indexes jobs by branch, so the export
+    # filter lists can be read without scanning wbs.
+    (5, """
+        CREATE INDEX jobs_branch ON jobs (branch_number);
+
+        DROP TRIGGER wbs_summary_insert;
+        DROP TRIGGER wbs_summary_delete;
+        DROP TRIGGER wbs_summary_update;
+
+        CREATE TRIGGER wbs_summary_insert AFTER INSERT ON wbs
+        BEGIN
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'wbs', '', 1 WHERE true
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'job', NEW.job_number, 1 WHERE NEW.job_number IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'service_line', NEW.service_line, 1 WHERE NEW.service_line IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'wbs_task', NEW.wbs_task, 1 WHERE NEW.wbs_task IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'fpa_type', NEW.fpa_type, 1 WHERE NEW.fpa_type IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+        END;
+
+        CREATE TRIGGER wbs_summary_delete AFTER DELETE ON wbs
+        BEGIN
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'wbs' AND value = '';
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'job' AND value = OLD.job_number;
+            DELETE FROM wbs_summary
+            WHERE dimension = 'job' AND value = OLD.job_number AND line_count <= 0;
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'service_line' AND value = OLD.service_line;
+            DELETE FROM wbs_summary
+            WHERE dimension = 'service_line' AND value = OLD.service_line AND line_count <= 0;
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'wbs_task' AND value = OLD.wbs_task;
+            DELETE FROM wbs_summary
+            WHERE dimension = 'wbs_task' AND value = OLD.wbs_task AND line_count <= 0;
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'fpa_type' AND value = OLD.fpa_type;
+            DELETE FROM wbs_summary
+            WHERE dimension = 'fpa_type' AND value = OLD.fpa_type AND line_count <= 0;
+        END;
+
+        CREATE TRIGGER wbs_summary_update
+        AFTER UPDATE OF job_number, service_line, wbs_task, fpa_type ON wbs
+        BEGIN
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'job' AND value = OLD.job_number;
+            DELETE FROM wbs_summary
+            WHERE dimension = 'job' AND value = OLD.job_number AND line_count <= 0;
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'service_line' AND value = OLD.service_line;
+            DELETE FROM wbs_summary
+            WHERE dimension = 'service_line' AND value = OLD.service_line AND line_count <= 0;
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'wbs_task' AND value = OLD.wbs_task;
+            DELETE FROM wbs_summary
+            WHERE dimension = 'wbs_task' AND value = OLD.wbs_task AND line_count <= 0;
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'fpa_type' AND value = OLD.fpa_type;
+            DELETE FROM wbs_summary
+            WHERE dimension = 'fpa_type' AND value = OLD.fpa_type AND line_count <= 0;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'job', NEW.job_number, 1 WHERE NEW.job_number IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'service_line', NEW.service_line, 1 WHERE NEW.service_line IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'wbs_task', NEW.wbs_task, 1 WHERE NEW.wbs_task IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'fpa_type', NEW.fpa_type, 1 WHERE NEW.fpa_type IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+        END;
+
+        INSERT INTO wbs_summary (dimension, value, line_count)
+        SELECT 'fpa_type', fpa_type, count(*) FROM wbs
+        WHERE fpa_type IS NOT NULL GROUP BY fpa_type;
+    """),
+    # Bulk loads set a row in wbs_bulk_load inside their transaction; the
+    # per-row insert trigger then stands aside and summary.bulk_insert adds
+    # the loaded rows' counts in one grouped pass before committing.
+    (6, """
+        CREATE TABLE wbs_bulk_load (started INTEGER);
+
+        DROP TRIGGER wbs_summary_insert;
+
+        CREATE TRIGGER wbs_summary_insert AFTER INSERT ON wbs
+        WHEN NOT EXISTS (SELECT 1 FROM wbs_bulk_load)
+        BEGIN
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'wbs', '', 1 WHERE true
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'job', NEW.job_number, 1 WHERE NEW.job_number IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'service_line', NEW.service_line, 1 WHERE NEW.service_line IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'wbs_task', NEW.wbs_task, 1 WHERE NEW.wbs_task IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'fpa_type', NEW.fpa_type, 1 WHERE NEW.fpa_type IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+        END;
+    """),
+    # View Data's facet lists: each filterable column gets an index led by
+    # job_number so its distinct values are read in order from the index.
+    (7, """
+        CREATE INDEX wbs_job_task ON wbs (job_number, wbs_task);
+        CREATE INDEX wbs_job_contract ON wbs (job_number, contract_vs_co);
+        CREATE INDEX wbs_job_fpa ON wbs (job_number, fpa_type, fpa_subtype);
+        ANALYZE;
+    """),
+    # Write generation for the shared query cache (cache.py): bumped by every
+    # change to jobs or wbs, so cached results are keyed by the data they saw.
+    # Bulk loads skip the per-row bump and bump once (summary.bulk_insert).
+    (8, """
+        CREATE TABLE data_generation (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation INTEGER NOT NULL
+        );
+        INSERT INTO data_generation (id, generation) VALUES (1, 0);
+
+        CREATE TRIGGER jobs_generation_insert AFTER INSERT ON jobs
+        BEGIN
+            UPDATE data_generation SET generation = generation + 1 WHERE id = 1;
+        END;
+
+        CREATE TRIGGER jobs_generation_update AFTER UPDATE ON jobs
+        BEGIN
+            UPDATE data_generation SET generation = generation + 1 WHERE id = 1;
+        END;
+
+        CREATE TRIGGER jobs_generation_delete AFTER DELETE ON jobs
+        BEGIN
+            UPDATE data_generation SET generation = generation + 1 WHERE id = 1;
+        END;
+
+        CREATE TRIGGER wbs_generation_insert AFTER INSERT ON wbs
+        WHEN NOT EXISTS (SELECT 1 FROM wbs_bulk_load)
+        BEGIN
+            UPDATE data_generation SET generation = generation + 1 WHERE id = 1;
+        END;
+
+        CREATE TRIGGER wbs_generation_update AFTER UPDATE ON wbs
+        BEGIN
+            UPDATE data_generation SET generation = generation + 1 WHERE id = 1;
+        END;
+
+        CREATE TRIGGER wbs_generation_delete AFTER DELETE ON wbs
+        BEGIN
+            UPDATE data_generation SET generation = generation + 1 WHERE id = 1;
+        END;
+    """),
+    # Repeated WBS text moves into lookup tables with integer keys in wbs.
+    # Readers and writers use the wbs_lines view, which has the old column
+    # names; writing through it adds new lookup values as needed. Triggers and
+    # indexes on wbs are recreated because the table is rebuilt.
+    (9, """
+        CREATE TABLE service_lines (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+        CREATE TABLE units_of_measure (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+        CREATE TABLE contract_types (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+        CREATE TABLE fpa_types (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+        CREATE TABLE fpa_subtypes (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+
+        INSERT INTO service_lines (name)
+        SELECT DISTINCT service_line FROM wbs WHERE service_line IS NOT NULL ORDER BY 1;
+        INSERT INTO units_of_measure (name)
+        SELECT DISTINCT unit_of_measure FROM wbs WHERE unit_of_measure IS NOT NULL ORDER BY 1;
+        INSERT INTO contract_types (name) VALUES ('CO'), ('Contract');
+        INSERT OR IGNORE INTO contract_types (name)
+        SELECT DISTINCT contract_vs_co FROM wbs WHERE contract_vs_co IS NOT NULL ORDER BY 1;
+        INSERT INTO fpa_types (name)
+        SELECT DISTINCT fpa_type FROM wbs WHERE fpa_type IS NOT NULL ORDER BY 1;
+        INSERT INTO fpa_subtypes (name)
+        SELECT DISTINCT fpa_subtype FROM wbs WHERE fpa_subtype IS NOT NULL ORDER BY 1;
+
+        CREATE TABLE wbs_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_number TEXT,
+            service_line_id INTEGER REFERENCES service_lines (id),
+            wbs_task TEXT,
+            wbs_subtask TEXT,
+            qty REAL,
+            unit_of_measure_id INTEGER REFERENCES units_of_measure (id),
+            contract_vs_co_id INTEGER REFERENCES contract_types (id),
+            fpa_type_id INTEGER REFERENCES fpa_types (id),
+            fpa_subtype_id INTEGER REFERENCES fpa_subtypes (id),
+            budgeted_revenue REAL,
+            budgeted_hours REAL,
+            budgeted_cost REAL
+        );
+
+        INSERT INTO wbs_new
+        SELECT w.id, w.job_number, sl.id, w.wbs_task, w.wbs_subtask, w.qty, u.id, ct.id,
+               ft.id, fs.id, w.budgeted_revenue, w.budgeted_hours, w.budgeted_cost
+        FROM wbs AS w
+        LEFT JOIN service_lines AS sl ON sl.name = w.service_line
+        LEFT JOIN units_of_measure AS u ON u.name = w.unit_of_measure
+        LEFT JOIN contract_types AS ct ON ct.name = w.contract_vs_co
+        LEFT JOIN fpa_types AS ft ON ft.name = w.fpa_type
+        LEFT JOIN fpa_subtypes AS fs ON fs.name = w.fpa_subtype
+        ORDER BY w.id;
+
+        -- Carry the AUTOINCREMENT high-water mark over so deleted ids stay retired.
+        DELETE FROM sqlite_sequence WHERE name = 'wbs_new';
+        UPDATE sqlite_sequence SET name = 'wbs_new' WHERE name = 'wbs';
+        DROP TABLE wbs;
+        ALTER TABLE wbs_new RENAME TO wbs;
+
+        CREATE INDEX wbs_job ON wbs (job_number);
+        CREATE INDEX wbs_job_sort ON wbs (job_number, service_line_id, wbs_task, wbs_subtask);
+        CREATE INDEX wbs_job_task ON wbs (job_number, wbs_task);
+        CREATE INDEX wbs_job_contract ON wbs (job_number, contract_vs_co_id);
+        CREATE INDEX wbs_job_fpa ON wbs (job_number, fpa_type_id, fpa_subtype_id);
+
+        CREATE VIEW wbs_lines AS
+        SELECT w.id, w.job_number, service_lines.name AS service_line, w.wbs_task, w.wbs_subtask,
+               w.qty, units_of_measure.name AS unit_of_measure, contract_types.name AS contract_vs_co,
+               fpa_types.name AS fpa_type, fpa_subtypes.name AS fpa_subtype,
+               w.budgeted_revenue, w.budgeted_hours, w.budgeted_cost,
+               w.service_line_id, w.unit_of_measure_id, w.contract_vs_co_id,
+               w.fpa_type_id, w.fpa_subtype_id
+        FROM wbs AS w
+        LEFT JOIN service_lines ON service_lines.id = w.service_line_id
+        LEFT JOIN units_of_measure ON units_of_measure.id = w.unit_of_measure_id
+        LEFT JOIN contract_types ON contract_types.id = w.contract_vs_co_id
+        LEFT JOIN fpa_types ON fpa_types.id = w.fpa_type_id
+        LEFT JOIN fpa_subtypes ON fpa_subtypes.id = w.fpa_subtype_id;
+
+        CREATE TRIGGER wbs_lines_insert INSTEAD OF INSERT ON wbs_lines
+        BEGIN
+            INSERT OR IGNORE INTO service_lines (name) SELECT NEW.service_line WHERE NEW.service_line IS NOT NULL;
+            INSERT OR IGNORE INTO units_of_measure (name) SELECT NEW.unit_of_measure WHERE NEW.unit_of_measure IS NOT NULL;
+            INSERT OR IGNORE INTO contract_types (name) SELECT NEW.contract_vs_co WHERE NEW.contract_vs_co IS NOT NULL;
+            INSERT OR IGNORE INTO fpa_types (name) SELECT NEW.fpa_type WHERE NEW.fpa_type IS NOT NULL;
+            INSERT OR IGNORE INTO fpa_subtypes (name) SELECT NEW.fpa_subtype WHERE NEW.fpa_subtype IS NOT NULL;
+            INSERT INTO wbs (
+                job_number, service_line_id, wbs_task, wbs_subtask, qty, unit_of_measure_id,
+                contract_vs_co_id, fpa_type_id, fpa_subtype_id,
+                budgeted_revenue, budgeted_hours, budgeted_cost
+            ) VALUES (
+                NEW.job_number,
+                (SELECT id FROM service_lines WHERE name = NEW.service_line),
+                NEW.wbs_task, NEW.wbs_subtask, NEW.qty,
+                (SELECT id FROM units_of_measure WHERE name = NEW.unit_of_measure),
+                (SELECT id FROM contract_types WHERE name = NEW.contract_vs_co),
+                (SELECT id FROM fpa_types WHERE name = NEW.fpa_type),
+                (SELECT id FROM fpa_subtypes WHERE name = NEW.fpa_subtype),
+                NEW.budgeted_revenue, NEW.budgeted_hours, NEW.budgeted_cost
+            );
+        END;
+
+        CREATE TRIGGER wbs_lines_update INSTEAD OF UPDATE ON wbs_lines
+        BEGIN
+            INSERT OR IGNORE INTO service_lines (name) SELECT NEW.service_line WHERE NEW.service_line IS NOT NULL;
+            INSERT OR IGNORE INTO units_of_measure (name) SELECT NEW.unit_of_measure WHERE NEW.unit_of_measure IS NOT NULL;
+            INSERT OR IGNORE INTO contract_types (name) SELECT NEW.contract_vs_co WHERE NEW.contract_vs_co IS NOT NULL;
+            INSERT OR IGNORE INTO fpa_types (name) SELECT NEW.fpa_type WHERE NEW.fpa_type IS NOT NULL;
+            INSERT OR IGNORE INTO fpa_subtypes (name) SELECT NEW.fpa_subtype WHERE NEW.fpa_subtype IS NOT NULL;
+            UPDATE wbs SET
+                job_number = NEW.job_number,
+                service_line_id = (SELECT id FROM service_lines WHERE name = NEW.service_line),
+                wbs_task = NEW.wbs_task,
+                wbs_subtask = NEW.wbs_subtask,
+                qty = NEW.qty,
+                unit_of_measure_id = (SELECT id FROM units_of_measure WHERE name = NEW.unit_of_measure),
+                contract_vs_co_id = (SELECT id FROM contract_types WHERE name = NEW.contract_vs_co),
+                fpa_type_id = (SELECT id FROM fpa_types WHERE name = NEW.fpa_type),
+                fpa_subtype_id = (SELECT id FROM fpa_subtypes WHERE name = NEW.fpa_subtype),
+                budgeted_revenue = NEW.budgeted_revenue,
+                budgeted_hours = NEW.budgeted_hours,
+                budgeted_cost = NEW.budgeted_cost
+            WHERE id = OLD.id;
+        END;
+
+        CREATE TRIGGER wbs_summary_insert AFTER INSERT ON wbs
+        WHEN NOT EXISTS (SELECT 1 FROM wbs_bulk_load)
+        BEGIN
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'wbs', '', 1 WHERE true
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'job', NEW.job_number, 1 WHERE NEW.job_number IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'service_line', name, 1 FROM service_lines WHERE id = NEW.service_line_id
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'wbs_task', NEW.wbs_task, 1 WHERE NEW.wbs_task IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'fpa_type', name, 1 FROM fpa_types WHERE id = NEW.fpa_type_id
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+        END;
+
+        CREATE TRIGGER wbs_summary_delete AFTER DELETE ON wbs
+        BEGIN
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'wbs' AND value = '';
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'job' AND value = OLD.job_number;
+            DELETE FROM wbs_summary
+            WHERE dimension = 'job' AND value = OLD.job_number AND line_count <= 0;
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'service_line' AND value = (SELECT name FROM service_lines WHERE id = OLD.service_line_id);
+            DELETE FROM wbs_summary
+            WHERE dimension = 'service_line' AND value = (SELECT name FROM service_lines WHERE id = OLD.service_line_id)
+                AND line_count <= 0;
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'wbs_task' AND value = OLD.wbs_task;
+            DELETE FROM wbs_summary
+            WHERE dimension = 'wbs_task' AND value = OLD.wbs_task AND line_count <= 0;
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'fpa_type' AND value = (SELECT name FROM fpa_types WHERE id = OLD.fpa_type_id);
+            DELETE FROM wbs_summary
+            WHERE dimension = 'fpa_type' AND value = (SELECT name FROM fpa_types WHERE id = OLD.fpa_type_id)
+                AND line_count <= 0;
+        END;
+
+        CREATE TRIGGER wbs_summary_update
+        AFTER UPDATE OF job_number, service_line_id, wbs_task, fpa_type_id ON wbs
+        BEGIN
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'job' AND value = OLD.job_number;
+            DELETE FROM wbs_summary
+            WHERE dimension = 'job' AND value = OLD.job_number AND line_count <= 0;
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'service_line' AND value = (SELECT name FROM service_lines WHERE id = OLD.service_line_id);
+            DELETE FROM wbs_summary
+            WHERE dimension = 'service_line' AND value = (SELECT name FROM service_lines WHERE id = OLD.service_line_id)
+                AND line_count <= 0;
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'wbs_task' AND value = OLD.wbs_task;
+            DELETE FROM wbs_summary
+            WHERE dimension = 'wbs_task' AND value = OLD.wbs_task AND line_count <= 0;
+            UPDATE wbs_summary SET line_count = line_count - 1
+            WHERE dimension = 'fpa_type' AND value = (SELECT name FROM fpa_types WHERE id = OLD.fpa_type_id);
+            DELETE FROM wbs_summary
+            WHERE dimension = 'fpa_type' AND value = (SELECT name FROM fpa_types WHERE id = OLD.fpa_type_id)
+                AND line_count <= 0;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'job', NEW.job_number, 1 WHERE NEW.job_number IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'service_line', name, 1 FROM service_lines WHERE id = NEW.service_line_id
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'wbs_task', NEW.wbs_task, 1 WHERE NEW.wbs_task IS NOT NULL
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+            INSERT INTO wbs_summary (dimension, value, line_count)
+            SELECT 'fpa_type', name, 1 FROM fpa_types WHERE id = NEW.fpa_type_id
+            ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + 1;
+        END;
+
+        CREATE TRIGGER wbs_generation_insert AFTER INSERT ON wbs
+        WHEN NOT EXISTS (SELECT 1 FROM wbs_bulk_load)
+        BEGIN
+            UPDATE data_generation SET generation = generation + 1 WHERE id = 1;
+        END;
+
+        CREATE TRIGGER wbs_generation_update AFTER UPDATE ON wbs
+        BEGIN
+            UPDATE data_generation SET generation = generation + 1 WHERE id = 1;
+        END;
+
+        CREATE TRIGGER wbs_generation_delete AFTER DELETE ON wbs
+        BEGIN
+            UPDATE data_generation SET generation = generation + 1 WHERE id = 1;
+        END;
+
+        UPDATE data_generation SET generation = generation + 1 WHERE id = 1;
+        ANALYZE;
+    """),
+    # Row versions for optimistic concurrency: every update through wbs_lines
+    # increments the row's version, and a save checks the versions it loaded
+    # before writing (wbs.save_changes).
+    (10, """
+        ALTER TABLE wbs ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+
+        DROP VIEW wbs_lines;
+
+        CREATE VIEW wbs_lines AS
+        SELECT w.id, w.job_number, service_lines.name AS service_line, w.wbs_task, w.wbs_subtask,
+               w.qty, units_of_measure.name AS unit_of_measure, contract_types.name AS contract_vs_co,
+               fpa_types.name AS fpa_type, fpa_subtypes.name AS fpa_subtype,
+               w.budgeted_revenue, w.budgeted_hours, w.budgeted_cost, w.version,
+               w.service_line_id, w.unit_of_measure_id, w.contract_vs_co_id,
+               w.fpa_type_id, w.fpa_subtype_id
+        FROM wbs AS w
+        LEFT JOIN service_lines ON service_lines.id = w.service_line_id
+        LEFT JOIN units_of_measure ON units_of_measure.id = w.unit_of_measure_id
+        LEFT JOIN contract_types ON contract_types.id = w.contract_vs_co_id
+        LEFT JOIN fpa_types ON fpa_types.id = w.fpa_type_id
+        LEFT JOIN fpa_subtypes ON fpa_subtypes.id = w.fpa_subtype_id;
+
+        CREATE TRIGGER wbs_lines_insert INSTEAD OF INSERT ON wbs_lines
+        BEGIN
+            INSERT OR IGNORE INTO service_lines (name) SELECT NEW.service_line WHERE NEW.service_line IS NOT NULL;
+            INSERT OR IGNORE INTO units_of_measure (name) SELECT NEW.unit_of_measure WHERE NEW.unit_of_measure IS NOT NULL;
+            INSERT OR IGNORE INTO contract_types (name) SELECT NEW.contract_vs_co WHERE NEW.contract_vs_co IS NOT NULL;
+            INSERT OR IGNORE INTO fpa_types (name) SELECT NEW.fpa_type WHERE NEW.fpa_type IS NOT NULL;
+            INSERT OR IGNORE INTO fpa_subtypes (name) SELECT NEW.fpa_subtype WHERE NEW.fpa_subtype IS NOT NULL;
+            INSERT INTO wbs (
+                job_number, service_line_id, wbs_task, wbs_subtask, qty, unit_of_measure_id,
+                contract_vs_co_id, fpa_type_id, fpa_subtype_id,
+                budgeted_revenue, budgeted_hours, budgeted_cost
+            ) VALUES (
+                NEW.job_number,
+                (SELECT id FROM service_lines WHERE name = NEW.service_line),
+                NEW.wbs_task, NEW.wbs_subtask, NEW.qty,
+                (SELECT id FROM units_of_measure WHERE name = NEW.unit_of_measure),
+                (SELECT id FROM contract_types WHERE name = NEW.contract_vs_co),
+                (SELECT id FROM fpa_types WHERE name = NEW.fpa_type),
+                (SELECT id FROM fpa_subtypes WHERE name = NEW.fpa_subtype),
+                NEW.budgeted_revenue, NEW.budgeted_hours, NEW.budgeted_cost
+            );
+        END;
+
+        CREATE TRIGGER wbs_lines_update INSTEAD OF UPDATE ON wbs_lines
+        BEGIN
+            INSERT OR IGNORE INTO service_lines (name) SELECT NEW.service_line WHERE NEW.service_line IS NOT NULL;
+            INSERT OR IGNORE INTO units_of_measure (name) SELECT NEW.unit_of_measure WHERE NEW.unit_of_measure IS NOT NULL;
+            INSERT OR IGNORE INTO contract_types (name) SELECT NEW.contract_vs_co WHERE NEW.contract_vs_co IS NOT NULL;
+            INSERT OR IGNORE INTO fpa_types (name) SELECT NEW.fpa_type WHERE NEW.fpa_type IS NOT NULL;
+            INSERT OR IGNORE INTO fpa_subtypes (name) SELECT NEW.fpa_subtype WHERE NEW.fpa_subtype IS NOT NULL;
+            UPDATE wbs SET
+                job_number = NEW.job_number,
+                service_line_id = (SELECT id FROM service_lines WHERE name = NEW.service_line),
+                wbs_task = NEW.wbs_task,
+                wbs_subtask = NEW.wbs_subtask,
+                qty = NEW.qty,
+                unit_of_measure_id = (SELECT id FROM units_of_measure WHERE name = NEW.unit_of_measure),
+                contract_vs_co_id = (SELECT id FROM contract_types WHERE name = NEW.contract_vs_co),
+                fpa_type_id = (SELECT id FROM fpa_types WHERE name = NEW.fpa_type),
+                fpa_subtype_id = (SELECT id FROM fpa_subtypes WHERE name = NEW.fpa_subtype),
+                budgeted_revenue = NEW.budgeted_revenue,
+                budgeted_hours = NEW.budgeted_hours,
+                budgeted_cost = NEW.budgeted_cost,
+                version = OLD.version + 1
+            WHERE id = OLD.id;
+        END;
+    """),
+    # Jobs whose WBS lines or branch changed, stamped with the write
+    # generation, so the columnar snapshot (snapshot.py) reloads only those
+    # jobs. One row per job; bulk loads log their jobs in summary.bulk_insert.
+    (11, """
+        CREATE TABLE wbs_changed_jobs (
+            job_number TEXT PRIMARY KEY,
+            generation INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX wbs_changed_jobs_generation ON wbs_changed_jobs (generation);
+
+        CREATE TRIGGER wbs_changes_insert AFTER INSERT ON wbs
+        WHEN NOT EXISTS (SELECT 1 FROM wbs_bulk_load)
+        BEGIN
+            INSERT INTO wbs_changed_jobs (job_number, generation)
+            VALUES (NEW.job_number, (SELECT generation FROM data_generation WHERE id = 1))
+            ON CONFLICT (job_number) DO UPDATE SET generation = excluded.generation;
+        END;
+
+        CREATE TRIGGER wbs_changes_update AFTER UPDATE ON wbs
+        BEGIN
+            INSERT INTO wbs_changed_jobs (job_number, generation)
+            VALUES (OLD.job_number, (SELECT generation FROM data_generation WHERE id = 1))
+            ON CONFLICT (job_number) DO UPDATE SET generation = excluded.generation;
+            INSERT INTO wbs_changed_jobs (job_number, generation)
+            VALUES (NEW.job_number, (SELECT generation FROM data_generation WHERE id = 1))
+            ON CONFLICT (job_number) DO UPDATE SET generation = excluded.generation;
+        END;
+
+        CREATE TRIGGER wbs_changes_delete AFTER DELETE ON wbs
+        BEGIN
+            INSERT INTO wbs_changed_jobs (job_number, generation)
+            VALUES (OLD.job_number, (SELECT generation FROM data_generation WHERE id = 1))
+            ON CONFLICT (job_number) DO UPDATE SET generation = excluded.generation;
+        END;
+
+        CREATE TRIGGER jobs_changes_update AFTER UPDATE ON jobs
+        BEGIN
+            INSERT INTO wbs_changed_jobs (job_number, generation)
+            VALUES (OLD.job_number, (SELECT generation FROM data_generation WHERE id = 1))
+            ON CONFLICT (job_number) DO UPDATE SET generation = excluded.generation;
+            INSERT INTO wbs_changed_jobs (job_number, generation)
+            VALUES (NEW.job_number, (SELECT generation FROM data_generation WHERE id = 1))
+            ON CONFLICT (job_number) DO UPDATE SET generation = excluded.generation;
+        END;
+
+        CREATE TRIGGER jobs_changes_delete AFTER DELETE ON jobs
+        BEGIN
+            INSERT INTO wbs_changed_jobs (job_number, generation)
+            VALUES (OLD.job_number, (SELECT generation FROM data_generation WHERE id = 1))
+            ON CONFLICT (job_number) DO UPDATE SET generation = excluded.generation;
+        END;
+    """),
+    # Background tasks (tasks.py). Nothing triggers on this table, so task
+    # progress updates never invalidate cached page queries.
+    (12, """
+        CREATE TABLE tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            label TEXT NOT NULL,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued'
+                CHECK (status IN ('queued', 'running', 'done', 'failed')),
+            progress REAL,
+            message TEXT,
+            result TEXT,
+            created REAL NOT NULL,
+            started REAL,
+            finished REAL
+        );
+        CREATE INDEX tasks_kind ON tasks (kind, id);
+        CREATE INDEX tasks_status ON tasks (status);
+    """),
+    # The HTTP API (api.py) pages through a branch's jobs in job number order;
+    # with job_number in the branch index that needs no sort.
+    (13, """
+        DROP INDEX jobs_branch;
+        CREATE INDEX jobs_branch ON jobs (branch_number, job_number);
+    """),
+    # WBS revision history (history.py). Each save of a job adds a revision:
+    # a full copy of its lines at a checkpoint, otherwise only the lines that
+    # changed since the previous revision. Triggers collect those lines in
+    # wbs_unrevised, for jobs that have history; a job's first revision is
+    # always a checkpoint. Line values are stored as in wbs, lookup keys
+    # included.
+    (14, """
+        CREATE TABLE wbs_revisions (
+            id INTEGER PRIMARY KEY,
+            job_number TEXT NOT NULL,
+            revision INTEGER NOT NULL,
+            checkpoint INTEGER NOT NULL,
+            created REAL NOT NULL,
+            summary TEXT,
+            rows INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (job_number, revision)
+        );
+
+        CREATE TABLE wbs_history (
+            revision_id INTEGER NOT NULL,
+            line_id INTEGER NOT NULL,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            service_line_id INTEGER,
+            wbs_task TEXT,
+            wbs_subtask TEXT,
+            qty REAL,
+            unit_of_measure_id INTEGER,
+            contract_vs_co_id INTEGER,
+            fpa_type_id INTEGER,
+            fpa_subtype_id INTEGER,
+            budgeted_revenue REAL,
+            budgeted_hours REAL,
+            budgeted_cost REAL,
+            PRIMARY KEY (revision_id, line_id)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE wbs_unrevised (
+            job_number TEXT NOT NULL,
+            line_id INTEGER NOT NULL,
+            PRIMARY KEY (job_number, line_id)
+        ) WITHOUT ROWID;
+
+        CREATE TRIGGER wbs_unrevised_insert AFTER INSERT ON wbs
+        WHEN NOT EXISTS (SELECT 1 FROM wbs_bulk_load)
+            AND EXISTS (SELECT 1 FROM wbs_revisions WHERE job_number = NEW.job_number)
+        BEGIN
+            INSERT OR IGNORE INTO wbs_unrevised (job_number, line_id) VALUES (NEW.job_number, NEW.id);
+        END;
+
+        CREATE TRIGGER wbs_unrevised_update AFTER UPDATE ON wbs
+        BEGIN
+            INSERT OR IGNORE INTO wbs_unrevised (job_number, line_id)
+            SELECT OLD.job_number, OLD.id
+            WHERE EXISTS (SELECT 1 FROM wbs_revisions WHERE job_number = OLD.job_number);
+            INSERT OR IGNORE INTO wbs_unrevised (job_number, line_id)
+            SELECT NEW.job_number, NEW.id
+            WHERE EXISTS (SELECT 1 FROM wbs_revisions WHERE job_number = NEW.job_number);
+        END;
+
+        CREATE TRIGGER wbs_unrevised_delete AFTER DELETE ON wbs
+        WHEN EXISTS (SELECT 1 FROM wbs_revisions WHERE job_number = OLD.job_number)
+        BEGIN
+            INSERT OR IGNORE INTO wbs_unrevised (job_number, line_id) VALUES (OLD.job_number, OLD.id);
+        END;
+    """),
+    # Budget reconciliation runs (reconcile.py), with their finding and job
+    # counts per check as JSON. Only the latest run keeps its findings; a
+    # job-level finding has no line_id.
+    (15, """
+        CREATE TABLE reconcile_runs (
+            id INTEGER PRIMARY KEY,
+            created REAL NOT NULL,
+            generation INTEGER NOT NULL,
+            jobs INTEGER NOT NULL,
+            lines INTEGER NOT NULL,
+            seconds REAL NOT NULL,
+            workers INTEGER NOT NULL,
+            counts TEXT NOT NULL
+        );
+
+        CREATE TABLE reconcile_findings (
+            run_id INTEGER NOT NULL,
+            check_name TEXT NOT NULL,
+            job_number TEXT NOT NULL,
+            line_id INTEGER,
+            detail TEXT
+        );
+        CREATE INDEX reconcile_findings_check ON reconcile_findings (run_id, check_name, job_number);
+        CREATE INDEX reconcile_findings_job ON reconcile_findings (run_id, job_number);
+    """),
+    # Job lifecycle and the cold archive (archive.py). Closed jobs can be
+    # moved, with their lines and revision history, into archive files next
+    # to the database; archived_jobs records which file holds each one and is
+    # searched like jobs_fts when a page asks for archived jobs. An archived
+    # job number cannot be reused for a new job.
+    (16, """
+        ALTER TABLE jobs ADD COLUMN status TEXT NOT NULL DEFAULT 'open'
+            CHECK (status IN ('open', 'closed'));
+        CREATE INDEX jobs_status ON jobs (status, job_number);
+
+        CREATE TABLE archived_jobs (
+            job_number TEXT PRIMARY KEY,
+            branch_number TEXT,
+            job_name TEXT,
+            salesforce_id TEXT,
+            archive TEXT NOT NULL,
+            archived REAL NOT NULL,
+            lines INTEGER NOT NULL
+        );
+        CREATE INDEX archived_jobs_branch ON archived_jobs (branch_number, job_number);
+        CREATE INDEX archived_jobs_archive ON archived_jobs (archive);
+
+        CREATE VIRTUAL TABLE archived_jobs_fts USING fts5(
+            job_number, job_name, branch_number, salesforce_id,
+            content='archived_jobs', content_rowid='rowid', prefix='2 3'
+        );
+
+        CREATE TRIGGER archived_jobs_fts_insert AFTER INSERT ON archived_jobs
+        BEGIN
+            INSERT INTO archived_jobs_fts (rowid, job_number, job_name, branch_number, salesforce_id)
+            VALUES (NEW.rowid, NEW.job_number, NEW.job_name, NEW.branch_number, NEW.salesforce_id);
+        END;
+
+        CREATE TRIGGER archived_jobs_fts_delete AFTER DELETE ON archived_jobs
+        BEGIN
+            INSERT INTO archived_jobs_fts (archived_jobs_fts, rowid, job_number, job_name, branch_number, salesforce_id)
+            VALUES ('delete', OLD.rowid, OLD.job_number, OLD.job_name, OLD.branch_number, OLD.salesforce_id);
+        END;
+
+        CREATE TRIGGER jobs_not_archived BEFORE INSERT ON jobs
+        WHEN EXISTS (SELECT 1 FROM archived_jobs WHERE job_number = NEW.job_number)
+        BEGIN
+            SELECT RAISE(ABORT, 'job number belongs to an archived job');
+        END;
+    """),
+    # A closed job's lines are read-only for every writer, not just the
+    # pages: saves, imports and scripts alike. Deletes are left to
+    # wbs.save_changes, which rejects closed jobs, because archiving deletes
+    # the lines of closed jobs.
+    (17, """
+        CREATE TRIGGER wbs_closed_insert BEFORE INSERT ON wbs
+        WHEN (SELECT status FROM jobs WHERE job_number = NEW.job_number) = 'closed'
+        BEGIN
+            SELECT RAISE(ABORT, 'job is closed');
+        END;
+
+        CREATE TRIGGER wbs_closed_update BEFORE UPDATE ON wbs
+        WHEN (SELECT status FROM jobs WHERE job_number = OLD.job_number) = 'closed'
+          OR (SELECT status FROM jobs WHERE job_number = NEW.job_number) = 'closed'
+        BEGIN
+            SELECT RAISE(ABORT, 'job is closed');
+        END;
+    """),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+GENERATION_SQL = "SELECT generation FROM data_generation WHERE id = 1"
+BUMP_GENERATION_SQL = "UPDATE data_generation SET generation = generation + 1 WHERE id = 1"
+
+
+def connect(db_path=DB_PATH):
+    """Open a connection to the database with the app's pragmas applied."""
+    # uri=True lets archive.py attach files read-only with "file:...?mode=ro";
+    # plain paths open as before.
+    conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False, uri=True,
+                           factory=profiling.ProfiledConnection)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+@contextmanager
+def transaction(conn, mode="IMMEDIATE"):
+    """Run the enclosed statements as one transaction on an autocommit connection."""
+    conn.execute(f"BEGIN {mode}")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    else:
+        conn.execute("COMMIT")
+
+
+def _is_busy(error):
+    return getattr(error, "sqlite_errorcode", None) in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+
+
+def retry_when_busy(fn):
+    """Retry a function that runs one write transaction while the database is locked.
+
+    The busy timeout already waits for other writers; this covers the rare
+    save that waits longer than that. The wrapped function must be safe to
+    call again, which holds when all of its writes are in one transaction.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            try:
+                return fn(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if attempt == WRITE_ATTEMPTS or not _is_busy(e):
+                    raise
+            time.sleep(WRITE_RETRY_DELAY * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+    return wrapper
+
+
+def _statements(script):
+    """Split a SQL script into complete statements (trigger bodies included)."""
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            if statement.strip():
+                yield statement
+            statement = ""
+    if statement.strip():
+        yield statement
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def data_generation(conn):
+    """Return the write generation, which changes whenever jobs or wbs change."""
+    return conn.execute(GENERATION_SQL).fetchone()[0]
+
+
+def bump_generation(conn):
+    """Invalidate cached reads after a write the generation triggers skip."""
+    conn.execute(BUMP_GENERATION_SQL)
+
+
+def detach_all(conn):
+    """Detach every database attached to the connection."""
+    for _, name, _ in conn.execute("PRAGMA database_list").fetchall():
+        if name not in ("main", "temp"):
+            conn.execute(f"DETACH DATABASE {name}")
+
+
+def migrate(conn, target=None):
+    """Apply any migrations newer than the database's user_version.
+
+    ``target`` stops at that schema version instead of the latest one.
+    """
+    for version, migration in MIGRATIONS:
+        if version <= schema_version(conn):
+            continue
+        if target is not None and version > target:
+            break
+        with transaction(conn):
+            # Another process may have migrated while we waited for the lock.
+            if version <= schema_version(conn):
+                continue
+            if callable(migration):
+                migration(conn)
+            else:
+                for statement in _statements(migration):
+                    conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version}")
+
+
+class ConnectionPool:
+    """A small pool of connections shared by all Streamlit sessions."""
+
+    def __init__(self, db_path=DB_PATH, size=POOL_SIZE):
+        self.db_path = db_path
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = connect(self.db_path)
+            try:
+                yield conn
+            finally:
+                # Never hand the next caller a connection mid-transaction or
+                # with archive files (archive.py) still attached.
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                detach_all(conn)
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+
+@st.cache_resource
+def get_pool(db_path=DB_PATH):
+    """Create the process-wide pool, migrating the schema exactly once."""
+    conn = connect(db_path)
+    migrate(conn)
+    pool = ConnectionPool(db_path)
+    pool._idle.put(conn)
+    return pool
+
+
+def connection():
+    """Borrow a pooled connection: ``with database.connection() as conn: ...``"""
+    return get_pool().connection()
@@ -0,0 +1,241 @@
+"""Streaming WBS export to CSV or Parquet.
+
+Rows are read from SQLite with ``fetchmany`` and written one chunk at a time,
+so memory is bounded by the chunk size rather than by the size of the export.
+Filters combine with AND; each one accepts several values.
+
+    python export.py --out wbs.csv
+    python export.py --out wbs.parquet --branch 0508 --branch 0509 --fpa-type Services
+    python export.py --out coatings.csv --service-line Coatings --chunk-size 20000
+    python export.py --out history.csv --job 20725 --archived     # archived jobs too
+"""
+import argparse
+import io
+import sys
+import tempfile
+
+import pandas as pd
+
+import database
+import wbs
+
+DEFAULT_CHUNK_SIZE = 50_000
+FORMATS = ("csv", "parquet")
+MIME_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+# Database column -> export header. Job columns first, then the WBS columns.
+COLUMNS = {
+    "w.job_number": "Job Number",
+    "j.branch_number": "Branch Number",
+    "j.job_name": "Job Name",
+    **{f"w.{name}": label for name, label in wbs.COLUMNS.items()},
+}
+LABELS = list(COLUMNS.values())
+
+
+def _where(schema=None, job_numbers=(), branches=(), service_lines=(), wbs_tasks=(),
+           contract_vs_co=(), fpa_types=(), fpa_subtypes=()):
+    """Build the WHERE clause over wbs lines aliased w, and its parameters.
+
+    ``schema`` looks values up in an attached archive (archive.py).
+    """
+    clauses, params = [], []
+    # Columns outside wbs_job_sort are written +column so SQLite filters the
+    # rows it streams instead of picking another index and sorting. Lookup
+    # columns are matched on their keys.
+    for column, values in (
+        ("w.job_number", job_numbers),
+        ("w.service_line_id", service_lines),
+        ("+w.wbs_task", wbs_tasks),
+        ("+w.contract_vs_co_id", contract_vs_co),
+        ("+w.fpa_type_id", fpa_types),
+        ("+w.fpa_subtype_id", fpa_subtypes),
+    ):
+        if values:
+            placeholders = ", ".join("?" for _ in values)
+            name = column.lstrip("+").removeprefix("w.").removesuffix("_id")
+            if name in wbs.LOOKUPS:
+                placeholders = f"SELECT id FROM {wbs._table(wbs.LOOKUPS[name], schema)} WHERE name IN ({placeholders})"
+            clauses.append(f"{column} IN ({placeholders})")
+            params.extend(values)
+    if branches:
+        # As a job_number subquery the branch filter feeds index lookups in
+        # job order; filtering on the joined j.branch_number forces a sort.
+        clauses.append(f"""w.job_number IN (
+            SELECT job_number FROM {wbs._table("jobs", schema)}
+            WHERE branch_number IN ({', '.join('?' for _ in branches)})
+        )""")
+        params.extend(branches)
+    return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+
+def export_query(schema=None, **filters):
+    """Build the export SELECT and its parameters for the given filters.
+
+    Rows come back per job in View Data's display order, grouped by service
+    line, which the wbs_job_sort index serves without a sort, so SQLite streams them instead
+    of materializing the result. ``schema`` reads an attached archive instead
+    of the main database.
+    """
+    where, params = _where(schema, **filters)
+    sql = f"""
+        SELECT {", ".join(COLUMNS)}
+        FROM {wbs._table("wbs_lines", schema)} AS w
+        LEFT JOIN {wbs._table("jobs", schema)} AS j ON j.job_number = w.job_number
+        {where}
+        ORDER BY w.job_number, w.service_line_id, w.wbs_task, w.wbs_subtask, w.id
+    """
+    return sql, params
+
+
+def count_query(schema=None, **filters):
+    """Build a SELECT counting the lines export_query would return.
+
+    Counts the wbs table itself: the joins only add columns, never rows.
+    """
+    where, params = _where(schema, **filters)
+    return f"SELECT count(*) FROM {wbs._table('wbs', schema)} AS w {where}", params
+
+
+def _archives(conn):
+    """Attach each archive file in turn, yielding its schema name."""
+    import archive
+
+    for name, *_ in archive.files(conn):
+        with archive.attached(conn, name) as schema:
+            yield schema
+
+
+def _chunks(conn, chunk_size, schema, filters):
+    cursor = conn.execute(*export_query(schema, **filters))
+    try:
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield pd.DataFrame(rows, columns=LABELS)
+    finally:
+        # An open statement would keep its archive from being detached.
+        cursor.close()
+
+
+def iter_chunks(conn, chunk_size=DEFAULT_CHUNK_SIZE, archived=False, **filters):
+    """Yield the matching WBS lines as DataFrames of at most chunk_size rows.
+
+    ``archived`` adds archived jobs' lines after the main database's, one
+    archive file at a time.
+    """
+    yield from _chunks(conn, chunk_size, None, filters)
+    if archived:
+        for schema in _archives(conn):
+            yield from _chunks(conn, chunk_size, schema, filters)
+
+
+def count_rows(conn, archived=False, **filters):
+    """Return how many WBS lines an export with these filters would write."""
+    rows = conn.execute(*count_query(**filters)).fetchone()[0]
+    if archived:
+        for schema in _archives(conn):
+            rows += conn.execute(*count_query(schema, **filters)).fetchone()[0]
+    return rows
+
+
+def _reporting(chunks, progress):
+    rows = 0
+    for chunk in chunks:
+        yield chunk
+        rows += len(chunk)
+        progress(rows)
+
+
+def write_csv(chunks, out):
+    """Write chunks to a binary stream as one CSV; returns the row count."""
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+    rows = 0
+    for chunk in chunks:
+        chunk.to_csv(text, header=rows == 0, index=False)
+        rows += len(chunk)
+    if rows == 0:
+        pd.DataFrame(columns=LABELS).to_csv(text, index=False)
+    text.flush()
+    text.detach()
+    return rows
+
+
+def write_parquet(chunks, out):
+    """Write chunks to a binary stream as one Parquet file; returns the row count."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        (label, pa.float64() if label in wbs.NUMERIC_COLUMNS else pa.string())
+        for label in LABELS
+    ])
+    rows = 0
+    with pq.ParquetWriter(out, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            rows += len(chunk)
+    return rows
+
+
+def export(conn, out, fmt="csv", chunk_size=DEFAULT_CHUNK_SIZE, progress=None, **filters):
+    """Stream the matching WBS lines to a binary stream; returns the row count.
+
+    ``progress`` is called with the number of rows written after each chunk.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {FORMATS}")
+    writer = write_parquet if fmt == "parquet" else write_csv
+    chunks = iter_chunks(conn, chunk_size, **filters)
+    if progress is not None:
+        chunks = _reporting(chunks, progress)
+    return writer(chunks, out)
+
+
+def export_bytes(fmt="csv", chunk_size=DEFAULT_CHUNK_SIZE, **filters):
+    """Export through a pooled connection; returns the file's contents.
+
+    Used by View Data's download button, which calls it only when clicked.
+    The rows are written to a temporary file, closed once read back, so only
+    the finished file is held in memory.
+    """
+    with tempfile.TemporaryFile() as out:
+        with database.connection() as conn:
+            export(conn, out, fmt, chunk_size, **filters)
+        out.seek(0)
+        return out.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export WBS lines to CSV or Parquet.")
+    parser.add_argument("--out", required=True, help="output file (.csv or .parquet)")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the --out extension")
+    parser.add_argument("--db", default=database.DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--job", dest="job_numbers", action="append", default=[])
+    parser.add_argument("--branch", dest="branches", action="append", default=[])
+    parser.add_argument("--service-line", dest="service_lines", action="append", default=[])
+    parser.add_argument("--wbs-task", dest="wbs_tasks", action="append", default=[])
+    parser.add_argument("--contract-vs-co", dest="contract_vs_co", action="append", default=[])
+    parser.add_argument("--fpa-type", dest="fpa_types", action="append", default=[])
+    parser.add_argument("--fpa-subtype", dest="fpa_subtypes", action="append", default=[])
+    parser.add_argument("--archived", action="store_true", help="include archived jobs (archive.py)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or ("parquet" if args.out.endswith(".parquet") else "csv")
+    conn = database.connect(args.db)
+    database.migrate(conn)
+    with open(args.out, "wb") as out:
+        rows = export(
+            conn, out, fmt, args.chunk_size, archived=args.archived,
+            job_numbers=args.job_numbers, branches=args.branches,
+            service_lines=args.service_lines, wbs_tasks=args.wbs_tasks,
+            contract_vs_co=args.contract_vs_co, fpa_types=args.fpa_types, fpa_subtypes=args.fpa_subtypes,
+        )
+    print(f"✅ Exported {rows:,} WBS lines to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""WBS revision history: every save of a job is kept as a revision.
+
+A revision stores only the lines that changed since the job's previous one,
+with a deleted flag for lines that went away. Every CHECKPOINT_INTERVAL
+revisions, or sooner once the deltas since the last checkpoint hold as many
+rows as the job has lines, the revision is a checkpoint: a full copy of the
+job's lines. Rebuilding a revision reads its checkpoint and the deltas after
+it, so it costs at most a job's worth of checkpoint rows plus one interval of
+deltas, however long the history is.
+
+wbs.save_changes records the revision in the save's transaction. Lines
+changed by anything else in between (an import, a script) are picked up by
+the triggers that fill wbs_unrevised and go into the job's next revision.
+
+    python history.py 20725                 # list the job's revisions
+    python history.py 20725 --show 3        # the job's lines at revision 3
+    python history.py 20725 --diff 1 12     # what changed from revision 1 to 12
+"""
+import argparse
+import sys
+import time
+
+import pandas as pd
+
+import database
+import wbs
+
+CHECKPOINT_INTERVAL = 25
+
+# wbs columns as stored, lookup keys in place of their text.
+STORED = [f"{name}_id" if name in wbs.LOOKUPS else name for name in wbs.COLUMNS]
+_STORED = ", ".join(STORED)
+
+LATEST_SQL = """
+    SELECT revision, checkpoint FROM wbs_revisions
+    WHERE job_number = ?
+    ORDER BY revision DESC LIMIT 1
+"""
+SINCE_CHECKPOINT_SQL = """
+    SELECT coalesce(sum(rows), 0) FROM wbs_revisions
+    WHERE job_number = ? AND revision > ?
+"""
+PENDING_SQL = "SELECT count(*) FROM wbs_unrevised WHERE job_number = ?"
+INSERT_REVISION_SQL = """
+    INSERT INTO wbs_revisions (job_number, revision, checkpoint, created, summary)
+    VALUES (?, ?, ?, ?, ?)
+"""
+CHECKPOINT_ROWS_SQL = f"""
+    INSERT INTO wbs_history (revision_id, line_id, deleted, {_STORED})
+    SELECT ?, id, 0, {_STORED} FROM wbs WHERE job_number = ?
+"""
+DELTA_ROWS_SQL = f"""
+    INSERT INTO wbs_history (revision_id, line_id, deleted, {_STORED})
+    SELECT ?, u.line_id, w.id IS NULL, {", ".join(f"w.{name}" for name in STORED)}
+    FROM wbs_unrevised AS u
+    LEFT JOIN wbs AS w ON w.id = u.line_id AND w.job_number = u.job_number
+    WHERE u.job_number = ?
+"""
+SET_ROWS_SQL = "UPDATE wbs_revisions SET rows = ? WHERE id = ?"
+CLEAR_PENDING_SQL = "DELETE FROM wbs_unrevised WHERE job_number = ?"
+REVISIONS_SQL = """
+    SELECT revision, created, summary, revision = checkpoint, rows
+    FROM wbs_revisions
+    WHERE job_number = ?
+    ORDER BY revision DESC
+"""
+CHECKPOINT_OF_SQL = "SELECT checkpoint FROM wbs_revisions WHERE job_number = ? AND revision = ?"
+_COLUMNS = ", ".join(f"{wbs.LOOKUPS[name]}.name" if name in wbs.LOOKUPS else f"h.{name}"
+                     for name in wbs.COLUMNS)
+_JOINS = "\n".join(
+    f"LEFT JOIN {table} ON {table}.id = h.{name}_id" for name, table in wbs.LOOKUPS.items()
+)
+# The checkpoint and every delta after it up to the revision, oldest first;
+# a line's last row is its state at the revision.
+REBUILD_SQL = f"""
+    SELECT h.line_id, h.deleted, {_COLUMNS}
+    FROM wbs_revisions AS r
+    JOIN wbs_history AS h ON h.revision_id = r.id
+    {_JOINS}
+    WHERE r.job_number = ? AND r.revision BETWEEN ? AND ?
+    ORDER BY r.revision
+"""
+
+
+def record(conn, job_number, summary=None):
+    """Add a revision holding the job's lines as they are now; returns its number.
+
+    Call inside the transaction that wrote the lines.
+    """
+    latest = conn.execute(LATEST_SQL, (job_number,)).fetchone()
+    if latest is None:
+        revision, checkpoint = 1, True
+    else:
+        revision = latest[0] + 1
+        pending = conn.execute(PENDING_SQL, (job_number,)).fetchone()[0]
+        since = conn.execute(SINCE_CHECKPOINT_SQL, (job_number, latest[1])).fetchone()[0]
+        lines = conn.execute(wbs.COUNT_SQL, (job_number,)).fetchone()[0]
+        checkpoint = revision - latest[1] >= CHECKPOINT_INTERVAL or since + pending >= lines
+    base = revision if checkpoint else latest[1]
+    revision_id = conn.execute(INSERT_REVISION_SQL, (job_number, revision, base, time.time(), summary)).lastrowid
+    rows = conn.execute(CHECKPOINT_ROWS_SQL if checkpoint else DELTA_ROWS_SQL, (revision_id, job_number)).rowcount
+    conn.execute(SET_ROWS_SQL, (rows, revision_id))
+    conn.execute(CLEAR_PENDING_SQL, (job_number,))
+    return revision
+
+
+def revisions(conn, job_number):
+    """The job's revisions, newest first."""
+    return pd.DataFrame(conn.execute(REVISIONS_SQL, (job_number,)).fetchall(),
+                        columns=["Revision", "Saved", "Changes", "Checkpoint", "Rows Stored"])
+
+
+def rebuild(conn, job_number, revision):
+    """Return the job's lines as they were at a revision: ``id``, then the display columns."""
+    row = conn.execute(CHECKPOINT_OF_SQL, (job_number, revision)).fetchone()
+    if row is None:
+        raise ValueError(f"Job {job_number} has no revision {revision}")
+    lines = {}
+    for line_id, deleted, *values in conn.execute(REBUILD_SQL, (job_number, row[0], revision)):
+        if deleted:
+            lines.pop(line_id, None)
+        else:
+            lines[line_id] = values
+    df = pd.DataFrame([[line_id] + values for line_id, values in sorted(lines.items())],
+                      columns=["id"] + wbs.LABELS)
+    for label in wbs.NUMERIC_COLUMNS:
+        df[label] = df[label].astype(float)
+    return df
+
+
+def compare(before, after):
+    """Compare two rebuilt revisions, one row per added, removed or changed line.
+
+    Returns ``Change``, ``id``, ``Changed Fields`` describing each changed
+    value, then the line's columns as of ``after`` (``before`` for removed lines).
+    """
+    before, after = before.set_index("id"), after.set_index("id")
+    common = after.index.intersection(before.index)
+    a, b = before.loc[common, wbs.LABELS], after.loc[common, wbs.LABELS]
+    differs = ~((a == b) | (a.isna() & b.isna()))
+    changed = common[differs.any(axis=1).to_numpy()]
+
+    # "Label: old → new" for each changed value, built a column at a time
+    described = pd.Series("", index=changed)
+    for label in wbs.LABELS:
+        mask = differs.loc[changed, label]
+        if mask.any():
+            ids = changed[mask.to_numpy()]
+            text = (label + ": " + a.loc[ids, label].map(_format) + " → " + b.loc[ids, label].map(_format))
+            described[ids] = described[ids].where(described[ids] == "", described[ids] + "; ") + text
+
+    parts = [
+        after.loc[after.index.difference(before.index)].assign(Change="Added", **{"Changed Fields": ""}),
+        before.loc[before.index.difference(after.index)].assign(Change="Removed", **{"Changed Fields": ""}),
+        after.loc[changed].assign(Change="Changed", **{"Changed Fields": described}),
+    ]
+    columns = ["Change", "id", "Changed Fields"] + wbs.LABELS
+    parts = [part.reset_index()[columns] for part in parts if len(part)]
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(parts).sort_values("id", ignore_index=True)
+
+
+def diff(conn, job_number, old, new):
+    """Compare two revisions of a job; see compare."""
+    return compare(rebuild(conn, job_number, old), rebuild(conn, job_number, new))
+
+
+def _format(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return "(blank)"
+    return f"{value:,.2f}" if isinstance(value, float) else str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show a job's WBS revision history.")
+    parser.add_argument("job", help="job number")
+    parser.add_argument("--show", type=int, metavar="REVISION", help="print the job's lines at a revision")
+    parser.add_argument("--diff", type=int, nargs=2, metavar=("OLD", "NEW"), help="compare two revisions")
+    parser.add_argument("--db", default=database.DB_PATH, help="database file (default: %(default)s)")
+    args = parser.parse_args()
+
+    conn = database.connect(args.db)
+    database.migrate(conn)
+    pd.set_option("display.width", 200)
+    try:
+        if args.show is not None:
+            print(rebuild(conn, args.job, args.show).to_string(index=False))
+        elif args.diff:
+            print(diff(conn, args.job, *args.diff).to_string(index=False))
+        else:
+            history = revisions(conn, args.job)
+            history["Saved"] = pd.to_datetime(history["Saved"], unit="s").dt.strftime("%Y-%m-%d %H:%M")
+            print(history.to_string(index=False) if len(history) else f"Job {args.job} has no revisions yet.")
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
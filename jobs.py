@@ -0,0 +1,116 @@
+"""Job lookups shared by the pages."""
+import re
+
+import database
+
+EXISTS_SQL = "SELECT EXISTS (SELECT 1 FROM jobs)"
+FIRST_SQL = "SELECT job_number, job_name FROM jobs ORDER BY job_number LIMIT ?"
+SEARCH_SQL = """
+    SELECT job_number, job_name
+    FROM jobs_fts
+    WHERE jobs_fts MATCH ?
+    ORDER BY rank
+    LIMIT ?
+"""
+BRANCHES_SQL = """
+    SELECT DISTINCT branch_number FROM jobs
+    WHERE branch_number IS NOT NULL
+    ORDER BY branch_number
+"""
+ALL_SQL = "SELECT job_number, branch_number, job_name, salesforce_id FROM jobs ORDER BY job_number"
+GET_SQL = """
+    SELECT job_number, branch_number, job_name, salesforce_id
+    FROM jobs
+    WHERE job_number = ?
+"""
+# Columns an API client may select, in response order.
+FIELDS = ["job_number", "branch_number", "job_name", "salesforce_id"]
+PAGE_SQL = "SELECT {fields} FROM jobs WHERE job_number > ? ORDER BY job_number LIMIT ?"
+BRANCH_PAGE_SQL = """
+    SELECT {fields} FROM jobs
+    WHERE branch_number = ? AND job_number > ?
+    ORDER BY job_number LIMIT ?
+"""
+INSERT_SQL = """
+    INSERT INTO jobs (job_number, branch_number, job_name, salesforce_id)
+    VALUES (?, ?, ?, ?)
+"""
+# A job is open while work is budgeted against it; closed jobs can be archived (archive.py).
+STATUSES = ("open", "closed")
+STATUS_SQL = "SELECT status FROM jobs WHERE job_number = ?"
+SET_STATUS_SQL = "UPDATE jobs SET status = ? WHERE job_number = ?"
+
+
+def has_jobs(conn):
+    return bool(conn.execute(EXISTS_SQL).fetchone()[0])
+
+
+def match_expression(text, branch=None):
+    """Turn free text into an FTS5 query: every word must match as a prefix.
+
+    A branch restricts the match to jobs whose branch number is exactly it.
+    """
+    terms = [f'"{word}"*' for word in re.findall(r"\w+", text)]
+    if branch:
+        terms.insert(0, 'branch_number : "{}"'.format(branch.replace('"', '""')))
+    return " ".join(terms)
+
+
+def search_jobs(conn, text, limit=50, branch=None):
+    """Return up to ``limit`` (job_number, job_name) pairs matching ``text``.
+
+    Words are matched as prefixes of the job number, name, branch number or
+    Salesforce ID. Blank text returns the first jobs by job number.
+    """
+    expression = match_expression(text or "", branch)
+    if not expression:
+        return conn.execute(FIRST_SQL, (limit,)).fetchall()
+    return conn.execute(SEARCH_SQL, (expression, limit)).fetchall()
+
+
+def branches(conn):
+    return [row[0] for row in conn.execute(BRANCHES_SQL)]
+
+
+def all_jobs(conn):
+    return conn.execute(ALL_SQL).fetchall()
+
+
+def get_job(conn, job_number):
+    """Return (job_number, branch_number, job_name, salesforce_id) or None."""
+    return conn.execute(GET_SQL, (job_number,)).fetchone()
+
+
+def page_query(after="", limit=100, branch=None, fields=FIELDS):
+    """Build the SELECT for up to ``limit`` jobs after job number ``after``.
+
+    Keyset pagination: the next page starts after the last job number
+    returned, so every page is an index seek however deep the client pages.
+    """
+    unknown = set(fields) - set(FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown job field(s): {', '.join(sorted(unknown))}")
+    columns = ", ".join(fields)
+    if branch:
+        return BRANCH_PAGE_SQL.format(fields=columns), [branch, after, limit]
+    return PAGE_SQL.format(fields=columns), [after, limit]
+
+
+@database.retry_when_busy
+def insert_job(conn, job_number, branch_number, job_name, salesforce_id):
+    """Insert a job; raises sqlite3.IntegrityError if the job number exists or was archived."""
+    conn.execute(INSERT_SQL, (job_number, branch_number, job_name, salesforce_id))
+
+
+def job_status(conn, job_number):
+    """Return the job's status, or None if there is no such job."""
+    row = conn.execute(STATUS_SQL, (job_number,)).fetchone()
+    return row[0] if row else None
+
+
+@database.retry_when_busy
+def set_status(conn, job_number, status):
+    """Open or close a job; returns False if there is no such job."""
+    if status not in STATUSES:
+        raise ValueError(f"Unknown job status {status!r}; expected one of {', '.join(STATUSES)}")
+    return bool(conn.execute(SET_STATUS_SQL, (status, job_number)).rowcount)
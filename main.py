@@ -1,13 +1,28 @@
+import importlib
+
 import streamlit as st
-from pages import Job_Info as job_info
-from pages import Create_WBS as create_wbs
-from pages import View_Data as view_data
-
-page = st.sidebar.selectbox("Navigate to", ["Job Info", "Create WBS", "View Data"])
-
-if page == "Job Info":
-    job_info.show()
-elif page == "Create WBS":
-    create_wbs.show()
-elif page == "View Data":
-    view_data.show()
+
+import cache
+import profiling
+
+# Sidebar label -> page module. A page is imported the first time it is
+# opened, so starting on Job Info never loads pandas or the WBS modules.
+PAGES = {
+    "Job Info": "pages.Job_Info",
+    "Create WBS": "pages.Create_WBS",
+    "View Data": "pages.View_Data",
+    "Portfolio Rollup": "pages.Portfolio_Rollup",
+}
+
+page = st.sidebar.selectbox("Navigate to", list(PAGES))
+debug = st.sidebar.toggle("Performance debug", help="Time each page section and SQL statement")
+
+with profiling.page(page, enabled=debug) as profile:
+    with profiling.section("page import"):
+        module = importlib.import_module(PAGES[page])
+    module.show()
+if debug:
+    profiling.show_panel(profile)
+
+# Shared query cache effectiveness, across all sessions since startup
+st.sidebar.caption(f"Query cache: {cache.stats().summary()}")
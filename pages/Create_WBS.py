@@ -2,41 +2,76 @@ import streamlit as st
 import sqlite3
 import pandas as pd
 
+import cache
+import database
+import history
+import jobs
+import profiling
+import tasks
+import wbs
+import widgets
+import working_copy
+
 def show():
-    # --- Initialize DB ---
-    import os
-    db_path = os.path.join(os.getcwd(), "job_master.db")
-    conn = sqlite3.connect(db_path, isolation_level=None)
-    c = conn.cursor()
-
-    # --- Create Tables if Not Exists ---
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS jobs (
-            job_number TEXT PRIMARY KEY,
-            branch_number TEXT,
-            job_name TEXT,
-            salesforce_id TEXT
-        )
-    ''')
-    
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS wbs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            job_number TEXT,
-            service_line TEXT,
-            wbs_task TEXT,
-            wbs_subtask TEXT,
-            qty REAL,
-            unit_of_measure TEXT,
-            contract_vs_co TEXT,
-            fpa_type TEXT,
-            fpa_subtype TEXT,
-            budgeted_revenue REAL,
-            budgeted_hours REAL,
-            budgeted_cost REAL
-        )
-    ''')
+    with database.connection() as conn:
+        _render(conn)
+
+
+def _editor_key(job_number):
+    """A data editor key not used before, so pending edits never carry over onto other rows."""
+    version = st.session_state.get("wbs_editor_version", 0) + 1
+    st.session_state["wbs_editor_version"] = version
+    return f"wbs_editor_{job_number}_{version}"
+
+
+def _save(conn, copy, message):
+    """Write the working copy's unsaved lines; returns whether they were saved.
+
+    After a save the copy is dropped and the job read again on the next run.
+    A conflict, or the job having been closed, writes nothing and is kept on
+    the copy, which stops autosaving.
+    """
+    changes = copy.changes()
+    try:
+        wbs.save_changes(conn, copy.job_number, changes)
+    except (wbs.ConflictError, wbs.JobClosedError) as e:
+        copy.conflict = str(e)
+        return False
+    st.session_state["wbs_save_message"] = f"{message} ({changes.summary()})"
+    st.session_state.pop("wbs_copy", None)
+    return True
 
+
+def _autosave(conn, copy):
+    """Save the copy's unsaved lines once editing has paused for AUTOSAVE_SECONDS.
+
+    A fragment that reruns on its own every AUTOSAVE_SECONDS while anything is
+    unsaved; typing in the editor reruns the page, which starts the wait over.
+    """
+    # Fragment reruns happen after the page has returned its connection, so
+    # they borrow their own (as widgets.task_list does).
+    page_conn = {"conn": conn}
+
+    @st.fragment(run_every=working_copy.AUTOSAVE_SECONDS if copy.unsaved else None)
+    def autosave():
+        if copy.due():
+            if page_conn["conn"] is not None:
+                _save(page_conn["conn"], copy, "✅ Autosaved")
+            else:
+                with database.connection() as own:
+                    _save(own, copy, "✅ Autosaved")
+            st.rerun(scope="app")
+        elif copy.unsaved:
+            st.caption(f"✏️ {copy.unsaved:,} unsaved line(s), saved automatically "
+                       f"{working_copy.AUTOSAVE_SECONDS} s after your last edit.")
+        elif copy.last_edit is not None:
+            st.caption("All changes saved.")
+
+    autosave()
+    page_conn["conn"] = None
+
+
+def _render(conn):
     # --- Page Setup ---
     st.set_page_config(page_title="Create/Edit WBS", layout="wide")
     st.title("🧱 Creating/Editing a WBS")
@@ -59,126 +94,188 @@ def show():
     # --- Job Selection ---
     st.subheader("📁 Select Job")
     
-    # Get all jobs for dropdown
-    jobs = c.execute("SELECT job_number, job_name FROM jobs ORDER BY job_number").fetchall()
-    
-    if not jobs:
+    if not cache.read(conn, jobs.has_jobs):
         st.warning("⚠️ No jobs found. Please add jobs in the Job Info tab first.")
         return
     
-    # Create job selection dropdown
-    job_options = [f"{job[0]} - {job[1]}" for job in jobs]
-    selected_job_display = st.selectbox("Select a job to edit WBS:", job_options, index=0)
-    
-    # Extract job number from selected option
-    selected_job_number = selected_job_display.split(" - ")[0]
+    # Search-backed job picker
+    with profiling.section("job picker"):
+        selected_job_number = widgets.job_picker(conn, "Select a job to edit WBS:", key="wbs_job")
+    if selected_job_number is None:
+        return
     
     # Display selected job info
-    job_info = c.execute("SELECT * FROM jobs WHERE job_number = ?", (selected_job_number,)).fetchone()
-    if job_info:
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric("Job Number", job_info[0])
-        with col2:
-            st.metric("Branch Number", job_info[1])
-        with col3:
-            st.metric("Job Name", job_info[2])
-        with col4:
-            st.metric("Salesforce ID", job_info[3] if job_info[3] else "N/A")
+    with profiling.section("job info"):
+        job_info = cache.read(conn, jobs.get_job, selected_job_number)
+        if job_info:
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Job Number", job_info[0])
+            with col2:
+                st.metric("Branch Number", job_info[1])
+            with col3:
+                st.metric("Job Name", job_info[2])
+            with col4:
+                st.metric("Salesforce ID", job_info[3] if job_info[3] else "N/A")
+        closed = cache.read(conn, jobs.job_status, selected_job_number) == "closed"
+        if closed:
+            st.info("🔒 This job is closed. Reopen it in Job Info to change its WBS.")
 
     # --- WBS Data Management ---
     st.subheader("📋 WBS Line Items")
+
+    # Report the outcome of a save from the previous run
+    save_message = st.session_state.pop("wbs_save_message", None)
+    if save_message:
+        st.success(save_message)
     
-    # Get existing WBS data for the selected job
-    try:
-        wbs_data = c.execute("""
-            SELECT service_line, wbs_task, wbs_subtask, qty, unit_of_measure, 
-                   contract_vs_co, fpa_type, fpa_subtype, budgeted_revenue, budgeted_hours, budgeted_cost
-            FROM wbs 
-            WHERE job_number = ?
-            ORDER BY rowid
-        """, (selected_job_number,)).fetchall()
-    except sqlite3.OperationalError as e:
-        if "no such table" in str(e).lower():
-            st.info("📝 No WBS table found. Starting with empty table.")
-            wbs_data = []
-        elif "no such column" in str(e).lower():
-            st.warning("⚠️ Database schema mismatch. Please delete jobs.db and restart the app.")
-            st.info("This will recreate the database with the correct schema.")
-            return
-        else:
-            st.error(f"Database error: {str(e)}")
-            wbs_data = []
-    
-    columns = [
-        "Service Line", "WBS Task", "WBS Subtask", "QTY", "Unit of Measure",
-        "Contract vs CO", "FPA Type", "FPA Subtype", "Budgeted Revenue", "Budgeted Hours", "Budgeted Cost"
-    ]
-    
-    # Prepare DataFrame for editing
-    if wbs_data:
-        df = pd.DataFrame(wbs_data, columns=columns)
-    else:
-        df = pd.DataFrame(columns=columns)
-    
-    edited_df = st.data_editor(
-        df,
-        num_rows="dynamic",
-        use_container_width=True,
-        hide_index=True,
-        key="wbs_editor"
-    )
+    with profiling.section("WBS grid"):
+        # Line count and budget totals of the saved lines, summed by SQLite
+        lines, saved_totals = cache.read(conn, wbs.job_totals, selected_job_number)
+        # Large jobs are edited a page at a time, in id order
+        windowed = lines > wbs.WINDOW_LINES
+        cursor = widgets.page_cursor("wbs_page", selected_job_number) if windowed else None
+        if windowed:
+            st.caption(f"This job has {lines:,} lines, shown {wbs.PAGE_SIZE:,} at a time. Changes to a page "
+                       "are saved when you move to another; new lines are added at the end of the job.")
+
+        # The job's lines (or page) are read once into a working copy kept
+        # with this session's edits, and read again only after a save or once
+        # another session changes the job while this one has nothing unsaved
+        copy = st.session_state.get("wbs_copy")
+        if copy is not None and (copy.job_number, copy.cursor) != (selected_job_number, cursor):
+            # Keep what was typed into the previous job or page before leaving it
+            left = f"job {copy.job_number}" if copy.job_number != selected_job_number else "the previous page"
+            if copy.unsaved and copy.conflict is None:
+                if _save(conn, copy, f"✅ Saved your changes to {left}"):
+                    st.success(st.session_state.pop("wbs_save_message"))
+                    lines, saved_totals = cache.read(conn, wbs.job_totals, selected_job_number)
+                else:
+                    st.warning(f"⚠️ Your changes to {left} were not saved: {copy.conflict}.")
+            copy = None
+        stamp = working_copy.change_stamp(conn, selected_job_number)
+        if copy is None or (stamp != copy.stamp and not copy.unsaved):
+            try:
+                if windowed:
+                    loaded, next_cursor = cache.read(conn, wbs.load_window, selected_job_number, None, cursor)
+                else:
+                    loaded, next_cursor = cache.read(conn, wbs.load_job_wbs, selected_job_number), None
+            except sqlite3.OperationalError as e:
+                if "no such column" in str(e).lower():
+                    st.warning("⚠️ Database schema mismatch. Please delete jobs.db and restart the app.")
+                    st.info("This will recreate the database with the correct schema.")
+                    return
+                st.error(f"Database error: {str(e)}")
+                loaded, next_cursor = pd.DataFrame(columns=["id", "version"] + wbs.LABELS), None
+            copy = working_copy.WorkingCopy(selected_job_number, loaded, _editor_key(selected_job_number),
+                                            stamp, cursor, next_cursor)
+            st.session_state["wbs_copy"] = copy
+        elif copy.has_edits and copy.key not in st.session_state:
+            # The editor forgets its edits when the page is left; start it
+            # from the copy, edits included
+            copy.rebase(_editor_key(selected_job_number))
+
+        st.data_editor(
+            copy.shown,
+            num_rows="dynamic",
+            use_container_width=True,
+            hide_index=True,
+            column_config={"id": None, "version": None},
+            disabled=closed,
+            key=copy.key
+        )
+        copy.apply(st.session_state[copy.key])
+        if closed and copy.unsaved and copy.conflict is None:
+            # Closed by someone else while this session had edits pending
+            copy.conflict = str(wbs.JobClosedError(selected_job_number))
+        if windowed:
+            widgets.pager("wbs_page", copy.next_cursor, len(copy.shown), wbs.PAGE_SIZE, lines)
     
-    # Display totals
-    if not edited_df.empty:
-        # Handle None values and ensure we get numeric values
-        total_revenue = edited_df["Budgeted Revenue"].fillna(0).sum()
-        total_hours = edited_df["Budgeted Hours"].fillna(0).sum()
-        total_cost = edited_df["Budgeted Cost"].fillna(0).sum()
-        
-        # Convert to float to handle any None values
-        total_revenue = float(total_revenue) if total_revenue is not None else 0.0
-        total_hours = float(total_hours) if total_hours is not None else 0.0
-        total_cost = float(total_cost) if total_cost is not None else 0.0
-        
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Total Budgeted Revenue", f"${total_revenue:,.2f}")
-        with col2:
-            st.metric("Total Budgeted Hours", f"{total_hours:,.0f}")
-        with col3:
-            st.metric("Total Budgeted Cost", f"${total_cost:,.2f}")
+    # Display totals: the saved lines' plus the unsaved edits' difference,
+    # which the working copy keeps as rows change
+    with profiling.section("totals"):
+        if lines or len(copy):
+            totals = {label: saved_totals[label] + change for label, change in copy.unsaved_totals().items()}
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Total Budgeted Revenue", f"${totals['Budgeted Revenue']:,.2f}")
+            with col2:
+                st.metric("Total Budgeted Hours", f"{totals['Budgeted Hours']:,.0f}")
+            with col3:
+                st.metric("Total Budgeted Cost", f"${totals['Budgeted Cost']:,.2f}")
     
     # Save button
-    if st.button("💾 Save & Complete", type="primary"):
-        try:
-            # Remove all existing WBS for this job
-            c.execute("DELETE FROM wbs WHERE job_number = ?", (selected_job_number,))
-            # Insert new/edited WBS items
-            for _, row in edited_df.iterrows():
-                # Skip empty rows
-                if not row[["Service Line", "WBS Task", "WBS Subtask"]].isnull().all():
-                    c.execute('''
-                        INSERT INTO wbs (
-                            job_number, service_line, wbs_task, wbs_subtask, qty,
-                            unit_of_measure, contract_vs_co, fpa_type, fpa_subtype,
-                            budgeted_revenue, budgeted_hours, budgeted_cost
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        selected_job_number,
-                        row["Service Line"], row["WBS Task"], row["WBS Subtask"],
-                        row["QTY"] if pd.notnull(row["QTY"]) else 0,
-                        row["Unit of Measure"], row["Contract vs CO"], row["FPA Type"], row["FPA Subtype"],
-                        row["Budgeted Revenue"] if pd.notnull(row["Budgeted Revenue"]) else 0,
-                        row["Budgeted Hours"] if pd.notnull(row["Budgeted Hours"]) else 0,
-                        row["Budgeted Cost"] if pd.notnull(row["Budgeted Cost"]) else 0
-                    ))
-            st.success("✅ WBS saved successfully!")
-            st.rerun()
-        except sqlite3.OperationalError as e:
-            st.error(f"❌ Error saving WBS: {str(e)}")
-            st.info("Please check that the database schema is correct.")
-        except Exception as e:
-            st.error(f"❌ Unexpected error: {str(e)}")
-    
-    conn.close()
+    with profiling.section("save"):
+        if st.button("💾 Save & Complete", type="primary", disabled=closed):
+            try:
+                # Write only the lines that differ from the database
+                if not copy.unsaved:
+                    st.info("No changes to save.")
+                elif _save(conn, copy, "✅ WBS saved successfully!"):
+                    st.rerun()
+            except sqlite3.OperationalError as e:
+                st.error(f"❌ Error saving WBS: {str(e)}")
+                st.info("Please check that the database schema is correct.")
+            except Exception as e:
+                st.error(f"❌ Unexpected error: {str(e)}")
+
+        if copy.conflict:
+            st.error(f"⚠️ Your changes were not saved: {copy.conflict}. "
+                     "Reload the job to see the current lines, then make your edits again.")
+            if st.button("🔄 Reload Job", key="wbs_conflict_reload"):
+                del st.session_state["wbs_copy"]
+                st.rerun()
+        elif not closed:
+            _autosave(conn, copy)
+
+    # --- Revision History ---
+    with profiling.section("history"), st.expander("🕓 Revision history"):
+        revisions = cache.read(conn, history.revisions, selected_job_number)
+        if revisions.empty:
+            st.caption("Every save from this page is kept as a revision. This job has none yet.")
+        else:
+            st.dataframe(
+                revisions.assign(Saved=pd.to_datetime(revisions["Saved"], unit="s").dt.strftime("%Y-%m-%d %H:%M")),
+                hide_index=True,
+                use_container_width=True,
+                column_config={"Checkpoint": st.column_config.CheckboxColumn()},
+            )
+            numbers = revisions["Revision"].tolist()
+            col1, col2 = st.columns(2)
+            with col1:
+                old = st.selectbox("Compare revision", numbers, index=len(numbers) - 1,
+                                   key=f"wbs_history_old_{selected_job_number}")
+            with col2:
+                new = st.selectbox("With revision", numbers, index=0,
+                                   key=f"wbs_history_new_{selected_job_number}")
+            before = cache.read(conn, history.rebuild, selected_job_number, old)
+            after = cache.read(conn, history.rebuild, selected_job_number, new)
+
+            # Budget totals at each revision, with the change between them
+            col1, col2, col3 = st.columns(3)
+            for col, label, fmt in ((col1, "Budgeted Revenue", "${:,.2f}"), (col2, "Budgeted Hours", "{:,.0f}"),
+                                    (col3, "Budgeted Cost", "${:,.2f}")):
+                total_before, total_after = before[label].sum(), after[label].sum()
+                with col:
+                    st.metric(f"{label} (rev {new})", fmt.format(total_after),
+                              delta=fmt.format(total_after - total_before).replace("$-", "-$"))
+
+            changed_lines = history.compare(before, after)
+            if changed_lines.empty:
+                st.info(f"No line differs between revisions {old} and {new}.")
+            else:
+                st.dataframe(changed_lines, hide_index=True, use_container_width=True)
+
+    # --- Bulk Import ---
+    with profiling.section("import"), st.expander("📤 Import WBS lines from CSV or Excel"):
+        st.caption(
+            "Headers should match the table above. Lines are added to this job "
+            "unless the file has a Job Number column."
+        )
+        uploaded = st.file_uploader("WBS file", type=["csv", "xlsx", "xlsm"], key="wbs_import_file")
+        if uploaded is not None and st.button("Import Lines", key="wbs_import_button", disabled=closed):
+            # Large files import in the background; the page reloads the job
+            # when the task finishes.
+            tasks.submit(conn, "import", f"Import of {uploaded.name} into {selected_job_number}",
+                         path=tasks.save_upload(conn, uploaded), job_number=selected_job_number)
+        widgets.task_list(conn, "import")
@@ -1,30 +1,26 @@
 import streamlit as st
 import sqlite3
-import pandas as pd  # ✅ Put this at the top
+
+import archive
+import cache
+import database
+import jobs
+import profiling
+import tasks
+import widgets
 
 def show():
-    # --- Initialize Database ---
-    import os
-    db_path = os.path.join(os.getcwd(), "job_master.db")
-    conn = sqlite3.connect(db_path, isolation_level=None)
-    c = conn.cursor()
-
-    # --- Create Table if Not Exists ---
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS jobs (
-            job_number TEXT PRIMARY KEY,
-            branch_number TEXT,
-            job_name TEXT,
-            salesforce_id TEXT
-        )
-    ''')
+    with database.connection() as conn:
+        _render(conn)
+
 
+def _render(conn):
     # --- Streamlit Page Setup ---
     st.set_page_config(page_title="Step 1: Job Info", layout="centered")
     st.title("📁 Step 1: Enter Job Information")
 
     # --- Input Fields ---
-    with st.form("job_form"):
+    with profiling.section("job form"), st.form("job_form"):
         job_number = st.text_input("Job Number")
         branch_number = st.text_input("Branch Number")
         job_name = st.text_input("Job Name")
@@ -35,19 +31,48 @@ def show():
         if submitted:
             if job_number and branch_number and job_name:
                 try:
-                    c.execute("INSERT INTO jobs VALUES (?, ?, ?, ?)",
-                              (job_number, branch_number, job_name, salesforce_id))
+                    jobs.insert_job(conn, job_number, branch_number, job_name, salesforce_id)
                     st.success("✅ Job saved successfully.")
                 except sqlite3.IntegrityError:
-                    st.warning("⚠️ Job already exists.")
+                    st.warning("⚠️ Job already exists or was archived.")
             else:
                 st.error("Please fill in all required fields.")
 
     # --- Optional: View current saved jobs ---
-    if st.checkbox("Show saved jobs"):  # ✅ this should be inside the `show()` function
-        jobs = c.execute("SELECT * FROM jobs").fetchall()
-        if jobs:
-            df = pd.DataFrame(jobs, columns=["Job Number", "Branch Number", "Job Name", "Salesforce ID"])
-            st.dataframe(df.style.hide(axis="index"), use_container_width=True)
-        else:
-            st.info("No jobs saved yet.")
+    with profiling.section("saved jobs"):
+        if st.checkbox("Show saved jobs"):  # ✅ this should be inside the `show()` function
+            saved_jobs = cache.read(conn, jobs.all_jobs)
+            if saved_jobs:
+                # pandas is only needed here, so the form itself loads without it
+                import pandas as pd
+                df = pd.DataFrame(saved_jobs, columns=["Job Number", "Branch Number", "Job Name", "Salesforce ID"])
+                st.dataframe(df.style.hide(axis="index"), use_container_width=True)
+            else:
+                st.info("No jobs saved yet.")
+
+    # --- Job Status ---
+    st.subheader("🔒 Job Status")
+    with profiling.section("job status"):
+        status_job = widgets.job_picker(conn, "Job", key="status_job")
+        if status_job:
+            status = cache.read(conn, jobs.job_status, status_job)
+            col1, col2 = st.columns([1, 2])
+            with col1:
+                st.metric("Status", status.title())
+            with col2:
+                st.caption("Closed jobs cannot be edited and are moved to the archive when it next runs."
+                           if status == "open" else "Reopen the job to edit its WBS again.")
+                new_status = "closed" if status == "open" else "open"
+                if st.button("🔒 Close Job" if status == "open" else "🔓 Reopen Job", key="status_button"):
+                    jobs.set_status(conn, status_job, new_status)
+                    st.rerun()
+
+    # --- Archive ---
+    with profiling.section("archive"), st.expander("🗄 Archive closed jobs"):
+        closed = cache.read(conn, archive.closed_jobs)
+        st.caption(f"{len(closed):,} closed job(s) waiting. Archiving moves closed jobs and their WBS lines "
+                   "into a yearly archive file, keeping everyday pages fast. Archived jobs stay searchable "
+                   "in View Data with \"Include archived jobs\".")
+        if st.button("🗄 Archive Closed Jobs", key="archive_button", disabled=not closed):
+            tasks.submit(conn, "archive", f"Archive of {len(closed):,} closed job(s)")
+        widgets.task_list(conn, "archive", limit=1)
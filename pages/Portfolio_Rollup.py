@@ -0,0 +1,91 @@
+import time
+
+import streamlit as st
+
+import database
+import profiling
+import snapshot
+import tasks
+import widgets
+
+# Pivot columns with thousands of values (jobs) make an unreadable table.
+COLUMN_DIMENSIONS = [name for name in snapshot.DIMENSIONS if name != "job"]
+FILTER_DIMENSIONS = ["branch", "service_line", "contract_vs_co", "fpa_type", "fpa_subtype"]
+LINES = "Lines"
+
+def show():
+    with database.connection() as conn:
+        _render(conn)
+
+
+def _render(conn):
+    # --- Page Setup ---
+    st.set_page_config(page_title="Portfolio Rollup", layout="wide")
+    st.title("📈 Portfolio Rollup")
+    st.markdown("---")
+
+    # Totals come from the memory-mapped snapshot of every WBS line. The first
+    # visit builds it in the background; later visits reload only the jobs
+    # changed since.
+    with profiling.section("snapshot"):
+        if not snapshot.is_built(conn):
+            if not any(task["status"] in tasks.ACTIVE for task in tasks.recent(conn, "snapshot", 1)):
+                tasks.submit(conn, "snapshot", "Portfolio snapshot build")
+            st.info("Building the portfolio snapshot. This page fills in when it is ready.")
+            widgets.task_list(conn, "snapshot", limit=1)
+            return
+        snap = snapshot.current(conn)
+    if not len(snap):
+        st.info("No WBS data available yet. Add WBS data in the Create WBS tab.")
+        return
+
+    # --- Grouping ---
+    st.subheader("🧮 Group By")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        rows = st.multiselect("Rows", list(snapshot.DIMENSIONS), default=["branch"],
+                              format_func=snapshot.DIMENSIONS.get, key="rollup_rows")
+    with col2:
+        columns = st.selectbox("Columns", [None] + COLUMN_DIMENSIONS, key="rollup_columns",
+                               format_func=lambda name: "(none)" if name is None else snapshot.DIMENSIONS[name])
+    with col3:
+        measure = st.selectbox("Measure", list(snapshot.MEASURES.values()) + [LINES], key="rollup_measure")
+
+    # --- Filters ---
+    where = {}
+    with profiling.section("filters"), st.expander("Filters"):
+        filter_columns = st.columns(len(FILTER_DIMENSIONS))
+        for name, col in zip(FILTER_DIMENSIONS, filter_columns):
+            with col:
+                chosen = st.multiselect(snapshot.DIMENSIONS[name], snap.values(name), key=f"rollup_filter_{name}")
+            if chosen:
+                where[name] = chosen
+        st.caption("Leave a filter empty to include every value.")
+
+    # --- Rollup ---
+    by = rows + ([columns] if columns and columns not in rows else [])
+    with profiling.section("rollup"):
+        start = time.perf_counter()
+        result = snap.rollup(by, where)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    st.caption(f"{len(result):,} groups from {len(snap):,} WBS lines in {elapsed_ms:.1f} ms")
+
+    if result.empty:
+        st.info("No WBS lines match these filters.")
+        return
+
+    with profiling.section("table"):
+        row_labels = [snapshot.DIMENSIONS[name] for name in rows]
+        if columns and rows and columns not in rows:
+            table = result.pivot_table(index=row_labels, columns=snapshot.DIMENSIONS[columns],
+                                       values=measure, aggfunc="sum", fill_value=0)
+            st.dataframe(table, use_container_width=True)
+        else:
+            st.dataframe(result, hide_index=True, use_container_width=True)
+
+    # A chart is only readable for one row dimension
+    if len(rows) == 1 and not columns:
+        with profiling.section("chart"):
+            st.subheader(f"🏆 Top {snapshot.DIMENSIONS[rows[0]]} by {measure}")
+            top = result.nlargest(20, measure).set_index(row_labels[0])[measure]
+            st.bar_chart(top)
@@ -2,156 +2,175 @@ import streamlit as st
 import sqlite3
 import pandas as pd
 
+import archive
+import cache
+import database
+import export
+import jobs
+import profiling
+import reconcile
+import summary
+import tasks
+import wbs
+import widgets
+
 def show():
-    # --- Initialize Database ---
-    import os
-    db_path = os.path.join(os.getcwd(), "job_master.db")
-    conn = sqlite3.connect(db_path, isolation_level=None)
-    c = conn.cursor()
-
-    # --- Create Tables if Not Exists ---
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS jobs (
-            job_number TEXT PRIMARY KEY,
-            branch_number TEXT,
-            job_name TEXT,
-            salesforce_id TEXT
-        )
-    ''')
-    
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS wbs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            job_number TEXT,
-            service_line TEXT,
-            wbs_task TEXT,
-            wbs_subtask TEXT,
-            qty REAL,
-            unit_of_measure TEXT,
-            contract_vs_co TEXT,
-            fpa_type TEXT,
-            fpa_subtype TEXT,
-            budgeted_revenue REAL,
-            budgeted_hours REAL,
-            budgeted_cost REAL
-        )
-    ''')
+    with database.connection() as conn:
+        _render(conn)
+
 
+def _render(conn):
     # --- Page Setup ---
     st.set_page_config(page_title="View Data", layout="wide")
     st.title("📊 View Jobs & WBS Data")
     st.markdown("---")
 
-    # --- Get all jobs for dropdown ---
-    jobs = c.execute("SELECT job_number, job_name FROM jobs ORDER BY job_number").fetchall()
-    
-    if not jobs:
+    if not cache.read(conn, jobs.has_jobs):
         st.warning("⚠️ No jobs found. Please add jobs in the Job Info tab first.")
         return
 
-    # --- Create job selection dropdown ---
-    job_options = [f"{job[0]} - {job[1]}" for job in jobs]
-    selected_job_display = st.selectbox("Select a job to view:", job_options, index=0)
-    
-    # Extract job number from selected option
-    selected_job_number = selected_job_display.split(" - ")[0]
+    # --- Branch filter and search-backed job picker ---
+    with profiling.section("job picker"):
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            include_archived = st.toggle("Include archived jobs", key="view_archived")
+            branch_options = cache.read(conn, jobs.branches)
+            if include_archived:
+                branch_options = sorted(set(branch_options) | set(cache.read(conn, archive.branches)))
+            selected_branch = st.selectbox("Filter by Branch:", ["All"] + branch_options, key="view_branch")
+        with col2:
+            selected_job_number = widgets.job_picker(
+                conn, "Select a job to view:", key="view_job",
+                branch=None if selected_branch == "All" else selected_branch,
+                archived=include_archived,
+            )
+    if selected_job_number is None:
+        return
+
+    # An archived job is read from its archive file, attached for this run
+    archived = cache.read(conn, archive.archive_of, selected_job_number) if include_archived else None
+    schema = archive.attach(conn, archived[0]) if archived else None
 
     # --- Display Job Information ---
     st.subheader("📁 Job Information")
-    job_info = c.execute("SELECT * FROM jobs WHERE job_number = ?", (selected_job_number,)).fetchone()
+    with profiling.section("job info"):
+        job_info = cache.read(conn, archive.get_job if archived else jobs.get_job, selected_job_number)
+        if archived:
+            st.caption(f"🗄 Closed and archived {pd.to_datetime(archived[1], unit='s'):%Y-%m-%d} "
+                       f"to `{archived[0]}`; read-only.")
     
-    if job_info:
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric("Job Number", job_info[0])
-        with col2:
-            st.metric("Branch Number", job_info[1])
-        with col3:
-            st.metric("Job Name", job_info[2])
-        with col4:
-            st.metric("Salesforce ID", job_info[3] if job_info[3] else "N/A")
+        if job_info:
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Job Number", job_info[0])
+            with col2:
+                st.metric("Branch Number", job_info[1])
+            with col3:
+                st.metric("Job Name", job_info[2])
+            with col4:
+                st.metric("Salesforce ID", job_info[3] if job_info[3] else "N/A")
 
     # --- Display WBS Data for Selected Job ---
     st.subheader("🧱 WBS Data")
     
-    # Check if wbs table exists
+    # Counts and filter options come from the indexes; only the matching
+    # lines are loaded
     try:
-        # Get WBS data for the selected job
-        wbs_data = c.execute("""
-            SELECT service_line, wbs_task, wbs_subtask, qty, unit_of_measure, 
-                   contract_vs_co, fpa_type, fpa_subtype, budgeted_revenue, 
-                   budgeted_hours, budgeted_cost
-            FROM wbs 
-            WHERE job_number = ?
-            ORDER BY service_line, wbs_task, wbs_subtask
-        """, (selected_job_number,)).fetchall()
+        total_lines = cache.read(conn, wbs.count_job_wbs, selected_job_number, schema)
     except sqlite3.OperationalError as e:
-        if "no such table" in str(e).lower():
-            st.info("📝 No WBS table found. Please add WBS data in the Create WBS tab first.")
-            wbs_data = []
-        else:
-            st.error(f"Database error: {str(e)}")
-            wbs_data = []
+        st.error(f"Database error: {str(e)}")
+        total_lines = 0
     
-    if wbs_data:
-        # Create DataFrame for better display
-        df_wbs = pd.DataFrame(wbs_data, columns=[
-            "Service Line", "WBS Task", "WBS Subtask", "QTY", "Unit of Measure",
-            "Contract vs CO", "FPA Type", "FPA Subtype", "Budgeted Revenue", 
-            "Budgeted Hours", "Budgeted Cost"
-        ])
-        
-        # Display summary metrics
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Total WBS Items", len(wbs_data))
-        with col2:
-            unique_service_lines = df_wbs["Service Line"].nunique()
-            st.metric("Service Lines", unique_service_lines)
-        with col3:
-            unique_tasks = df_wbs["WBS Task"].nunique()
-            st.metric("WBS Tasks", unique_tasks)
+    if total_lines:
+        with profiling.section("WBS filters"):
+            service_lines = cache.read(conn, wbs.facet_values, selected_job_number, "service_line", schema=schema)
         
-        # Display the WBS data
-        st.dataframe(df_wbs, use_container_width=True)
+            # Display summary metrics
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Total WBS Items", total_lines)
+            with col2:
+                st.metric("Service Lines", len(service_lines))
+            with col3:
+                st.metric("WBS Tasks", len(cache.read(conn, wbs.facet_values, selected_job_number, "wbs_task", schema=schema)))
         
-        # --- Filtering Options ---
-        st.subheader("🔍 Filter WBS Data")
+            # --- Filtering Options ---
+            st.subheader("🔍 Filter WBS Data")
         
-        # Service Line Filter
-        service_lines = ["All"] + sorted(df_wbs["Service Line"].unique().tolist())
-        selected_service_line = st.selectbox("Filter by Service Line:", service_lines)
+            col1, col2 = st.columns(2)
+            with col1:
+                selected_service_line = st.selectbox("Filter by Service Line:", ["All"] + service_lines)
+            with col2:
+                # WBS tasks narrow to the chosen service line
+                wbs_tasks = cache.read(
+                    conn, wbs.facet_values, selected_job_number, "wbs_task",
+                    None if selected_service_line == "All" else selected_service_line, schema=schema,
+                )
+                selected_wbs_task = st.selectbox("Filter by WBS Task:", ["All"] + wbs_tasks)
         
-        # WBS Task Filter
-        if selected_service_line != "All":
-            filtered_df = df_wbs[df_wbs["Service Line"] == selected_service_line]
-            wbs_tasks = ["All"] + sorted(filtered_df["WBS Task"].unique().tolist())
-        else:
-            wbs_tasks = ["All"] + sorted(df_wbs["WBS Task"].unique().tolist())
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                contract_options = cache.read(conn, wbs.facet_values, selected_job_number, "contract_vs_co", schema=schema)
+                selected_contract = st.selectbox("Filter by Contract vs CO:", ["All"] + contract_options)
+            with col2:
+                fpa_types = cache.read(conn, wbs.facet_values, selected_job_number, "fpa_type", schema=schema)
+                selected_fpa_type = st.selectbox("Filter by FPA Type:", ["All"] + fpa_types)
+            with col3:
+                # Subtypes are listed within the chosen FPA type
+                fpa_subtypes = cache.read(
+                    conn, wbs.facet_values, selected_job_number, "fpa_subtype",
+                    None if selected_fpa_type == "All" else selected_fpa_type, schema=schema,
+                )
+                selected_fpa_subtype = st.selectbox(
+                    "Filter by FPA Subtype:", ["All"] + fpa_subtypes,
+                    disabled=selected_fpa_type == "All",
+                    help="Choose an FPA Type first.",
+                )
         
-        selected_wbs_task = st.selectbox("Filter by WBS Task:", wbs_tasks)
-        
-        # Apply filters
-        filtered_data = df_wbs.copy()
-        if selected_service_line != "All":
-            filtered_data = filtered_data[filtered_data["Service Line"] == selected_service_line]
-        if selected_wbs_task != "All":
-            filtered_data = filtered_data[filtered_data["WBS Task"] == selected_wbs_task]
+            selections = {
+                "service_line": selected_service_line,
+                "wbs_task": selected_wbs_task,
+                "contract_vs_co": selected_contract,
+                "fpa_type": selected_fpa_type,
+                "fpa_subtype": selected_fpa_subtype,
+            }
+            filters = {column: value for column, value in selections.items() if value != "All"}
+
+        with profiling.section("WBS grid"):
+            # Large jobs are shown a page at a time, in the same order
+            windowed = total_lines > wbs.WINDOW_LINES
+            if windowed:
+                cursor = widgets.page_cursor("view_page", (selected_job_number, tuple(filters.items())))
+                page, next_cursor = cache.read(conn, wbs.load_window, selected_job_number, filters, cursor,
+                                               wbs.PAGE_SIZE, "service_line", schema)
+                filtered_data = page[wbs.LABELS]
+            else:
+                filtered_data = cache.read(conn, wbs.load_filtered, selected_job_number, filters, schema)
         
-        if not filtered_data.empty:
-            st.subheader("📋 Filtered Results")
-            st.dataframe(filtered_data, use_container_width=True)
+            if not filtered_data.empty:
+                st.subheader("📋 Filtered Results" if filters else "📋 All WBS Lines")
+                st.dataframe(filtered_data, use_container_width=True)
+                if windowed:
+                    widgets.pager("view_page", next_cursor, len(filtered_data), wbs.PAGE_SIZE,
+                                  None if filters else total_lines)
             
-            # Export functionality
-            csv = filtered_data.to_csv(index=False)
-            st.download_button(
-                label="📥 Download Filtered Data as CSV",
-                data=csv,
-                file_name=f"wbs_data_{selected_job_number}_{selected_service_line}_{selected_wbs_task}.csv",
-                mime="text/csv"
-            )
-        else:
-            st.info("No data matches the selected filters.")
+                # Export functionality (streamed from SQLite when clicked)
+                job_filters = {
+                    "job_numbers": [selected_job_number],
+                    "service_lines": [filters["service_line"]] if "service_line" in filters else [],
+                    "wbs_tasks": [filters["wbs_task"]] if "wbs_task" in filters else [],
+                    "contract_vs_co": [filters["contract_vs_co"]] if "contract_vs_co" in filters else [],
+                    "fpa_types": [filters["fpa_type"]] if "fpa_type" in filters else [],
+                    "fpa_subtypes": [filters["fpa_subtype"]] if "fpa_subtype" in filters else [],
+                }
+                st.download_button(
+                    label="📥 Download Filtered Data as CSV",
+                    data=lambda: export.export_bytes("csv", archived=bool(archived), **job_filters),
+                    file_name=f"wbs_data_{selected_job_number}_{selected_service_line}_{selected_wbs_task}.csv",
+                    mime="text/csv"
+                )
+            else:
+                st.info("No data matches the selected filters.")
             
     else:
         st.info(f"📝 No WBS data found for job {selected_job_number}. Add WBS data in the Create WBS tab.")
@@ -159,43 +178,94 @@ def show():
     # --- Summary Statistics ---
     st.subheader("📈 Summary Statistics")
     
-    # Get all WBS data for summary
-    try:
-        all_wbs = c.execute("SELECT * FROM wbs").fetchall()
-    except sqlite3.OperationalError as e:
-        if "no such table" in str(e).lower():
-            st.info("📝 No WBS table found. Please add WBS data in the Create WBS tab first.")
-            all_wbs = []
-        else:
-            st.error(f"Database error: {str(e)}")
-            all_wbs = []
-    if all_wbs:
-        df_all_wbs = pd.DataFrame(all_wbs, columns=[
-            "ID", "Job Number", "Service Line", "WBS Task", "WBS Subtask", "QTY",
-            "Unit of Measure", "Contract vs CO", "FPA Type", "FPA Subtype",
-            "Budgeted Revenue", "Budgeted Hours", "Budgeted Cost"
-        ])
-        
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric("Total Jobs with WBS", df_all_wbs["Job Number"].nunique())
-        with col2:
-            st.metric("Total WBS Items", len(df_all_wbs))
-        with col3:
-            st.metric("Unique Service Lines", df_all_wbs["Service Line"].nunique())
-        with col4:
-            st.metric("Unique WBS Tasks", df_all_wbs["WBS Task"].nunique())
+    # Precomputed portfolio counts, kept current by triggers on wbs
+    stats = cache.read(conn, summary.read_summary)
+    if stats["lines"]:
+        with profiling.section("totals"):
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Total Jobs with WBS", stats["jobs"])
+            with col2:
+                st.metric("Total WBS Items", stats["lines"])
+            with col3:
+                st.metric("Unique Service Lines", stats["service_lines"])
+            with col4:
+                st.metric("Unique WBS Tasks", stats["wbs_tasks"])
         
-        # Top service lines
-        st.subheader("🏆 Top Service Lines")
-        service_line_counts = df_all_wbs["Service Line"].value_counts().head(5)
-        st.bar_chart(service_line_counts)
+        with profiling.section("summary charts"):
+            # Top service lines
+            st.subheader("🏆 Top Service Lines")
+            st.bar_chart(stats["top_service_lines"])
         
-        # Top WBS tasks
-        st.subheader("📋 Top WBS Tasks")
-        wbs_task_counts = df_all_wbs["WBS Task"].value_counts().head(5)
-        st.bar_chart(wbs_task_counts)
+            # Top WBS tasks
+            st.subheader("📋 Top WBS Tasks")
+            st.bar_chart(stats["top_wbs_tasks"])
     else:
         st.info("No WBS data available for summary statistics.")
 
-    conn.close()
+    # --- Budget Reconciliation ---
+    st.subheader("🧮 Budget Reconciliation")
+    with profiling.section("reconciliation"), st.expander("Check every job's budget"):
+        st.caption("Checks every job for Contract lines that differ from its first saved revision (the bid), "
+                   "cost above revenue, Labor lines without hours, lines without an FPA type and repeated "
+                   "task / subtask pairs. The check runs in the background.")
+        if st.button("🧮 Run Reconciliation", key="reconcile_button"):
+            tasks.submit(conn, "reconcile", "Reconciliation of all jobs")
+        widgets.task_list(conn, "reconcile", limit=1)
+
+        # Runs do not change the write generation cache.read keys on, so these
+        # small indexed reads go straight to the database.
+        latest = reconcile.latest_run(conn)
+        if latest:
+            st.caption(
+                f"Last run {pd.to_datetime(latest['created'], unit='s'):%Y-%m-%d %H:%M}: "
+                f"{latest['jobs']:,} jobs and {latest['lines']:,} lines in {latest['seconds']:.1f} s."
+                + (" WBS data has changed since; run again for current results."
+                   if latest["generation"] != database.data_generation(conn) else "")
+            )
+            st.dataframe(reconcile.check_counts(latest), hide_index=True, use_container_width=True)
+
+            job_found = reconcile.job_findings(conn, latest["id"], selected_job_number)
+            if job_found.empty:
+                st.success(f"No findings for job {selected_job_number}.")
+            else:
+                st.markdown(f"**Findings for job {selected_job_number}**")
+                st.dataframe(job_found, hide_index=True, use_container_width=True)
+
+            check = st.selectbox("Show findings for", list(reconcile.CHECKS),
+                                 format_func=reconcile.CHECKS.get, key="reconcile_check")
+            found = reconcile.findings(conn, latest["id"], check)
+            st.dataframe(found, hide_index=True, use_container_width=True)
+            if len(found) == reconcile.DEFAULT_LIMIT:
+                st.caption(f"Showing the first {reconcile.DEFAULT_LIMIT:,}; "
+                           f"`python reconcile.py --list {check} --limit N` prints more.")
+
+    # --- Portfolio Export ---
+    st.subheader("📤 Portfolio Export")
+    with profiling.section("portfolio export"), st.expander("Export WBS lines across all jobs"):
+        export_archived = st.checkbox("Include archived jobs", key="export_archived")
+        export_branch_options = cache.read(conn, jobs.branches)
+        if export_archived:
+            export_branch_options = sorted(set(export_branch_options) | set(cache.read(conn, archive.branches)))
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            export_branches = st.multiselect("Branch Number", export_branch_options)
+        with col2:
+            export_service_lines = st.multiselect("Service Line", cache.read(conn, summary.values, "service_line"))
+        with col3:
+            export_fpa_types = st.multiselect("FPA Type", cache.read(conn, summary.values, "fpa_type"))
+        export_format = st.radio("Format", ["CSV", "Parquet"], horizontal=True)
+        fmt = export_format.lower()
+        portfolio_filters = {
+            "branches": export_branches,
+            "service_lines": export_service_lines,
+            "fpa_types": export_fpa_types,
+        }
+        st.caption("Leave a filter empty to include every value. The export runs in the background; "
+                   "you can leave this page and come back for the file.")
+        if st.button(f"📤 Start {export_format} Export", key="portfolio_export_button"):
+            chosen = [", ".join(values) for values in portfolio_filters.values() if values]
+            label = f"{export_format} export of {' / '.join(chosen) or 'all WBS lines'}"
+            tasks.submit(conn, "export", label + (" with archived jobs" if export_archived else ""),
+                         format=fmt, filters={**portfolio_filters, "archived": export_archived})
+        widgets.task_list(conn, "export")
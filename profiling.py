@@ -0,0 +1,230 @@
+"""Opt-in timing of page sections and SQL statements.
+
+Nothing is recorded unless a page render is being profiled, which happens
+when the "Performance debug" toggle in the sidebar is on for a session, or for
+every session when PT_PERF_LOG names a log file. A profiled render records:
+
+- each SQL statement run through a pooled connection, with the time spent in
+  execute and in fetchone/fetchmany/fetchall (rows read by iterating the
+  cursor directly are not timed)
+- each ``with profiling.section(name):`` block in the page
+
+The results are shown in a collapsible panel and, with PT_PERF_LOG set,
+appended to that file as one JSON object per render. Summarize a log with:
+
+    python profiling.py perf.jsonl
+"""
+import argparse
+import collections
+import contextvars
+import json
+import os
+import re
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+LOG_PATH = os.environ.get("PT_PERF_LOG")
+
+_current = contextvars.ContextVar("profile", default=None)
+_log_lock = threading.Lock()
+
+
+class Profile:
+    """Timings collected during one page render."""
+
+    def __init__(self, page):
+        self.page = page
+        self.started = time.time()
+        self.total = 0.0
+        self.sections = []
+        self.queries = []
+
+    def add_query(self, sql):
+        query = {"sql": " ".join(sql.split()), "ms": 0.0, "rows": 0}
+        self.queries.append(query)
+        return query
+
+    def to_record(self):
+        return {
+            "ts": round(self.started, 3),
+            "page": self.page,
+            "total_ms": round(self.total * 1000, 2),
+            "query_ms": round(sum(q["ms"] for q in self.queries), 2),
+            "query_count": len(self.queries),
+            "sections": self.sections,
+            "queries": self.queries,
+        }
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor that charges execute and fetch time to the active profile."""
+
+    _query = None
+
+    def _timed(self, method, *args):
+        query = self._query
+        if query is None:
+            return method(*args)
+        start = time.perf_counter()
+        try:
+            result = method(*args)
+        finally:
+            query["ms"] = round(query["ms"] + (time.perf_counter() - start) * 1000, 3)
+        return result
+
+    def execute(self, sql, parameters=()):
+        profile = _current.get()
+        self._query = profile.add_query(sql) if profile else None
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        profile = _current.get()
+        self._query = profile.add_query(sql) if profile else None
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if self._query is not None and row is not None:
+            self._query["rows"] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        if self._query is not None:
+            self._query["rows"] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._query is not None:
+            self._query["rows"] += len(rows)
+        return rows
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """Connection whose shortcut execute methods go through ProfiledCursor."""
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+@contextmanager
+def section(name):
+    """Time the enclosed block as a named page section when profiling."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    queries_before = len(profile.queries)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        queries = profile.queries[queries_before:]
+        profile.sections.append({
+            "name": name,
+            "ms": round((time.perf_counter() - start) * 1000, 2),
+            "query_ms": round(sum(q["ms"] for q in queries), 2),
+            "query_count": len(queries),
+        })
+
+
+@contextmanager
+def page(name, enabled):
+    """Profile a page render; yields the Profile, or None when not enabled."""
+    if not (enabled or LOG_PATH):
+        yield None
+        return
+    profile = Profile(name)
+    token = _current.set(profile)
+    start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        profile.total = time.perf_counter() - start
+        _current.reset(token)
+        if LOG_PATH:
+            write_log(profile, LOG_PATH)
+
+
+def write_log(profile, path):
+    line = json.dumps(profile.to_record())
+    with _log_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+def show_panel(profile):
+    """Render a profile as a collapsible debug panel."""
+    import pandas as pd
+    import streamlit as st
+
+    record = profile.to_record()
+    with st.expander(f"⏱️ Performance: {record['total_ms']:.0f} ms, "
+                     f"{record['query_count']} queries in {record['query_ms']:.0f} ms"):
+        st.markdown("**Sections**")
+        st.dataframe(pd.DataFrame(record["sections"], columns=["name", "ms", "query_ms", "query_count"]),
+                     hide_index=True, use_container_width=True)
+        st.markdown("**SQL statements**")
+        st.dataframe(pd.DataFrame(record["queries"], columns=["sql", "ms", "rows"]),
+                     hide_index=True, use_container_width=True)
+
+
+def _statement_key(sql):
+    """Group statements that differ only in literals or IN-list length."""
+    return re.sub(r"\?(\s*,\s*\?)+", "?, ...", sql)
+
+
+def summarize(path, top=10):
+    """Print per-page and per-section latency percentiles and the costliest statements."""
+    pages, sections = collections.defaultdict(list), collections.defaultdict(list)
+    statements = collections.defaultdict(lambda: [0, 0.0])
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            pages[record["page"]].append(record["total_ms"])
+            for s in record["sections"]:
+                sections[(record["page"], s["name"])].append(s["ms"])
+            for q in record["queries"]:
+                stats = statements[_statement_key(q["sql"])]
+                stats[0] += 1
+                stats[1] += q["ms"]
+
+    def percentiles(values):
+        values = sorted(values)
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        return f"{len(values):>6} {statistics.median(values):>9.1f} {p95:>9.1f}"
+
+    print(f"{'page / section':<40} {'count':>6} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, values in pages.items():
+        print(f"{name:<40} {percentiles(values)}")
+        for (page_name, section_name), section_values in sections.items():
+            if page_name == name:
+                print(f"  {section_name:<38} {percentiles(section_values)}")
+    print(f"\nTop {top} statements by total time")
+    print(f"{'total ms':>10} {'count':>7}  sql")
+    ranked = sorted(statements.items(), key=lambda item: item[1][1], reverse=True)
+    for sql, (count, total_ms) in ranked[:top]:
+        print(f"{total_ms:>10.1f} {count:>7}  {sql[:100]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a PT_PERF_LOG performance log.")
+    parser.add_argument("log", help="JSON-lines file written with PT_PERF_LOG")
+    parser.add_argument("--top", type=int, default=10, help="statements to list (default: %(default)s)")
+    args = parser.parse_args()
+    summarize(args.log, args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""Query-plan regression check for the SQL the pages issue.
+
+Builds a large synthetic database, runs EXPLAIN QUERY PLAN on every statement
+in PAGE_QUERIES and fails if any of them full-scans a table or sorts through
+a temporary B-tree. Queries that list a whole table on purpose are marked
+``allow_scan`` but must still avoid temp sorts. Register new page queries in
+PAGE_QUERIES so they are covered.
+
+    python query_plans.py                       # exit status 1 on a regression
+    python query_plans.py --jobs 5000 --lines 40
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+import archive
+import database
+import export
+import history
+import jobs
+import reconcile
+import snapshot
+import summary
+import tasks
+import wbs
+import working_copy
+
+JOB = "J000001"
+WBS_VALUES = ("Coatings", "Task", "Subtask", 1.0, "Lot", "Contract", "Services", "Labor", 1.0, 1.0, 1.0)
+
+# (name, sql, params, allow_scan)
+PAGE_QUERIES = [
+    ("cache.generation", database.GENERATION_SQL, (), False),
+    ("jobs.exists", jobs.EXISTS_SQL, (), True),
+    ("jobs.first", jobs.FIRST_SQL, (50,), True),
+    ("jobs.search", jobs.SEARCH_SQL, (jobs.match_expression("j00 job"), 50), False),
+    ("jobs.search.branch", jobs.SEARCH_SQL, (jobs.match_expression("", "0001"), 50), False),
+    ("jobs.all", jobs.ALL_SQL, (), True),
+    ("jobs.get", jobs.GET_SQL, (JOB,), False),
+    # The HTTP API (api.py) pages with keysets, always fetching one row extra.
+    ("jobs.page", *jobs.page_query("J000100", 101), False),
+    ("jobs.page.branch", *jobs.page_query("J000100", 101, "0001"), False),
+    ("jobs.insert", jobs.INSERT_SQL, ("NEW", "0508", "New Job", ""), False),
+    ("wbs.job", wbs.JOB_SQL, (JOB,), False),
+    ("wbs.count", wbs.COUNT_SQL, (JOB,), False),
+    *((f"wbs.lookup.{table}", wbs.LOOKUP_SQL.format(table=table), (), True) for table in wbs.LOOKUPS.values()),
+    ("wbs.filtered.none", *wbs.filtered_query(JOB, {}), False),
+    ("wbs.filtered.task", *wbs.filtered_query(JOB, {"wbs_task": "Task 1"}), False),
+    ("wbs.filtered.line_task", *wbs.filtered_query(JOB, {"service_line": "Coatings", "wbs_task": "Task 1"}), False),
+    ("wbs.filtered.all", *wbs.filtered_query(JOB, {column: "x" for column in wbs.FACETS}), False),
+    *[
+        (f"wbs.facet.{column}{'.narrowed' if narrowed else ''}", wbs.facet_sql(column, narrowed),
+         (JOB, "x") if narrowed else (JOB,), False)
+        for column, parent in wbs.FACETS.items()
+        for narrowed in ([True] if column in wbs.REQUIRES_PARENT else [False, True] if parent else [False])
+    ],
+    ("wbs.page", *wbs.page_query(JOB, {}, 100, 101), False),
+    ("wbs.page.filtered", *wbs.page_query(JOB, {"service_line": "Coatings", "fpa_type": "Services"}, 100, 101), False),
+    ("wbs.totals", wbs.TOTALS_SQL, (JOB,), False),
+    ("wbs.window.id.first", *wbs.window_query(JOB, limit=501), False),
+    ("wbs.window.id", *wbs.window_query(JOB, {}, (100,), 501), False),
+    ("wbs.window.sorted.first", *wbs.window_query(JOB, {}, None, 501, "service_line"), False),
+    ("wbs.window.sorted", *wbs.window_query(JOB, {}, (1, "Task 3", "Subtask 3", 100), 501, "service_line"), False),
+    ("wbs.window.sorted.null", *wbs.window_query(JOB, {}, (None, None, "Subtask 3", 100), 501, "service_line"), False),
+    ("wbs.window.sorted.filtered", *wbs.window_query(JOB, {"contract_vs_co": "CO", "fpa_type": "Services"},
+                                                     (1, "Task 3", "Subtask 3", 100), 501, "service_line"), False),
+    ("wbs.insert", wbs.INSERT_SQL, (JOB,) + WBS_VALUES, False),
+    ("wbs.update", wbs.UPDATE_SQL, WBS_VALUES + (1, JOB), False),
+    ("wbs.delete", wbs.DELETE_SQL, (1, JOB), False),
+    ("wbs.versions", wbs.VERSIONS_SQL, (JOB, json.dumps([1, 2])), False),
+    ("summary.total", summary.TOTAL_SQL, (), False),
+    ("summary.distinct", summary.DISTINCT_SQL, ("service_line",), False),
+    ("summary.top", summary.TOP_SQL, ("wbs_task", 5), False),
+    ("summary.values", summary.VALUES_SQL, ("fpa_type",), False),
+    ("jobs.branches", jobs.BRANCHES_SQL, (), True),
+    # Portfolio exports read everything that matches, but must stream in
+    # index order rather than sort.
+    ("export.all", *export.export_query(), True),
+    ("export.job", *export.export_query(job_numbers=[JOB, "J000002"]), False),
+    ("export.branch", *export.export_query(branches=["0001", "0002"]), False),
+    ("export.filtered", *export.export_query(branches=["0001"], service_lines=["Coatings"], fpa_types=["Services"]), True),
+    ("export.job_filtered", *export.export_query(
+        job_numbers=[JOB], wbs_tasks=["Task 1"], contract_vs_co=["CO"], fpa_types=["Services"], fpa_subtypes=["Labor"],
+    ), False),
+    ("export.count", *export.count_query(branches=["0001"]), False),
+    # The rollup snapshot reads every line when it is first built and only
+    # the changed jobs' lines after that.
+    ("snapshot.rows", snapshot.ROWS_SQL, (), True),
+    ("snapshot.job_rows", snapshot.JOB_ROWS_SQL, (json.dumps([JOB, "J000002"]),), False),
+    ("snapshot.changed", snapshot.CHANGED_JOBS_SQL, (0,), False),
+    *((f"snapshot.lookup.{table}", snapshot.LOOKUP_NAMES_SQL.format(table=table), (), True)
+      for table in wbs.LOOKUPS.values()),
+    ("history.latest", history.LATEST_SQL, (JOB,), False),
+    ("history.since_checkpoint", history.SINCE_CHECKPOINT_SQL, (JOB, 1), False),
+    ("history.pending", history.PENDING_SQL, (JOB,), False),
+    ("history.checkpoint_rows", history.CHECKPOINT_ROWS_SQL, (1, JOB), False),
+    ("history.delta_rows", history.DELTA_ROWS_SQL, (1, JOB), False),
+    ("history.clear_pending", history.CLEAR_PENDING_SQL, (JOB,), False),
+    ("history.revisions", history.REVISIONS_SQL, (JOB,), False),
+    ("history.checkpoint_of", history.CHECKPOINT_OF_SQL, (JOB, 1), False),
+    ("history.rebuild", history.REBUILD_SQL, (JOB, 1, 25), False),
+    ("summary.bulk_unrevised", summary.BULK_UNREVISED_SQL, {"first_id": 1}, False),
+    # Reconciliation reads every line once, a job range per worker.
+    ("reconcile.job_lines", reconcile.JOB_LINES_SQL, (), True),
+    *((f"reconcile.lookup.{table}", reconcile.LOOKUP_ID_SQL.format(table=table), ("x",), False)
+      for table in ("contract_types", "fpa_subtypes")),
+    ("reconcile.lines", reconcile.LINES_SQL, (JOB, "J000100"), False),
+    ("reconcile.bid", reconcile.BID_SQL, {"contract": 1, "first": JOB, "last": "J000100"}, False),
+    ("reconcile.insert_run", reconcile.INSERT_RUN_SQL, (0.0, 0, 0, 0, 0.0, 1, "{}"), False),
+    ("reconcile.insert_finding", reconcile.INSERT_FINDING_SQL, (1, "bid_drift", JOB, None, ""), False),
+    ("reconcile.delete_old", reconcile.DELETE_OLD_FINDINGS_SQL, (2,), False),
+    ("reconcile.latest_run", reconcile.LATEST_RUN_SQL, (), False),
+    ("reconcile.check_findings", reconcile.CHECK_FINDINGS_SQL, (1, "bid_drift", 1000), False),
+    ("reconcile.job_findings", reconcile.JOB_FINDINGS_SQL, (1, JOB), False),
+    ("jobs.status", jobs.STATUS_SQL, (JOB,), False),
+    ("jobs.set_status", jobs.SET_STATUS_SQL, ("closed", JOB), False),
+    ("archive.closed", archive.CLOSED_SQL, (), False),
+    ("archive.stamps", archive.STAMPS_SQL, (json.dumps([JOB]),), False),
+    ("archive.still_closed", archive.STILL_CLOSED_SQL, (json.dumps([JOB]),), False),
+    ("archive.catalogue", archive.CATALOGUE_SQL, ("2026.db", 0.0, json.dumps([JOB])), False),
+    *((f"archive.delete.{i}", sql.format(schema=""), (json.dumps([JOB]),), False)
+      for i, sql in enumerate(archive.DELETE_SQL)),
+    ("archive.clear_unrevised", archive.CLEAR_UNREVISED_SQL, (json.dumps([JOB]),), False),
+    ("archive.archive_of", archive.ARCHIVE_OF_SQL, (JOB,), False),
+    ("archive.get", archive.GET_SQL, (JOB,), False),
+    ("archive.first", archive.FIRST_SQL, (50,), True),
+    ("archive.search", archive.SEARCH_SQL, (jobs.match_expression("j00 job"), 50), False),
+    ("archive.branches", archive.BRANCHES_SQL, (), True),
+    ("archive.files", archive.FILES_SQL, (), True),
+    ("working_copy.stamp", working_copy.STAMP_SQL, (JOB,), False),
+    ("tasks.insert", tasks.INSERT_SQL, ("export", "Export", "{}", 0.0), False),
+    ("tasks.get", tasks.GET_SQL, (1,), False),
+    ("tasks.start", tasks.START_SQL, (0.0, 1), False),
+    ("tasks.progress", tasks.PROGRESS_SQL, (0.5, "", 1), False),
+    ("tasks.finish", tasks.FINISH_SQL, ("done", 1.0, None, "{}", 0.0, 1), False),
+    ("tasks.recent", tasks.RECENT_SQL, ("export", 3), False),
+    ("tasks.queued", tasks.QUEUED_SQL, (), False),
+    ("tasks.queued_params", tasks.QUEUED_PARAMS_SQL, (), False),
+    ("tasks.interrupted", tasks.INTERRUPTED_SQL, (0.0,), False),
+    ("tasks.expired", tasks.EXPIRED_SQL, (0.0,), False),
+    ("tasks.delete", tasks.DELETE_SQL, (1,), False),
+]
+
+
+
+def archive_queries(schema):
+    """Page and archiving queries against an archive file attached as ``schema``."""
+    batch = (json.dumps([JOB]),)
+    return [
+        ("archive.wbs.count", wbs._COUNT_SQL.format(table=f"{schema}.wbs"), (JOB,), False),
+        ("archive.wbs.filtered.none", *wbs.filtered_query(JOB, {}, schema), False),
+        ("archive.wbs.filtered.all", *wbs.filtered_query(JOB, {column: "x" for column in wbs.FACETS}, schema), False),
+        ("archive.wbs.window", *wbs.window_query(JOB, {}, (1, "Task 3", "Subtask 3", 100), 501, "service_line",
+                                                 schema), False),
+        *[
+            (f"archive.wbs.facet.{column}", wbs.facet_sql(column, False, schema), (JOB,), False)
+            for column in wbs.FACETS if column not in wbs.REQUIRES_PARENT
+        ],
+        ("archive.export.job", *export.export_query(schema, job_numbers=[JOB]), False),
+        ("archive.export.branch", *export.export_query(schema, branches=["0001"]), False),
+        ("archive.export.count", *export.count_query(schema, branches=["0001"]), False),
+        *((f"archive.copy.{table}", archive.COPY_SQL.format(schema=schema, table=table, columns="job_number"),
+           batch, False) for table in ["jobs", "wbs", "wbs_revisions"]),
+        ("archive.copy.wbs_history", archive.COPY_HISTORY_SQL.format(
+            schema=schema, columns="line_id", selected="h.line_id"), batch, False),
+        *((f"archive.remove.{i}", sql.format(schema=f"{schema}."), batch, False)
+          for i, sql in enumerate(archive.DELETE_SQL)),
+    ]
+
+
+SERVICE_LINES = ["Coatings", "Materials", "Equipment", "Insulation", "Scaffolding", "Fireproofing"]
+
+
+def build_database(path, job_count, lines_per_job):
+    """Create a migrated database with job_count jobs of lines_per_job WBS lines each."""
+    conn = database.connect(path)
+    database.migrate(conn)
+    with database.transaction(conn):
+        conn.executemany(jobs.INSERT_SQL, (
+            (f"J{j:06d}", f"{j % 40:04d}", f"Job {j}", str(100000 + j)) for j in range(1, job_count + 1)
+        ))
+        conn.executemany(wbs.INSERT_SQL, (
+            (f"J{j:06d}", SERVICE_LINES[i % len(SERVICE_LINES)], f"Task {i % 25}", f"Subtask {i}",
+             float(i), "Lot", "CO" if i % 4 == 0 else "Contract", "Services", "Labor",
+             1000.0, 10.0, 600.0)
+            for j in range(1, job_count + 1) for i in range(lines_per_job)
+        ))
+    conn.execute("ANALYZE")
+    return conn
+
+
+# Lookup tables hold a handful of values, so SQLite may rightly scan one
+# rather than probe it. Writes through the wbs_lines view first collect the
+# rows the WHERE clause matched, then report "SCAN wbs_lines" over those.
+# json_each walks a list passed as a parameter.
+SMALL_TABLES = set(wbs.LOOKUPS.values()) | {"wbs_lines", "json_each"}
+
+
+def _is_full_scan(detail):
+    if not detail.startswith("SCAN ") or detail == "SCAN CONSTANT ROW":
+        return False
+    if detail.split()[1] in SMALL_TABLES:
+        return False
+    # The rows a co-routine (a subquery in FROM) produced, not a table
+    if re.fullmatch(r"SCAN \(subquery-\d+\)", detail):
+        return False
+    # An FTS5 MATCH is reported as a virtual table "scan" whose index string
+    # carries an M constraint; it is an index lookup, not a scan.
+    match = re.search(r"VIRTUAL TABLE INDEX \d+:(\S*)", detail)
+    return not (match and "M" in match.group(1))
+
+
+def plan_problems(conn, sql, params, allow_scan=False):
+    """Return (plan details, offending details) for one statement."""
+    details = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+    bad = [
+        detail for detail in details
+        if "TEMP B-TREE" in detail or (not allow_scan and _is_full_scan(detail))
+    ]
+    return details, bad
+
+
+def check(conn, queries=PAGE_QUERIES):
+    """Print each query's plan and return the names of the queries that regressed."""
+    failures = []
+    for name, sql, params, allow_scan in queries:
+        details, bad = plan_problems(conn, sql, params, allow_scan)
+        status = "FAIL" if bad else "ok"
+        print(f"[{status:>4}] {name}: {' | '.join(details) or '(no plan)'}")
+        if bad:
+            failures.append(name)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check page query plans against a large synthetic database.")
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=50, help="WBS lines per job")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = build_database(os.path.join(tmp, "plans.db"), args.jobs, args.lines)
+        failures = check(conn)
+        # Archive a tenth of the jobs to check the queries run against the file.
+        with database.transaction(conn):
+            conn.execute("UPDATE jobs SET status = 'closed' WHERE rowid % 10 = 0")
+        archive.archive_closed(conn)
+        with archive.attached(conn, f"{time.strftime('%Y')}.db") as schema:
+            queries = archive_queries(schema)
+            failures += check(conn, queries)
+        conn.close()
+
+    if failures:
+        print(f"❌ {len(failures)} queries scan or sort: {', '.join(failures)}")
+        return 1
+    print(f"✅ All {len(PAGE_QUERIES) + len(queries)} page queries use indexed access paths.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
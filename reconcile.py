@@ -0,0 +1,339 @@
+"""Portfolio-wide budget reconciliation of the WBS lines.
+
+Every job is checked in one pass over its lines, as whole-column pandas
+operations rather than a loop per job or line:
+
+- bid_drift: the job's Contract lines no longer total the revenue, hours and
+  cost they had at its first saved revision (history.py), which stands for
+  the estimator's bid. Budget added after the bid belongs on CO lines.
+- cost_over_revenue: the job's budgeted cost is more than its revenue.
+- zero_hour_labor: a Labor line with no budgeted hours.
+- missing_fpa_type: a line without an FPA type.
+- duplicate_key: lines of one job that share a WBS Task and WBS Subtask.
+
+The jobs are split into contiguous job-number ranges of about the same number
+of lines, and the ranges are checked in worker processes. Each worker reads
+its range with its own connection. The findings of a run replace those of the
+previous run in ``reconcile_findings``; View Data shows them, and can start a
+run as a background task.
+
+    python reconcile.py                          # check every job, save and summarize
+    python reconcile.py --workers 4
+    python reconcile.py --list duplicate_key     # the saved findings of one check
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import database
+
+# Check name -> label, in report order.
+CHECKS = {
+    "bid_drift": "Contract lines differ from the bid",
+    "cost_over_revenue": "Cost exceeds revenue",
+    "zero_hour_labor": "Labor line with no hours",
+    "missing_fpa_type": "Missing FPA type",
+    "duplicate_key": "Duplicate task / subtask",
+}
+MEASURES = {"revenue": "Revenue", "hours": "Hours", "cost": "Cost"}
+# Differences below this (a cent, or a hundredth of an hour) are rounding.
+TOLERANCE = 0.01
+MAX_WORKERS = 8
+RANGES_PER_WORKER = 4
+DEFAULT_LIMIT = 1000
+
+# In job-number order as SQL compares them, which is how LINES_SQL's BETWEEN
+# reads a range. Lines without a job belong to no range.
+JOB_LINES_SQL = """
+    SELECT job_number, count(*) FROM wbs
+    WHERE job_number IS NOT NULL
+    GROUP BY job_number
+    ORDER BY job_number
+"""
+LOOKUP_ID_SQL = "SELECT id FROM {table} WHERE name = ?"
+LINES_SQL = """
+    SELECT id, job_number, wbs_task, wbs_subtask, contract_vs_co_id, fpa_type_id, fpa_subtype_id,
+           budgeted_revenue, budgeted_hours, budgeted_cost
+    FROM wbs
+    WHERE job_number BETWEEN ? AND ?
+"""
+# Contract-line totals of each job's first revision.
+BID_SQL = """
+    SELECT r.job_number,
+           coalesce(sum(h.budgeted_revenue) FILTER (WHERE h.contract_vs_co_id = :contract), 0),
+           coalesce(sum(h.budgeted_hours) FILTER (WHERE h.contract_vs_co_id = :contract), 0),
+           coalesce(sum(h.budgeted_cost) FILTER (WHERE h.contract_vs_co_id = :contract), 0)
+    FROM wbs_revisions AS r
+    JOIN wbs_history AS h ON h.revision_id = r.id
+    WHERE r.job_number BETWEEN :first AND :last AND r.revision = 1
+    GROUP BY r.job_number
+"""
+INSERT_RUN_SQL = """
+    INSERT INTO reconcile_runs (created, generation, jobs, lines, seconds, workers, counts)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+INSERT_FINDING_SQL = """
+    INSERT INTO reconcile_findings (run_id, check_name, job_number, line_id, detail)
+    VALUES (?, ?, ?, ?, ?)
+"""
+DELETE_OLD_FINDINGS_SQL = "DELETE FROM reconcile_findings WHERE run_id < ?"
+LATEST_RUN_SQL = """
+    SELECT id, created, generation, jobs, lines, seconds, workers, counts
+    FROM reconcile_runs WHERE id = (SELECT max(id) FROM reconcile_runs)
+"""
+CHECK_FINDINGS_SQL = """
+    SELECT check_name, job_number, line_id, detail FROM reconcile_findings
+    WHERE run_id = ? AND check_name = ?
+    ORDER BY job_number LIMIT ?
+"""
+JOB_FINDINGS_SQL = """
+    SELECT check_name, job_number, line_id, detail FROM reconcile_findings
+    WHERE run_id = ? AND job_number = ?
+"""
+FINDING_COLUMNS = ["check", "job_number", "line_id", "detail"]
+
+
+def job_ranges(conn, parts):
+    """Split the jobs with WBS lines into up to ``parts`` (first, last) job-number ranges.
+
+    Ranges are contiguous in job-number order and hold about the same number
+    of lines each.
+    """
+    counts = conn.execute(JOB_LINES_SQL).fetchall()
+    if not counts:
+        return []
+    # Cut where the running line total crosses each multiple of total / parts.
+    cumulative = np.cumsum([lines for _, lines in counts])
+    targets = cumulative[-1] * np.arange(1, parts) / parts
+    ends = sorted(set(np.searchsorted(cumulative, targets).tolist()) | {len(counts) - 1})
+    starts = [0] + [end + 1 for end in ends[:-1]]
+    return [(counts[start][0], counts[end][0]) for start, end in zip(starts, ends) if start <= end]
+
+
+def _lookup_id(conn, table, name):
+    row = conn.execute(LOOKUP_ID_SQL.format(table=table), (name,)).fetchone()
+    return row[0] if row else None
+
+
+def read_range(conn, first, last):
+    """Return the lines and the bid totals of the jobs from first to last."""
+    lines = pd.DataFrame(
+        conn.execute(LINES_SQL, (first, last)).fetchall(),
+        columns=["line_id", "job_number", "task", "subtask", "contract", "fpa_type", "fpa_subtype", *MEASURES],
+    )
+    for name in MEASURES:
+        lines[name] = pd.to_numeric(lines[name], errors="coerce").fillna(0.0)
+    contract = _lookup_id(conn, "contract_types", "Contract")
+    bids = pd.DataFrame(
+        conn.execute(BID_SQL, {"contract": contract, "first": first, "last": last}).fetchall(),
+        columns=["job_number", *MEASURES],
+    ).set_index("job_number")
+    return lines, bids, contract, _lookup_id(conn, "fpa_subtypes", "Labor")
+
+
+def _money(value):
+    return f"-${-value:,.2f}" if value < 0 else f"${value:,.2f}"
+
+
+def _change(name, value):
+    amount = f"{abs(value):,.1f}" if name == "hours" else _money(abs(value))
+    return f"{MEASURES[name]} {'+' if value > 0 else '-'}{amount}"
+
+
+def _key(task, subtask):
+    return f"{'(blank)' if pd.isna(task) else task} / {'(blank)' if pd.isna(subtask) else subtask}"
+
+
+def _findings(check, rows, details, line_ids=None):
+    return pd.DataFrame({
+        "check": check,
+        "job_number": np.asarray(rows, dtype=object),
+        "line_id": pd.array(line_ids if line_ids is not None else [None] * len(rows), dtype="Int64"),
+        "detail": details,
+    })
+
+
+def check_lines(lines, bids, contract, labor):
+    """Run every check over a frame of lines; returns the findings (FINDING_COLUMNS)."""
+    found = []
+    totals = lines.groupby("job_number", sort=False)[list(MEASURES)].sum()
+
+    # Contract-line totals against the bid, for jobs that have one
+    if len(bids):
+        current = (lines[lines["contract"] == contract].groupby("job_number", sort=False)[list(MEASURES)].sum()
+                   .reindex(bids.index, fill_value=0.0))
+        drift = current - bids
+        drifted = drift[(drift.abs() >= TOLERANCE).any(axis=1)]
+        found.append(_findings("bid_drift", drifted.index, [
+            ", ".join(_change(name, row[name]) for name in MEASURES if abs(row[name]) >= TOLERANCE)
+            + " since the bid (revision 1)"
+            for row in drifted.to_dict("records")
+        ]))
+
+    over = totals[totals["cost"] - totals["revenue"] >= TOLERANCE]
+    found.append(_findings("cost_over_revenue", over.index, [
+        f"Cost {_money(cost)} exceeds revenue {_money(revenue)}"
+        for cost, revenue in zip(over["cost"], over["revenue"])
+    ]))
+
+    labor_lines = lines[(lines["fpa_subtype"] == labor) & (lines["hours"].abs() < TOLERANCE)]
+    found.append(_findings("zero_hour_labor", labor_lines["job_number"], [
+        _key(task, subtask) for task, subtask in zip(labor_lines["task"], labor_lines["subtask"])
+    ], labor_lines["line_id"]))
+
+    untyped = lines[lines["fpa_type"].isna()]
+    found.append(_findings("missing_fpa_type", untyped["job_number"], [
+        _key(task, subtask) for task, subtask in zip(untyped["task"], untyped["subtask"])
+    ], untyped["line_id"]))
+
+    keys = ["job_number", "task", "subtask"]
+    duplicates = lines[lines.duplicated(keys, keep=False)]
+    if len(duplicates):
+        copies = duplicates.groupby(keys, dropna=False, sort=False)["line_id"].transform("size")
+        found.append(_findings("duplicate_key", duplicates["job_number"], [
+            f"{_key(task, subtask)} appears {n} times"
+            for task, subtask, n in zip(duplicates["task"], duplicates["subtask"], copies)
+        ], duplicates["line_id"]))
+
+    found = [part for part in found if len(part)]
+    if not found:
+        return pd.DataFrame({column: [] for column in FINDING_COLUMNS})
+    return pd.concat(found, ignore_index=True)
+
+
+def check_range(db_path, first, last):
+    """Check the jobs from first to last; returns (findings, jobs, lines).
+
+    Runs in a worker process, on a connection of its own.
+    """
+    conn = database.connect(db_path)
+    try:
+        lines, bids, contract, labor = read_range(conn, first, last)
+    finally:
+        conn.close()
+    return check_lines(lines, bids, contract, labor), lines["job_number"].nunique(), len(lines)
+
+
+def run(conn, workers=None, progress=None):
+    """Check every job and save the findings as a new run; returns the run id.
+
+    ``workers`` processes check the job ranges (default: one per CPU, up to
+    MAX_WORKERS); with one worker the ranges are checked in this process.
+    ``progress(done, total)`` is called as each range finishes.
+    """
+    workers = workers or min(os.cpu_count() or 1, MAX_WORKERS)
+    db_path = conn.execute("PRAGMA database_list").fetchone()[2]
+    start = time.perf_counter()
+    generation = database.data_generation(conn)
+    ranges = job_ranges(conn, workers * RANGES_PER_WORKER if workers > 1 else 1)
+    results = []
+    if workers == 1:
+        for first, last in ranges:
+            results.append(check_range(db_path, first, last))
+            if progress:
+                progress(len(results), len(ranges))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(check_range, db_path, first, last) for first, last in ranges]
+            for future in as_completed(futures):
+                results.append(future.result())
+                if progress:
+                    progress(len(results), len(ranges))
+    findings = [r[0] for r in results if len(r[0])]
+    findings = pd.concat(findings, ignore_index=True) if findings else pd.DataFrame(columns=FINDING_COLUMNS)
+    jobs, lines = sum(r[1] for r in results), sum(r[2] for r in results)
+    return save(conn, findings, generation, jobs, lines, time.perf_counter() - start, workers)
+
+
+def save(conn, findings, generation, jobs, lines, seconds, workers):
+    """Store a run and its findings, dropping the previous run's findings."""
+    by_check = findings.groupby("check")["job_number"]
+    sizes = by_check.size()
+    counts = {name: [int(count), int(affected)]
+              for name, count, affected in zip(sizes.index, sizes, by_check.nunique())}
+    line_ids = findings["line_id"].astype(object).where(findings["line_id"].notna(), None)
+    with database.transaction(conn):
+        run_id = conn.execute(INSERT_RUN_SQL, (time.time(), generation, jobs, lines, seconds, workers,
+                                               json.dumps(counts))).lastrowid
+        conn.executemany(INSERT_FINDING_SQL, zip(
+            [run_id] * len(findings), findings["check"], findings["job_number"], line_ids, findings["detail"],
+        ))
+        conn.execute(DELETE_OLD_FINDINGS_SQL, (run_id,))
+    return run_id
+
+
+def latest_run(conn):
+    """The latest run as a dict with its counts decoded, or None if reconciliation has never run."""
+    cursor = conn.execute(LATEST_RUN_SQL)
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    run = dict(zip([column[0] for column in cursor.description], row))
+    run["counts"] = json.loads(run["counts"])
+    return run
+
+
+def check_counts(run):
+    """Findings and jobs affected per check of a run, every check listed."""
+    return pd.DataFrame(
+        [(label, *run["counts"].get(name, (0, 0))) for name, label in CHECKS.items()],
+        columns=["Check", "Findings", "Jobs"],
+    )
+
+
+def _frame(rows):
+    df = pd.DataFrame(rows, columns=["Check", "Job Number", "Line", "Detail"])
+    df["Check"] = df["Check"].map(CHECKS)
+    df["Line"] = df["Line"].astype("Int64")
+    return df
+
+
+def findings(conn, run_id, check, limit=DEFAULT_LIMIT):
+    """Up to ``limit`` findings of one check, in job-number order."""
+    return _frame(conn.execute(CHECK_FINDINGS_SQL, (run_id, check, limit)).fetchall())
+
+
+def job_findings(conn, run_id, job_number):
+    """Every finding of a run for one job."""
+    return _frame(conn.execute(JOB_FINDINGS_SQL, (run_id, job_number)).fetchall())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile the WBS budgets of every job.")
+    parser.add_argument("--workers", type=int, help=f"worker processes (default: CPUs, up to {MAX_WORKERS})")
+    parser.add_argument("--list", choices=CHECKS, metavar="CHECK",
+                        help=f"print the latest run's findings of one check ({', '.join(CHECKS)})")
+    parser.add_argument("--limit", type=int, default=50, help="findings to print with --list")
+    parser.add_argument("--progress", action="store_true",
+                        help="print 'done total' after each job range (for background tasks)")
+    parser.add_argument("--db", default=database.DB_PATH, help="database file (default: %(default)s)")
+    args = parser.parse_args()
+
+    conn = database.connect(args.db)
+    database.migrate(conn)
+    if args.list:
+        latest = latest_run(conn)
+        if latest is None:
+            print("❌ Reconciliation has not run yet.")
+            return 1
+        pd.set_option("display.width", 200)
+        print(findings(conn, latest["id"], args.list, args.limit).to_string(index=False))
+        return 0
+
+    report = (lambda done, total: print(done, total, flush=True)) if args.progress else None
+    run(conn, args.workers, report)
+    latest = latest_run(conn)
+    print(f"Checked {latest['jobs']:,} jobs and {latest['lines']:,} WBS lines in {latest['seconds']:.2f} s "
+          f"with {latest['workers']} worker(s) (run {latest['id']})")
+    print(check_counts(latest).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
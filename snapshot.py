@@ -0,0 +1,376 @@
+"""Memory-mapped columnar snapshot of the WBS lines for portfolio rollups.
+
+Every WBS line is stored as one entry in a set of NumPy column files next to
+the database (``job_master.db-snapshot/``): integer codes for the job, branch
+and lookup columns, and float64 for the quantities. The files are opened with
+``mmap_mode="r"``, so every session in a process shares one copy in the page
+cache, and a rollup is a vectorized ``np.bincount`` over the codes instead of
+pulling the whole ``wbs`` table out of SQLite.
+
+The snapshot follows the database incrementally. Triggers log each job whose
+lines or branch change in ``wbs_changed_jobs``, stamped with the write
+generation (see database.MIGRATIONS). A refresh reloads just those jobs into a
+small delta part and masks their old lines out of the base part. Once the
+delta outgrows a tenth of the base the two are merged into a new base.
+Parts are written to fresh directories and published by atomically replacing
+the CURRENT file, so a reader never sees a half-written snapshot.
+
+    python snapshot.py                # refresh, then print totals by branch
+    python snapshot.py --rebuild      # rebuild from scratch
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+import database
+import wbs
+
+# Dimension -> label. Lookup columns use their table ids as codes; jobs and
+# branches are coded by position in the snapshot's own dictionaries. Code 0
+# is NULL everywhere.
+DIMENSIONS = {
+    "branch": "Branch Number",
+    "job": "Job Number",
+    **{name: wbs.COLUMNS[name] for name in wbs.LOOKUPS},
+}
+MEASURES = {name: wbs.COLUMNS[name]
+            for name in ("budgeted_revenue", "budgeted_hours", "budgeted_cost", "qty")}
+# Column order of the snapshot files and of ROWS_SQL.
+CODE_COLUMNS = list(DIMENSIONS)
+VALUE_COLUMNS = list(MEASURES)
+
+ROWS_SQL = f"""
+    SELECT j.branch_number, w.job_number, {", ".join(f"w.{name}_id" for name in wbs.LOOKUPS)},
+           {", ".join(f"w.{name}" for name in VALUE_COLUMNS)}
+    FROM wbs AS w
+    LEFT JOIN jobs AS j ON j.job_number = w.job_number
+"""
+JOB_ROWS_SQL = ROWS_SQL + "WHERE w.job_number IN (SELECT value FROM json_each(?))"
+CHANGED_JOBS_SQL = "SELECT job_number FROM wbs_changed_jobs WHERE generation >= ?"
+LOOKUP_NAMES_SQL = "SELECT id, name FROM {table}"
+
+CHUNK_SIZE = 100_000
+# Group-bys with more possible groups than this count the groups that occur
+# (np.unique) instead of allocating a slot for every combination.
+DENSE_GROUP_LIMIT = 1_000_000
+COMPACT_FRACTION = 0.1
+# Superseded part directories are removed once they are this old; processes
+# that still have them mapped keep reading the old files until they refresh.
+STALE_PART_SECONDS = 60
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+def snapshot_dir(conn):
+    """The snapshot directory for the connection's database file."""
+    return conn.execute("PRAGMA database_list").fetchone()[2] + "-snapshot"
+
+
+# --- Building parts ---
+
+class _Dictionary:
+    """Values of one dimension by code; code 0 stands for NULL."""
+
+    def __init__(self, values=(None,)):
+        self.values = list(values)
+        self._codes = {value: code for code, value in enumerate(self.values)}
+
+    def encode(self, series):
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        mapping = np.array([self._code(value) for value in uniques] + [0], dtype=np.int32)
+        # factorize marks NULL as -1, which indexes the trailing 0.
+        return mapping[codes]
+
+    def _code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def _read_rows(conn, sql, params, dictionaries):
+    """Return {column: array} for the rows of sql, coding jobs and branches."""
+    parts = []
+    cursor = conn.execute(sql, params)
+    while rows := cursor.fetchmany(CHUNK_SIZE):
+        chunk = pd.DataFrame(rows, columns=CODE_COLUMNS + VALUE_COLUMNS)
+        part = {name: dictionaries[name].encode(chunk[name]) for name in ("job", "branch")}
+        for name in wbs.LOOKUPS:
+            part[name] = chunk[name].fillna(0).to_numpy(np.int32)
+        for name in VALUE_COLUMNS:
+            part[name] = pd.to_numeric(chunk[name], errors="coerce").fillna(0).to_numpy(np.float64)
+        parts.append(part)
+    return _concat(parts)
+
+
+def _empty():
+    return {name: np.empty(0, np.int32 if name in CODE_COLUMNS else np.float64)
+            for name in CODE_COLUMNS + VALUE_COLUMNS}
+
+
+def _concat(parts):
+    if not parts:
+        return _empty()
+    return {name: np.concatenate([part[name] for part in parts]) for name in CODE_COLUMNS + VALUE_COLUMNS}
+
+
+def _take(columns, mask):
+    return {name: np.asarray(values[mask]) for name, values in columns.items()}
+
+
+def _write_part(directory, kind, columns):
+    name = f"{kind}-{uuid.uuid4().hex[:12]}"
+    path = os.path.join(directory, name)
+    os.makedirs(path)
+    for column, values in columns.items():
+        np.save(os.path.join(path, f"{column}.npy"), values)
+    return name
+
+
+def _load_part(directory, name):
+    if name is None:
+        return _empty()
+    return {column: np.load(os.path.join(directory, name, f"{column}.npy"), mmap_mode="r")
+            for column in CODE_COLUMNS + VALUE_COLUMNS}
+
+
+def _read_meta(directory):
+    try:
+        with open(os.path.join(directory, "CURRENT"), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _publish(directory, meta):
+    tmp = os.path.join(directory, f"CURRENT.{uuid.uuid4().hex[:12]}")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(directory, "CURRENT"))
+    _remove_stale_parts(directory, {meta["base"], meta["delta"]})
+
+
+def _remove_stale_parts(directory, keep):
+    cutoff = time.time() - STALE_PART_SECONDS
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name in keep or not os.path.isdir(path) or os.path.getmtime(path) > cutoff:
+            continue
+        # Windows refuses to delete files another process has mapped; a
+        # later refresh tries again.
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _lookup_names(conn):
+    return {name: dict(conn.execute(LOOKUP_NAMES_SQL.format(table=table)).fetchall())
+            for name, table in wbs.LOOKUPS.items()}
+
+
+def refresh(conn, rebuild=False):
+    """Bring the snapshot up to the database's current write generation.
+
+    Reads everything in one read transaction, so the snapshot matches a single
+    committed state. Returns the new metadata.
+    """
+    directory = snapshot_dir(conn)
+    os.makedirs(directory, exist_ok=True)
+    meta = None if rebuild else _read_meta(directory)
+    with database.transaction(conn, "DEFERRED"):
+        generation = database.data_generation(conn)
+        if meta is not None and meta["generation"] == generation:
+            return meta
+        dictionaries = {
+            "job": _Dictionary(meta["jobs"] if meta else (None,)),
+            "branch": _Dictionary(meta["branches"] if meta else (None,)),
+        }
+        if meta is None:
+            base, base_name = _read_rows(conn, ROWS_SQL, (), dictionaries), None
+            delta, stale = _empty(), []
+        else:
+            # >= rather than >: a write committed after the previous refresh
+            # may have been stamped before that refresh's generation bump.
+            changed = [row[0] for row in conn.execute(CHANGED_JOBS_SQL, (meta["generation"],))]
+            changed_codes = dictionaries["job"].encode(pd.Series(changed, dtype=object))
+            old_delta = _load_part(directory, meta["delta"])
+            kept = _take(old_delta, ~np.isin(old_delta["job"], changed_codes))
+            fresh = _read_rows(conn, JOB_ROWS_SQL, (json.dumps(changed),), dictionaries)
+            base, base_name = _load_part(directory, meta["base"]), meta["base"]
+            delta = _concat([kept, fresh])
+            stale = sorted(set(meta["stale_jobs"]) | set(changed_codes.tolist()))
+        lookups = _lookup_names(conn)
+
+    if len(delta["job"]) > COMPACT_FRACTION * len(base["job"]) or base_name is None:
+        live = ~np.isin(base["job"], stale)
+        base = _concat([_take(base, live), delta])
+        base_name = _write_part(directory, "base", base)
+        delta, stale = _empty(), []
+    delta_name = _write_part(directory, "delta", delta) if len(delta["job"]) else None
+
+    meta = {
+        "generation": generation,
+        "built": time.time(),
+        "base": base_name,
+        "delta": delta_name,
+        "stale_jobs": stale,
+        "jobs": dictionaries["job"].values,
+        "branches": dictionaries["branch"].values,
+        "lookups": {name: {str(code): value for code, value in names.items()}
+                    for name, names in lookups.items()},
+    }
+    _publish(directory, meta)
+    return meta
+
+
+# --- Reading ---
+
+class Snapshot:
+    """A published snapshot: memory-mapped base and delta parts plus dictionaries."""
+
+    def __init__(self, directory, meta):
+        self.meta = meta
+        self.generation = meta["generation"]
+        self._parts = [_load_part(directory, meta["base"]), _load_part(directory, meta["delta"])]
+        # Lines of jobs the delta has replaced are masked out of the base.
+        self._live = [~np.isin(self._parts[0]["job"], meta["stale_jobs"]) if meta["stale_jobs"] else None, None]
+        self._names = {"job": meta["jobs"], "branch": meta["branches"]}
+        for name, names in meta["lookups"].items():
+            values = [None] * (max(map(int, names), default=0) + 1)
+            for code, value in names.items():
+                values[int(code)] = value
+            self._names[name] = values
+
+    def __len__(self):
+        return sum(int(live.sum()) if live is not None else len(part["job"])
+                   for part, live in zip(self._parts, self._live))
+
+    def values(self, dimension):
+        """Return the non-NULL values of a dimension, sorted."""
+        return sorted(value for value in self._names[dimension] if value is not None)
+
+    def _codes(self, dimension, values):
+        wanted = set(values)
+        return np.array([code for code, value in enumerate(self._names[dimension]) if value in wanted],
+                        dtype=np.int32)
+
+    def rollup(self, by, where=None):
+        """Total every measure, with a line count, for each combination of ``by``.
+
+        ``where`` maps dimensions to the values to keep. Returns a DataFrame
+        with one column per dimension (by label) followed by the measures and
+        "Lines", sorted by Budgeted Revenue.
+        """
+        by = list(by)
+        sizes = [len(self._names[name]) for name in by]
+        filters = {name: self._codes(name, values) for name, values in (where or {}).items()}
+
+        selected = []
+        for part, live in zip(self._parts, self._live):
+            mask = live
+            for name, codes in filters.items():
+                keep = np.isin(part[name], codes)
+                mask = keep if mask is None else mask & keep
+            # Mixed-radix group number: ((c0 * n1) + c1) * n2 + c2 ...
+            key = np.zeros(len(part["job"]), dtype=np.int64) if not by else part[by[0]].astype(np.int64)
+            for name, size in zip(by[1:], sizes[1:]):
+                key = key * size + part[name]
+            selected.append((part, mask, key if mask is None else key[mask]))
+
+        groups = int(np.prod(sizes, dtype=np.int64))
+        group_keys = None
+        if groups > DENSE_GROUP_LIMIT:
+            group_keys, inverse = np.unique(np.concatenate([key for _, _, key in selected]),
+                                            return_inverse=True)
+            groups = len(group_keys)
+            split = np.cumsum([len(key) for _, _, key in selected])[:-1]
+            selected = [(part, mask, key) for (part, mask, _), key in zip(selected, np.split(inverse, split))]
+
+        counts = np.zeros(groups, dtype=np.int64)
+        totals = {name: np.zeros(groups) for name in VALUE_COLUMNS}
+        for part, mask, key in selected:
+            counts += np.bincount(key, minlength=groups)
+            for name in VALUE_COLUMNS:
+                values = part[name] if mask is None else part[name][mask]
+                totals[name] += np.bincount(key, weights=values, minlength=groups)
+
+        present = np.flatnonzero(counts)
+        present_keys = present if group_keys is None else group_keys[present]
+        result = {}
+        for name, code in zip(by, np.unravel_index(present_keys, sizes) if by else ()):
+            result[DIMENSIONS[name]] = np.array(self._names[name], dtype=object)[code]
+        for name, label in MEASURES.items():
+            result[label] = totals[name][present]
+        result["Lines"] = counts[present]
+        return (pd.DataFrame(result)
+                .sort_values(MEASURES["budgeted_revenue"], ascending=False, ignore_index=True))
+
+
+def current(conn):
+    """Return the Snapshot for the database's current data, refreshing it if needed.
+
+    Snapshots are shared by every session in the process. Only one thread
+    refreshes at a time; another process may have published a newer snapshot
+    already, in which case it is simply loaded.
+    """
+    directory = snapshot_dir(conn)
+    generation = database.data_generation(conn)
+    snap = _loaded.get(directory)
+    if snap is not None and snap.generation == generation:
+        return snap
+    with _lock:
+        snap = _loaded.get(directory)
+        if snap is not None and snap.generation == generation:
+            return snap
+        try:
+            snap = _open(conn, directory, generation)
+        except FileNotFoundError:
+            # Another process's refresh removed a part after we read CURRENT.
+            snap = _open(conn, directory, generation)
+        _loaded[directory] = snap
+        return snap
+
+
+def _open(conn, directory, generation):
+    meta = _read_meta(directory)
+    if meta is None or meta["generation"] != generation:
+        meta = refresh(conn)
+    return Snapshot(directory, meta)
+
+
+def is_built(conn):
+    """Whether a snapshot has been published for this database."""
+    return os.path.exists(os.path.join(snapshot_dir(conn), "CURRENT"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the columnar WBS snapshot.")
+    parser.add_argument("--db", default=database.DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the snapshot from scratch")
+    args = parser.parse_args()
+
+    conn = database.connect(args.db)
+    database.migrate(conn)
+    start = time.perf_counter()
+    meta = refresh(conn, rebuild=args.rebuild)
+    elapsed = time.perf_counter() - start
+    snap = Snapshot(snapshot_dir(conn), meta)
+    print(f"✅ Snapshot of {len(snap):,} WBS lines at generation {snap.generation} "
+          f"({elapsed:.2f} s) in {snapshot_dir(conn)}")
+    start = time.perf_counter()
+    by_branch = snap.rollup(["branch"])
+    print(by_branch.head(10).to_string(index=False))
+    print(f"Rolled up by branch in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
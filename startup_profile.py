@@ -0,0 +1,97 @@
+"""Cold-start profile: import and first-render time for the app and each page.
+
+Every measurement runs in a fresh Python process against a sample database, so
+nothing is already imported or cached. Streamlit itself is imported before the
+clock starts; what is timed is what this app adds on top of it:
+
+- ``main``: the modules main.py imports before any page is chosen
+- ``import``: importing one page module, and the heavy libraries it pulled in
+- ``first render``: the page's first show(), including pool setup and migrations
+
+    python startup_profile.py                 # report
+    python startup_profile.py --budget-ms 400 # exit status 1 if a page is over
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+PAGES = ["Job_Info", "Create_WBS", "View_Data", "Portfolio_Rollup"]
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "openpyxl")
+DEFAULT_BUDGET_MS = 1000
+
+
+def profile_child(page):
+    """Time main's imports, the page import and its first render in this process."""
+    import streamlit  # noqa: F401
+    from streamlit.testing.v1 import AppTest
+
+    start = time.perf_counter()
+    importlib.import_module("cache")
+    main_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    importlib.import_module(f"pages.{page}")
+    import_ms = (time.perf_counter() - start) * 1000
+    heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    at = AppTest.from_string(f"from pages import {page}\n{page}.show()\n", default_timeout=120)
+    start = time.perf_counter()
+    at.run()
+    render_ms = (time.perf_counter() - start) * 1000
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    print(json.dumps({"main_ms": main_ms, "import_ms": import_ms,
+                      "render_ms": render_ms, "heavy": heavy}))
+
+
+def profile(page, workdir):
+    root = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run(
+        [sys.executable, os.path.join(root, "startup_profile.py"), "--child", page],
+        cwd=workdir, capture_output=True, text=True, check=True,
+        env={**os.environ, "PYTHONPATH": root},
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        profile_child(sys.argv[2])
+        return 0
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="import plus first render allowed per page (default: %(default)s)")
+    args = parser.parse_args()
+
+    import create_sample_db
+
+    over = []
+    with tempfile.TemporaryDirectory() as tmp:
+        with contextlib.redirect_stdout(io.StringIO()):
+            create_sample_db.create_sample_database(os.path.join(tmp, "job_master.db"))
+        print(f"{'page':<18} {'main ms':>8} {'import ms':>10} {'render ms':>10} {'total ms':>9}  heavy imports")
+        for page in PAGES:
+            r = profile(page, tmp)
+            total = r["import_ms"] + r["render_ms"]
+            flag = "  ❌ over budget" if total > args.budget_ms else ""
+            print(f"{page:<18} {r['main_ms']:>8.0f} {r['import_ms']:>10.0f} {r['render_ms']:>10.0f} "
+                  f"{total:>9.0f}  {', '.join(r['heavy']) or '-'}{flag}")
+            if flag:
+                over.append(page)
+    if over:
+        print(f"❌ {len(over)} page(s) over the {args.budget_ms:.0f} ms cold-start budget.")
+        return 1
+    print(f"✅ Every page starts within {args.budget_ms:.0f} ms.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""Portfolio summary statistics backed by the trigger-maintained wbs_summary table.
+
+The triggers created in database.MIGRATIONS keep ``wbs_summary`` current on
+every insert, update and delete of ``wbs``, so View Data reads a handful of
+rows instead of the whole table. If the counts are ever in doubt, rebuild them:
+
+    python summary.py            # check the summary against the live data
+    python summary.py --rebuild  # recompute it from scratch, then check
+"""
+import argparse
+import sys
+from contextlib import contextmanager
+
+import pandas as pd
+
+import database
+
+DIMENSIONS = {"job": "job_number", "service_line": "service_line",
+              "wbs_task": "wbs_task", "fpa_type": "fpa_type"}
+
+
+def _counts_sql(condition="true"):
+    """SELECT of (dimension, value, line_count) over the wbs rows matching condition."""
+    parts = [f"SELECT 'wbs' AS dimension, '' AS value, count(*) AS line_count FROM wbs_lines WHERE {condition}"]
+    parts += [
+        f"SELECT '{dimension}', {column}, count(*) FROM wbs_lines "
+        f"WHERE {condition} AND {column} IS NOT NULL GROUP BY {column}"
+        for dimension, column in DIMENSIONS.items()
+    ]
+    return "\nUNION ALL\n".join(parts)
+
+
+# What wbs_summary should contain, computed from the live wbs table.
+LIVE_COUNTS_SQL = _counts_sql()
+BULK_COUNTS_SQL = f"""
+    INSERT INTO wbs_summary (dimension, value, line_count)
+    {_counts_sql("id > :first_id")}
+    ON CONFLICT (dimension, value) DO UPDATE SET line_count = line_count + excluded.line_count
+"""
+# Log the jobs a bulk load touched for snapshot refreshes, as the per-row
+# wbs_changes_insert trigger would have.
+BULK_CHANGES_SQL = """
+    INSERT INTO wbs_changed_jobs (job_number, generation)
+    SELECT DISTINCT job_number, (SELECT generation FROM data_generation WHERE id = 1)
+    FROM wbs WHERE id > :first_id
+    ON CONFLICT (job_number) DO UPDATE SET generation = excluded.generation
+"""
+# Collect the lines of jobs with revision history for their next revision,
+# as the per-row wbs_unrevised_insert trigger would have.
+BULK_UNREVISED_SQL = """
+    INSERT OR IGNORE INTO wbs_unrevised (job_number, line_id)
+    SELECT job_number, id FROM wbs AS w
+    WHERE id > :first_id AND EXISTS (SELECT 1 FROM wbs_revisions AS r WHERE r.job_number = w.job_number)
+"""
+TOTAL_SQL = "SELECT line_count FROM wbs_summary WHERE dimension = 'wbs' AND value = ''"
+DISTINCT_SQL = "SELECT count(*) FROM wbs_summary WHERE dimension = ?"
+VALUES_SQL = "SELECT value FROM wbs_summary WHERE dimension = ? ORDER BY value"
+TOP_SQL = """
+    SELECT value, line_count FROM wbs_summary
+    WHERE dimension = ?
+    ORDER BY line_count DESC
+    LIMIT ?
+"""
+
+
+def _distinct(conn, dimension):
+    return conn.execute(DISTINCT_SQL, (dimension,)).fetchone()[0]
+
+
+def _top(conn, dimension, limit=5):
+    rows = conn.execute(TOP_SQL, (dimension, limit)).fetchall()
+    return pd.Series(dict(rows), name="count", dtype="int64")
+
+
+def values(conn, dimension):
+    """Return the distinct non-NULL values of a summarized wbs column, sorted."""
+    return [row[0] for row in conn.execute(VALUES_SQL, (dimension,))]
+
+
+def read_summary(conn):
+    """Return the portfolio statistics shown in View Data's summary section."""
+    total = conn.execute(TOTAL_SQL).fetchone()
+    return {
+        "lines": total[0] if total else 0,
+        "jobs": _distinct(conn, "job"),
+        "service_lines": _distinct(conn, "service_line"),
+        "wbs_tasks": _distinct(conn, "wbs_task"),
+        "top_service_lines": _top(conn, "service_line"),
+        "top_wbs_tasks": _top(conn, "wbs_task"),
+    }
+
+
+def check(conn):
+    """Return (dimension, value, stored, live) for every count that disagrees."""
+    return conn.execute(f"""
+        WITH live AS ({LIVE_COUNTS_SQL})
+        SELECT live.dimension, live.value, s.line_count, live.line_count
+        FROM live LEFT JOIN wbs_summary AS s
+            ON s.dimension = live.dimension AND s.value = live.value
+        WHERE s.line_count IS NOT live.line_count
+        UNION ALL
+        SELECT s.dimension, s.value, s.line_count, NULL
+        FROM wbs_summary AS s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM live
+            WHERE live.dimension = s.dimension AND live.value = s.value
+        )
+    """).fetchall()
+
+
+@contextmanager
+def bulk_insert(conn):
+    """Count rows inserted in the block in one grouped pass instead of per row.
+
+    Must be used inside a transaction, around inserts only. The wbs_bulk_load
+    row never outlives the transaction, so other writers are unaffected. The
+    write generation is bumped, and the jobs touched are logged for the
+    snapshot and revision history, once for the whole block.
+    """
+    first_id = conn.execute("SELECT coalesce(max(id), 0) FROM wbs").fetchone()[0]
+    conn.execute("INSERT INTO wbs_bulk_load (started) VALUES (?)", (first_id,))
+    yield
+    conn.execute(BULK_COUNTS_SQL, {"first_id": first_id})
+    conn.execute(BULK_CHANGES_SQL, {"first_id": first_id})
+    conn.execute(BULK_UNREVISED_SQL, {"first_id": first_id})
+    conn.execute("DELETE FROM wbs_bulk_load")
+    database.bump_generation(conn)
+
+
+def rebuild(conn):
+    """Recompute wbs_summary from the live wbs table in one transaction."""
+    with database.transaction(conn):
+        conn.execute("DELETE FROM wbs_summary")
+        conn.execute(f"INSERT INTO wbs_summary (dimension, value, line_count) {LIVE_COUNTS_SQL}")
+        database.bump_generation(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check or rebuild the WBS summary tables.")
+    parser.add_argument("--db", default=database.DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--rebuild", action="store_true", help="recompute the summaries before checking")
+    args = parser.parse_args()
+
+    conn = database.connect(args.db)
+    database.migrate(conn)
+    if args.rebuild:
+        rebuild(conn)
+        print("Rebuilt wbs_summary.")
+
+    mismatches = check(conn)
+    for dimension, value, stored, live in mismatches:
+        print(f"MISMATCH {dimension}={value!r}: stored {stored}, live {live}")
+    if mismatches:
+        print(f"❌ {len(mismatches)} summary counts disagree with wbs. Run with --rebuild.")
+        return 1
+    print("✅ wbs_summary matches the live data.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
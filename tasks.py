@@ -0,0 +1,296 @@
+"""Background tasks: exports, imports, snapshot builds, reconciliation and archiving off the page run.
+
+A page submits a task with ``tasks.submit(conn, kind, label, **params)`` and
+shows it with ``widgets.task_list(conn, kind)``, which polls the ``tasks``
+table until it finishes. The task row holds its parameters, progress and
+result, so a task keeps running when its session navigates away or closes,
+and any session can see how it went.
+
+Tasks run on a small thread pool shared by the Streamlit process. Each worker
+opens its own connection, so background work never takes one of the pooled
+connections pages read through, and at most MAX_WORKERS tasks run at once
+however many are submitted; the rest wait in the queue.
+
+Files a task reads or writes (uploads, exports, rejected-line reports) live in
+``<database>-tasks/``. An upload is removed once its task finishes or fails;
+tasks and their other files are removed after KEEP_SECONDS.
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+import database
+
+MAX_WORKERS = 2
+PROGRESS_INTERVAL = 0.5
+POLL_SECONDS = 2
+KEEP_SECONDS = 7 * 24 * 3600
+ACTIVE = ("queued", "running")
+
+INSERT_SQL = "INSERT INTO tasks (kind, label, params, created) VALUES (?, ?, ?, ?)"
+GET_SQL = "SELECT kind, params FROM tasks WHERE id = ?"
+START_SQL = "UPDATE tasks SET status = 'running', started = ? WHERE id = ? AND status = 'queued'"
+PROGRESS_SQL = "UPDATE tasks SET progress = ?, message = ? WHERE id = ?"
+FINISH_SQL = """
+    UPDATE tasks SET status = ?, progress = ?, message = ?, result = ?, finished = ?
+    WHERE id = ?
+"""
+RECENT_SQL = """
+    SELECT id, kind, label, status, progress, message, result, created, started, finished
+    FROM tasks WHERE kind = ? ORDER BY id DESC LIMIT ?
+"""
+QUEUED_SQL = "SELECT id FROM tasks WHERE status = 'queued' ORDER BY id"
+QUEUED_PARAMS_SQL = "SELECT params FROM tasks WHERE status = 'queued'"
+INTERRUPTED_SQL = """
+    UPDATE tasks SET status = 'failed', message = 'Interrupted by an app restart', finished = ?
+    WHERE status = 'running'
+"""
+EXPIRED_SQL = "SELECT id FROM tasks WHERE status IN ('done', 'failed') AND created < ?"
+DELETE_SQL = "DELETE FROM tasks WHERE id = ?"
+# Saved uploads are named <UPLOAD_PREFIX><hex>-<name> (save_upload).
+UPLOAD_PREFIX = "upload"
+
+# kind -> function(conn, task_id, params, progress) returning a JSON-able result
+KINDS = {}
+
+
+def task(kind):
+    """Register a function as the runner for one kind of task."""
+    def register(fn):
+        KINDS[kind] = fn
+        return fn
+    return register
+
+
+def task_dir(conn):
+    """The directory for task files, next to the connection's database file."""
+    return conn.execute("PRAGMA database_list").fetchone()[2] + "-tasks"
+
+
+def task_file(conn, task_id, name):
+    """Path of a file belonging to a task; the task id prefix keeps names unique."""
+    directory = task_dir(conn)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{task_id}-{os.path.basename(name)}")
+
+
+class Progress:
+    """Progress callback for a running task, written at most every PROGRESS_INTERVAL."""
+
+    def __init__(self, conn, task_id):
+        self._conn = conn
+        self._task_id = task_id
+        self._written = 0.0
+        self.total = None
+
+    def __call__(self, done, message=None):
+        now = time.monotonic()
+        if now - self._written < PROGRESS_INTERVAL:
+            return
+        self._written = now
+        fraction = min(done / self.total, 1.0) if self.total else None
+        self._conn.execute(PROGRESS_SQL, (fraction, message, self._task_id))
+
+
+class Runner:
+    """A bounded thread pool that runs submitted tasks for one database."""
+
+    def __init__(self, db_path, workers=MAX_WORKERS):
+        self.db_path = db_path
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="task")
+
+    def submit(self, task_id):
+        self._executor.submit(self._run, task_id)
+
+    def _run(self, task_id):
+        # Status goes through a connection of its own: a progress update made
+        # on the work connection mid-export would run inside the export's read
+        # and fail once another session commits.
+        status = database.connect(self.db_path)
+        conn = database.connect(self.db_path)
+        try:
+            kind, params = status.execute(GET_SQL, (task_id,)).fetchone()
+            if not status.execute(START_SQL, (time.time(), task_id)).rowcount:
+                return
+            params = json.loads(params)
+            try:
+                result = KINDS[kind](conn, task_id, params, Progress(status, task_id))
+            except Exception as e:
+                traceback.print_exc()
+                status.execute(FINISH_SQL, ("failed", None, str(e) or type(e).__name__, None, time.time(), task_id))
+            else:
+                status.execute(FINISH_SQL, ("done", 1.0, None, json.dumps(result), time.time(), task_id))
+            _remove_upload(params)
+        finally:
+            conn.close()
+            status.close()
+
+
+@st.cache_resource
+def get_runner(db_path=database.DB_PATH):
+    """Start the process-wide runner, picking up tasks left by the last run.
+
+    Queued tasks never started, so they are queued again. Running tasks may
+    have written part of their work; they are marked failed rather than
+    repeated. Finished tasks past KEEP_SECONDS are removed with their files,
+    and so are uploads no queued task is waiting to read.
+    """
+    runner = Runner(db_path)
+    with database.connection() as conn:
+        conn.execute(INTERRUPTED_SQL, (time.time(),))
+        _remove_expired(conn)
+        _remove_orphaned_uploads(conn)
+        for (task_id,) in conn.execute(QUEUED_SQL).fetchall():
+            runner.submit(task_id)
+    return runner
+
+
+def _remove_expired(conn):
+    directory = task_dir(conn)
+    for (task_id,) in conn.execute(EXPIRED_SQL, (time.time() - KEEP_SECONDS,)).fetchall():
+        conn.execute(DELETE_SQL, (task_id,))
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.startswith(f"{task_id}-"):
+                    os.remove(os.path.join(directory, name))
+
+
+def _remove_upload(params):
+    """Delete the saved upload a finished or failed task read, if it had one."""
+    path = params.get("path")
+    if path and os.path.basename(path).startswith(UPLOAD_PREFIX) and os.path.exists(path):
+        os.remove(path)
+
+
+def _remove_orphaned_uploads(conn):
+    """Delete saved uploads left by tasks that were interrupted or never submitted."""
+    directory = task_dir(conn)
+    if not os.path.isdir(directory):
+        return
+    waiting = {os.path.basename(json.loads(params).get("path") or "")
+               for (params,) in conn.execute(QUEUED_PARAMS_SQL).fetchall()}
+    for name in os.listdir(directory):
+        if name.startswith(UPLOAD_PREFIX) and name not in waiting:
+            os.remove(os.path.join(directory, name))
+
+
+def submit(conn, kind, label, **params):
+    """Queue a task and return its id; ``params`` must be JSON-serializable."""
+    if kind not in KINDS:
+        raise ValueError(f"Unknown task kind {kind!r}; expected one of {sorted(KINDS)}")
+    runner = get_runner()
+    task_id = conn.execute(INSERT_SQL, (kind, label, json.dumps(params), time.time())).lastrowid
+    runner.submit(task_id)
+    return task_id
+
+
+def save_upload(conn, uploaded):
+    """Copy a Streamlit upload into the task directory for a task to read later."""
+    # Start the runner first: its startup sweep would take this file for an
+    # orphan until the task reading it is queued.
+    get_runner()
+    path = task_file(conn, f"{UPLOAD_PREFIX}{uuid.uuid4().hex[:8]}", uploaded.name)
+    with open(path, "wb") as out:
+        shutil.copyfileobj(uploaded, out)
+    return path
+
+
+def recent(conn, kind, limit=5):
+    """The latest tasks of one kind as dicts, newest first, with results decoded."""
+    cursor = conn.execute(RECENT_SQL, (kind, limit))
+    names = [column[0] for column in cursor.description]
+    tasks = [dict(zip(names, row)) for row in cursor.fetchall()]
+    for item in tasks:
+        item["result"] = json.loads(item["result"]) if item["result"] else None
+    return tasks
+
+
+# --- Task kinds ---
+
+@task("export")
+def _export(conn, task_id, params, progress):
+    import export
+
+    fmt, filters = params["format"], params["filters"]
+    progress.total = export.count_rows(conn, **filters)
+    path = task_file(conn, task_id, f"wbs_export.{fmt}")
+    with open(path, "wb") as out:
+        rows = export.export(conn, out, fmt, progress=lambda done: progress(done, f"{done:,} lines written"),
+                             **filters)
+    return {"summary": f"{rows:,} WBS lines exported", "rows": rows,
+            "file": path, "mime": export.MIME_TYPES[fmt]}
+
+
+@task("import")
+def _import(conn, task_id, params, progress):
+    import wbs_import
+
+    # The runner removes the upload at params["path"] once this returns or raises.
+    path = params["path"]
+    progress.total = wbs_import.count_lines(path)
+    rejects_path = task_file(conn, task_id, "wbs_import_rejects.csv")
+    with open(rejects_path, "w", newline="", encoding="utf-8") as rejects:
+        result = wbs_import.import_file(
+            conn, path, params.get("job_number"), rejects,
+            progress=lambda done: progress(done, f"{done:,} lines read"),
+        )
+    if not result.rejected:
+        os.remove(rejects_path)
+    return {"summary": result.summary(), "inserted": result.inserted, "rejected": result.rejected,
+            "file": rejects_path if result.rejected else None, "mime": "text/csv"}
+
+
+@task("snapshot")
+def _snapshot(conn, task_id, params, progress):
+    import snapshot
+
+    progress(0, "Reading WBS lines")
+    meta = snapshot.refresh(conn, rebuild=params.get("rebuild", False))
+    lines = len(snapshot.Snapshot(snapshot.snapshot_dir(conn), meta))
+    return {"summary": f"{lines:,} WBS lines", "lines": lines}
+
+
+@task("reconcile")
+def _reconcile(conn, task_id, params, progress):
+    import reconcile
+
+    # The CLI starts the worker processes from a fresh interpreter instead of
+    # forking this multi-threaded one. It prints "done total" per job range.
+    process = subprocess.Popen(
+        [sys.executable, reconcile.__file__, "--db", conn.execute("PRAGMA database_list").fetchone()[2],
+         "--progress"],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    output = []
+    for line in process.stdout:
+        done, _, total = line.strip().partition(" ")
+        if done.isdigit() and total.isdigit():
+            progress.total = int(total)
+            progress(int(done), f"{done} of {total} job ranges checked")
+        else:
+            output.append(line.rstrip())
+    if process.wait():
+        raise RuntimeError(output[-1] if output else f"reconcile.py exited with status {process.returncode}")
+    latest = reconcile.latest_run(conn)
+    found = sum(count for count, _ in latest["counts"].values())
+    return {"summary": f"{found:,} findings in {latest['jobs']:,} jobs", "run": latest["id"]}
+
+
+@task("archive")
+def _archive(conn, task_id, params, progress):
+    import archive
+
+    def report(done, total):
+        progress.total = total
+        progress(done, f"{done:,} of {total:,} closed jobs archived")
+
+    moved = archive.archive_closed(conn, progress=report)
+    return {"summary": f"{moved:,} closed job(s) archived", "jobs": moved}
@@ -0,0 +1,441 @@
+"""Loading and saving WBS line items.
+
+The Create WBS page edits a job's lines in a data editor. Instead of deleting
+and re-inserting the whole job on save, the edited frame is compared with the
+rows that were loaded (keyed on ``wbs.id``) and only the difference is written,
+in one transaction with batched statements.
+
+Saves are optimistic: every line carries a version that each update
+increments, and a save first checks that the lines it changes or deletes still
+have the versions that were loaded. If another user got there first the whole
+save is rejected with a ConflictError rather than overwriting their work.
+A closed job's lines are read-only: saving to one raises JobClosedError.
+"""
+import json
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+import database
+import jobs
+
+# Database column -> label shown in the pages, in display order.
+COLUMNS = {
+    "service_line": "Service Line",
+    "wbs_task": "WBS Task",
+    "wbs_subtask": "WBS Subtask",
+    "qty": "QTY",
+    "unit_of_measure": "Unit of Measure",
+    "contract_vs_co": "Contract vs CO",
+    "fpa_type": "FPA Type",
+    "fpa_subtype": "FPA Subtype",
+    "budgeted_revenue": "Budgeted Revenue",
+    "budgeted_hours": "Budgeted Hours",
+    "budgeted_cost": "Budgeted Cost",
+}
+LABELS = list(COLUMNS.values())
+KEY_COLUMNS = ["Service Line", "WBS Task", "WBS Subtask"]
+NUMERIC_COLUMNS = ["QTY", "Budgeted Revenue", "Budgeted Hours", "Budgeted Cost"]
+TEXT_COLUMNS = [label for label in LABELS if label not in NUMERIC_COLUMNS]
+
+# Text columns stored as integer keys into a table of their distinct values.
+# wbs_lines (database.MIGRATIONS) shows them as text again and adds new
+# values to the lookup tables when lines are written through it.
+LOOKUPS = {
+    "service_line": "service_lines",
+    "unit_of_measure": "units_of_measure",
+    "contract_vs_co": "contract_types",
+    "fpa_type": "fpa_types",
+    "fpa_subtype": "fpa_subtypes",
+}
+CATEGORY_COLUMNS = [COLUMNS[name] for name in LOOKUPS]
+
+_FIELDS = ", ".join(COLUMNS)
+INSERT_SQL = f"""
+    INSERT INTO wbs_lines (job_number, {_FIELDS})
+    VALUES (?, {", ".join("?" for _ in COLUMNS)})
+"""
+UPDATE_SQL = f"""
+    UPDATE wbs_lines SET {", ".join(f"{name} = ?" for name in COLUMNS)}
+    WHERE id = ? AND job_number = ?
+"""
+DELETE_SQL = "DELETE FROM wbs WHERE id = ? AND job_number = ?"
+JOB_SQL = f"""
+    SELECT id, version, {_FIELDS}
+    FROM wbs_lines
+    WHERE job_number = ?
+    ORDER BY id
+"""
+_COUNT_SQL = "SELECT count(*) FROM {table} WHERE job_number = ?"
+COUNT_SQL = _COUNT_SQL.format(table="wbs")
+TOTAL_LABELS = ["Budgeted Revenue", "Budgeted Hours", "Budgeted Cost"]
+_TOTALS_SQL = """
+    SELECT count(*), total(budgeted_revenue), total(budgeted_hours), total(budgeted_cost)
+    FROM {table} WHERE job_number = ?
+"""
+TOTALS_SQL = _TOTALS_SQL.format(table="wbs")
+VERSIONS_SQL = """
+    SELECT id, version FROM wbs
+    WHERE job_number = ? AND id IN (SELECT value FROM json_each(?))
+"""
+LOOKUP_SQL = "SELECT name FROM {table} ORDER BY name"
+# Line columns an API client may select, in response order.
+FIELDS = ["id", "version", *COLUMNS]
+
+# Columns View Data filters on -> the column whose selection narrows its options.
+FACETS = {
+    "service_line": None,
+    "wbs_task": "service_line",
+    "contract_vs_co": None,
+    "fpa_type": None,
+    "fpa_subtype": "fpa_type",
+}
+# Facets whose values are only listed within a chosen parent value.
+REQUIRES_PARENT = {"fpa_subtype"}
+
+# Jobs with more lines than WINDOW_LINES are edited and viewed PAGE_SIZE lines
+# at a time (load_window) rather than loaded whole.
+WINDOW_LINES = 2000
+PAGE_SIZE = 500
+# Orders load_window pages in -> the sort keys ahead of id. Each is the order
+# of an index led by job_number: wbs_job, and wbs_job_sort (as filtered_query).
+ORDERS = {
+    "id": [],
+    "service_line": ["service_line_id", "wbs_task", "wbs_subtask"],
+}
+
+
+class ConflictError(Exception):
+    """A save touched lines that changed or were deleted since they were loaded."""
+
+    def __init__(self, changed, deleted):
+        self.changed = changed
+        self.deleted = deleted
+        parts = [f"{len(ids)} line(s) {what}" for ids, what in ((changed, "changed"), (deleted, "deleted")) if ids]
+        super().__init__(f"{' and '.join(parts)} by someone else since this job was loaded")
+
+    def __len__(self):
+        return len(self.changed) + len(self.deleted)
+
+
+class JobClosedError(Exception):
+    """A save targeted a closed job, whose lines are read-only."""
+
+    def __init__(self, job_number):
+        self.job_number = job_number
+        super().__init__(f"job {job_number} is closed; reopen it in Job Info to change its WBS")
+
+
+@dataclass
+class ChangeSet:
+    """Rows to write for one job: value tuples for inserts/updates, ids to delete.
+
+    ``versions`` maps each updated or deleted id to the version it was loaded
+    at; save_changes writes lines missing from it without checking them.
+    """
+
+    inserts: list = field(default_factory=list)
+    updates: list = field(default_factory=list)
+    deletes: list = field(default_factory=list)
+    versions: dict = field(default_factory=dict)
+
+    def __len__(self):
+        return len(self.inserts) + len(self.updates) + len(self.deletes)
+
+    def summary(self):
+        return (f"{len(self.inserts)} added, {len(self.updates)} updated, "
+                f"{len(self.deletes)} deleted")
+
+
+def _table(name, schema=None):
+    """A table name, qualified with an attached database's schema if given."""
+    return f"{schema}.{name}" if schema else name
+
+
+def lookup_values(conn, schema=None):
+    """Return {label: sorted values} for every lookup-backed column."""
+    return {
+        COLUMNS[name]: [row[0] for row in conn.execute(LOOKUP_SQL.format(table=_table(table, schema)))]
+        for name, table in LOOKUPS.items()
+    }
+
+
+def _categorize(conn, df, schema=None):
+    """Give the lookup-backed columns a categorical dtype over every known value.
+
+    The data editor shows categorical columns as dropdowns of their categories.
+    """
+    for label, values in lookup_values(conn, schema).items():
+        df[label] = pd.Categorical(df[label], categories=values)
+    return df
+
+
+def load_job_wbs(conn, job_number):
+    """Return the job's WBS lines: ``id`` and ``version``, then the display columns."""
+    rows = conn.execute(JOB_SQL, (job_number,)).fetchall()
+    return _categorize(conn, pd.DataFrame(rows, columns=["id", "version"] + LABELS))
+
+
+def count_job_wbs(conn, job_number, schema=None):
+    return conn.execute(_COUNT_SQL.format(table=_table("wbs", schema)), (job_number,)).fetchone()[0]
+
+
+def _key(column):
+    """The wbs column holding ``column``: its lookup key, or the column itself."""
+    return f"{column}_id" if column in LOOKUPS else column
+
+
+def _equals(column, indexed=True, schema=None):
+    """A ``column = ?`` condition taking the text value as its parameter.
+
+    Lookup-backed columns compare their key with the value's id, so the wbs
+    indexes on the keys still apply. ``indexed=False`` writes the key as
+    ``+key`` so SQLite filters rows with it instead of choosing its index.
+    """
+    key = _key(column) if indexed else f"+{_key(column)}"
+    if column in LOOKUPS:
+        return f"{key} = (SELECT id FROM {_table(LOOKUPS[column], schema)} WHERE name = ?)"
+    return f"{key} = ?"
+
+
+def facet_sql(column, narrowed=False, schema=None):
+    """DISTINCT values of a facet column for one job, optionally within its parent's value.
+
+    Every facet has an index led by job_number, so this reads index entries
+    rather than the job's rows. Lookup-backed facets read distinct keys and
+    then the names for just those keys.
+    """
+    parent = FACETS[column]
+    narrow = f" AND {_equals(parent, schema=schema)}" if narrowed and parent else ""
+    key = _key(column)
+    distinct = (f"SELECT DISTINCT {key} FROM {_table('wbs', schema)} "
+                f"WHERE job_number = ?{narrow} AND {key} IS NOT NULL")
+    if column not in LOOKUPS:
+        return distinct
+    return f"SELECT name FROM {_table(LOOKUPS[column], schema)} WHERE id IN ({distinct})"
+
+
+def facet_values(conn, job_number, column, parent_value=None, schema=None):
+    """Return the sorted values of ``column`` in the job, within ``parent_value`` if given."""
+    narrowed = parent_value is not None and FACETS[column] is not None
+    if column in REQUIRES_PARENT and not narrowed:
+        return []
+    params = (job_number, parent_value) if narrowed else (job_number,)
+    return sorted(row[0] for row in conn.execute(facet_sql(column, narrowed, schema), params))
+
+
+def filtered_query(job_number, filters, schema=None):
+    """Build the SELECT for a job's lines matching ``filters`` ({facet column: value}).
+
+    Rows come back grouped by service line from the wbs_job_sort index. Filters
+    it cannot use are written as ``+column`` so SQLite applies them to the rows
+    it reads instead of switching to another index and sorting. ``schema``
+    reads an attached archive (archive.py) instead of the main database.
+    """
+    indexed = {"service_line"}
+    if filters.get("service_line") is not None:
+        indexed.add("wbs_task")
+    clauses, params = ["job_number = ?"], [job_number]
+    for column, value in filters.items():
+        if column not in FACETS:
+            raise ValueError(f"Cannot filter WBS lines on {column!r}")
+        if value is None:
+            continue
+        clauses.append(_equals(column, indexed=column in indexed, schema=schema))
+        params.append(value)
+    sql = f"""
+        SELECT {_FIELDS}
+        FROM {_table("wbs_lines", schema)}
+        WHERE {" AND ".join(clauses)}
+        ORDER BY service_line_id, wbs_task, wbs_subtask
+    """
+    return sql, params
+
+
+def page_query(job_number, filters=None, after=0, limit=100, fields=FIELDS):
+    """Build the SELECT for up to ``limit`` of a job's lines with ids after ``after``.
+
+    Keyset pagination on wbs.id: the wbs_job index holds each job's ids in
+    order, so a page is a seek to ``after`` whatever its depth. Filters take
+    the same facet columns as filtered_query and are applied to the rows read
+    (as ``+column``) so the id order comes from that index without a sort.
+    """
+    unknown = set(fields) - set(FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown WBS field(s): {', '.join(sorted(unknown))}")
+    filter_clauses, filter_params = _filter_clauses(filters)
+    clauses, params = ["job_number = ?", "id > ?", *filter_clauses], [job_number, after, *filter_params]
+    sql = f"""
+        SELECT {", ".join(fields)}
+        FROM wbs_lines
+        WHERE {" AND ".join(clauses)}
+        ORDER BY id
+        LIMIT ?
+    """
+    return sql, params + [limit]
+
+
+def _filter_clauses(filters, schema=None):
+    """``+column = ?`` conditions and their parameters for facet ``filters``."""
+    clauses, params = [], []
+    for column, value in (filters or {}).items():
+        if column not in FACETS:
+            raise ValueError(f"Cannot filter WBS lines on {column!r}")
+        if value is None:
+            continue
+        clauses.append(_equals(column, indexed=False, schema=schema))
+        params.append(value)
+    return clauses, params
+
+
+def window_query(job_number, filters=None, cursor=None, limit=PAGE_SIZE, order="id", schema=None):
+    """Build the SELECT for a page of up to ``limit`` lines following ``cursor``.
+
+    Keyset pagination in one of ORDERS: ``cursor`` is the last line of the
+    previous page as its sort key values and id (see load_window), or None for
+    the first page. The sort keys may be NULL, which a row-value comparison
+    would skip, so the page after a cursor is read as one index seek per key:
+    same keys and a later id, then same leading keys and a later next key,
+    and so on. SQLite runs UNION ALL branches in order and stops at the outer
+    LIMIT, so no page reads more than ``limit`` rows per branch, however deep.
+    Filters are applied to the rows read, as in page_query.
+    """
+    keys = ORDERS[order] + ["id"]
+    select = f"SELECT id, version, {', '.join([*COLUMNS, *keys[:-1]])} FROM {_table('wbs_lines', schema)}"
+    filter_clauses, filter_params = _filter_clauses(filters, schema)
+    if cursor is None:
+        where = " AND ".join(["job_number = ?", *filter_clauses])
+        return f"{select} WHERE {where} ORDER BY {', '.join(keys)} LIMIT ?", [job_number, *filter_params, limit]
+    branches, params = [], []
+    for i in reversed(range(len(keys))):
+        clauses, branch_params = ["job_number = ?"], [job_number]
+        for key, value in zip(keys[:i], cursor):
+            clauses.append(f"{key} IS ?")
+            branch_params.append(value)
+        # NULLs sort first, so every non-NULL value follows a NULL one
+        if cursor[i] is None:
+            clauses.append(f"{keys[i]} IS NOT NULL")
+        else:
+            clauses.append(f"{keys[i]} > ?")
+            branch_params.append(cursor[i])
+        branches.append(f"{select} WHERE {' AND '.join(clauses + filter_clauses)} "
+                        f"ORDER BY {', '.join(keys)} LIMIT ?")
+        params += branch_params + filter_params + [limit]
+    if len(branches) == 1:
+        return branches[0], params
+    return " UNION ALL ".join(f"SELECT * FROM ({branch})" for branch in branches) + " LIMIT ?", params + [limit]
+
+
+def load_window(conn, job_number, filters=None, cursor=None, limit=PAGE_SIZE, order="id", schema=None):
+    """Return (lines, next cursor) for one page of the job's lines in ``order``.
+
+    ``lines`` has ``id`` and ``version``, then the display columns. The next
+    cursor is None on the last page.
+    """
+    sql, params = window_query(job_number, filters, cursor, limit + 1, order, schema)
+    rows = conn.execute(sql, params).fetchall()
+    width = 2 + len(COLUMNS)
+    next_cursor = (*rows[limit - 1][width:], rows[limit - 1][0]) if len(rows) > limit else None
+    frame = pd.DataFrame([row[:width] for row in rows[:limit]], columns=["id", "version"] + LABELS)
+    return _categorize(conn, frame, schema), next_cursor
+
+
+def job_totals(conn, job_number, schema=None):
+    """Return (line count, {label: total}) for the budget columns of the whole job.
+
+    Summed by SQLite over the job's rows, so none of them is loaded.
+    """
+    lines, *totals = conn.execute(_TOTALS_SQL.format(table=_table("wbs", schema)), (job_number,)).fetchone()
+    return lines, dict(zip(TOTAL_LABELS, totals))
+
+
+def load_filtered(conn, job_number, filters=None, schema=None):
+    """Return the job's lines matching ``filters`` for display, grouped by service line."""
+    sql, params = filtered_query(job_number, filters or {}, schema)
+    return _categorize(conn, pd.DataFrame(conn.execute(sql, params).fetchall(), columns=LABELS), schema)
+
+
+def _normalize(df):
+    """Coerce values the way they are stored: numbers default to 0, blanks to NULL."""
+    out = df[LABELS].copy()
+    for label in NUMERIC_COLUMNS:
+        out[label] = pd.to_numeric(out[label], errors="coerce").fillna(0).astype(float)
+    for label in TEXT_COLUMNS:
+        out[label] = out[label].astype(object).where(out[label].notna(), None)
+    return out
+
+
+def _value_rows(df):
+    return list(zip(*(df[label].tolist() for label in LABELS)))
+
+
+def diff_wbs(original, edited):
+    """Compute the ChangeSet that turns the loaded rows into the edited ones.
+
+    Rows without an id are new; loaded ids missing from the edit were deleted.
+    Rows whose Service Line, WBS Task and WBS Subtask are all empty are skipped,
+    and an existing row blanked out that way counts as a delete.
+    """
+    blank = edited[KEY_COLUMNS].isna().all(axis=1)
+    ids = pd.to_numeric(edited["id"], errors="coerce")
+
+    added = _normalize(edited[ids.isna() & ~blank])
+
+    kept = _normalize(edited[ids.notna() & ~blank])
+    kept.index = ids[ids.notna() & ~blank].astype("int64")
+    before = _normalize(original)
+    before.index = original["id"].astype("int64")
+
+    deleted = before.index.difference(kept.index)
+    common = kept.index.intersection(before.index)
+    after, before = kept.loc[common], before.loc[common]
+    same = (after == before) | (after.isna() & before.isna())
+    changed = after[~same.all(axis=1)]
+
+    loaded_versions = dict(zip(original["id"].astype("int64"), original["version"].astype("int64")))
+    return ChangeSet(
+        inserts=_value_rows(added),
+        updates=[row + (row_id,) for row, row_id in zip(_value_rows(changed), changed.index.tolist())],
+        deletes=deleted.tolist(),
+        versions={row_id: loaded_versions[row_id] for row_id in changed.index.tolist() + deleted.tolist()},
+    )
+
+
+def check_versions(conn, job_number, versions):
+    """Raise ConflictError if any line is no longer at the version in ``versions``."""
+    if not versions:
+        return
+    current = dict(conn.execute(VERSIONS_SQL, (job_number, json.dumps(list(versions)))).fetchall())
+    deleted = [row_id for row_id in versions if row_id not in current]
+    changed = [row_id for row_id, version in versions.items()
+               if row_id in current and current[row_id] != version]
+    if changed or deleted:
+        raise ConflictError(changed, deleted)
+
+
+@database.retry_when_busy
+def save_changes(conn, job_number, changes):
+    """Apply a ChangeSet in a single transaction and return the number of rows written.
+
+    Raises ConflictError, writing nothing, if a line being updated or deleted
+    has changed since it was loaded, and JobClosedError if the job is closed.
+    The checks and the writes share one IMMEDIATE transaction, so no other
+    writer can get in between them. The save is recorded as a new revision of
+    the job (history.record).
+    """
+    import history
+
+    if not changes:
+        return 0
+    with database.transaction(conn):
+        if jobs.job_status(conn, job_number) == "closed":
+            raise JobClosedError(job_number)
+        check_versions(conn, job_number, changes.versions)
+        if changes.deletes:
+            conn.executemany(DELETE_SQL, [(row_id, job_number) for row_id in changes.deletes])
+        if changes.updates:
+            conn.executemany(UPDATE_SQL, [row + (job_number,) for row in changes.updates])
+        if changes.inserts:
+            conn.executemany(INSERT_SQL, [(job_number,) + row for row in changes.inserts])
+        history.record(conn, job_number, changes.summary())
+    return len(changes)
@@ -0,0 +1,224 @@
+"""Bulk WBS import from CSV or Excel.
+
+Files are read a chunk at a time, so a million-line file never has to fit in
+memory. Each chunk is validated with vectorized pandas operations; valid lines
+go in with ``executemany`` in one transaction per chunk, and rejected lines are
+written to a report along with their source line number and the reason.
+
+Column headers may be the labels used in the app ("Budgeted Cost") or the
+database names ("budgeted_cost"), in any case. A "Job Number" column routes
+each line to its job; without one, every line goes to the job given with --job.
+
+    python wbs_import.py bids.csv --rejects rejected.csv
+    python wbs_import.py 20725_bid.xlsx --job 20725
+"""
+import argparse
+import sys
+from dataclasses import dataclass
+
+import pandas as pd
+
+import database
+import summary
+import wbs
+
+DEFAULT_CHUNK_SIZE = 50_000
+EXCEL_SUFFIXES = (".xlsx", ".xlsm")
+
+# Accepted spellings of Contract vs CO, lower-cased -> stored value.
+CONTRACT_VS_CO = {"contract": "Contract", "co": "CO", "change order": "CO"}
+
+# Database column -> label, for everything an import can set.
+FIELDS = {"job_number": "Job Number", **wbs.COLUMNS}
+_HEADER_LOOKUP = {
+    **{name: name for name in FIELDS},
+    **{label.lower(): name for name, label in FIELDS.items()},
+}
+_NUMERIC = [name for name, label in wbs.COLUMNS.items() if label in wbs.NUMERIC_COLUMNS]
+_TEXT = [name for name, label in wbs.COLUMNS.items() if label not in wbs.NUMERIC_COLUMNS]
+_KEYS = [name for name, label in wbs.COLUMNS.items() if label in wbs.KEY_COLUMNS]
+
+EXISTING_JOBS_SQL = "SELECT job_number, status FROM jobs WHERE job_number IN ({})"
+
+
+@dataclass
+class ImportResult:
+    inserted: int = 0
+    rejected: int = 0
+    chunks: int = 0
+
+    def summary(self):
+        return f"{self.inserted:,} lines imported, {self.rejected:,} rejected"
+
+
+def _excel_chunks(source, chunk_size):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = ["" if value is None else str(value) for value in next(rows, ())]
+        width = len(header)
+        batch = []
+        for row in rows:
+            values = ["" if value is None else str(value) for value in row[:width]]
+            batch.append(values + [""] * (width - len(values)))
+            if len(batch) == chunk_size:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+
+def read_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE, name=None):
+    """Yield the file as string-typed DataFrames of at most chunk_size rows."""
+    name = name or getattr(source, "name", None) or str(source)
+    if name.lower().endswith(EXCEL_SUFFIXES):
+        yield from _excel_chunks(source, chunk_size)
+    else:
+        yield from pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=chunk_size)
+
+
+def _normalize_headers(chunk, default_job):
+    chunk = chunk.rename(columns=lambda column: _HEADER_LOOKUP.get(str(column).strip().lower(), column))
+    if "job_number" not in chunk.columns:
+        if not default_job:
+            raise ValueError("The file has no Job Number column; choose the job to import into.")
+        chunk["job_number"] = default_job
+    if not any(name in chunk.columns for name in _KEYS):
+        raise ValueError(f"The file needs at least one of: {', '.join(wbs.KEY_COLUMNS)}.")
+    for name in FIELDS:
+        if name not in chunk.columns:
+            chunk[name] = ""
+    return chunk
+
+
+def _existing_jobs(conn, job_numbers, batch=900):
+    """Return {job number: status} for the given job numbers that exist."""
+    found = {}
+    for start in range(0, len(job_numbers), batch):
+        part = job_numbers[start:start + batch]
+        sql = EXISTING_JOBS_SQL.format(", ".join("?" for _ in part))
+        found.update(conn.execute(sql, part).fetchall())
+    return found
+
+
+def validate(conn, chunk, default_job=None):
+    """Coerce one chunk; return (valid rows as db columns, rejected rows with a reason)."""
+    chunk = _normalize_headers(chunk, default_job)
+    raw = chunk[list(FIELDS)].apply(lambda column: column.astype(str).str.strip())
+    reasons = pd.Series("", index=chunk.index)
+
+    def reject(mask, message):
+        nonlocal reasons
+        reasons = reasons.where(~mask, reasons + message + "; ")
+
+    out = pd.DataFrame(index=chunk.index)
+    out["job_number"] = raw["job_number"].where(raw["job_number"] != "", default_job or "")
+    known = _existing_jobs(conn, out["job_number"].drop_duplicates().tolist())
+    reject(out["job_number"] == "", "missing Job Number")
+    reject((out["job_number"] != "") & ~out["job_number"].isin(list(known)), "unknown Job Number")
+    # Closed jobs are read-only; the wbs_closed_insert trigger also stops a
+    # job closed after this check from taking the chunk.
+    reject(out["job_number"].map(known) == "closed", "job is closed")
+
+    for name in _TEXT:
+        out[name] = raw[name].where(raw[name] != "", None)
+    reject(out[_KEYS].isna().all(axis=1), f"missing {'/'.join(wbs.KEY_COLUMNS)}")
+
+    contract = raw["contract_vs_co"].str.lower().map(CONTRACT_VS_CO)
+    reject((raw["contract_vs_co"] != "") & contract.isna(), "Contract vs CO must be Contract or CO")
+    out["contract_vs_co"] = contract.where(contract.notna(), None)
+
+    for name in _NUMERIC:
+        # Accept spreadsheet formatting: "$1,250.00" and accounting "(500)".
+        text = raw[name].str.replace(r"[$,\s]", "", regex=True).str.replace(r"^\((.*)\)$", r"-\1", regex=True)
+        number = pd.to_numeric(text, errors="coerce")
+        reject((text != "") & number.isna(), f"{FIELDS[name]} is not a number")
+        out[name] = number.fillna(0.0).astype(float)
+
+    bad = reasons != ""
+    rejected = chunk.loc[bad, list(FIELDS)].rename(columns=FIELDS)
+    rejected.insert(0, "Reason", reasons[bad].str.rstrip("; "))
+    return out.loc[~bad, list(FIELDS)], rejected
+
+
+@database.retry_when_busy
+def insert_rows(conn, valid):
+    """Insert validated rows (db columns, job_number first) in one transaction."""
+    rows = list(zip(*(valid[name].tolist() for name in FIELDS)))
+    if rows:
+        with database.transaction(conn), summary.bulk_insert(conn):
+            conn.executemany(wbs.INSERT_SQL, rows)
+    return len(rows)
+
+
+def count_lines(path):
+    """Return the data lines in a CSV file, or None for Excel files.
+
+    Counts newlines, so quoted values spanning lines make it an overestimate;
+    it is only used to show import progress.
+    """
+    if path.lower().endswith(EXCEL_SUFFIXES):
+        return None
+    lines = 0
+    with open(path, "rb") as f:
+        while block := f.read(1 << 20):
+            lines += block.count(b"\n")
+    return max(lines - 1, 0)
+
+
+def import_file(conn, source, job_number=None, rejects=None, chunk_size=DEFAULT_CHUNK_SIZE, name=None,
+                progress=None):
+    """Import a CSV/XLSX path or file object; returns an ImportResult.
+
+    ``rejects`` is an optional text stream that receives the rejected-rows
+    report as CSV, with the source line number, reason and original values.
+    ``progress`` is called with the number of lines read after each chunk.
+    """
+    result = ImportResult()
+    line = 2  # first data line, after the header
+    for chunk in read_chunks(source, chunk_size, name):
+        chunk.index = range(line, line + len(chunk))
+        line += len(chunk)
+        valid, rejected = validate(conn, chunk, job_number)
+        result.inserted += insert_rows(conn, valid)
+        result.chunks += 1
+        if len(rejected) and rejects is not None:
+            rejected.to_csv(rejects, header=result.rejected == 0, index_label="Line")
+        result.rejected += len(rejected)
+        if progress is not None:
+            progress(line - 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import WBS lines from a CSV or Excel file.")
+    parser.add_argument("file", help="CSV or XLSX file")
+    parser.add_argument("--job", help="job number for files without a Job Number column")
+    parser.add_argument("--rejects", help="write rejected lines to this CSV file")
+    parser.add_argument("--db", default=database.DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    conn = database.connect(args.db)
+    database.migrate(conn)
+    rejects = open(args.rejects, "w", newline="", encoding="utf-8") if args.rejects else None
+    try:
+        result = import_file(conn, args.file, args.job, rejects, args.chunk_size)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    finally:
+        if rejects:
+            rejects.close()
+    print(f"✅ {result.summary()}")
+    if result.rejected and not args.rejects:
+        print("Run with --rejects FILE to see why lines were rejected.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
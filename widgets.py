@@ -0,0 +1,140 @@
+"""Streamlit widgets shared by the pages."""
+import os
+
+import streamlit as st
+
+import archive
+import cache
+import database
+import jobs
+
+JOB_PICKER_LIMIT = 50
+
+
+def job_picker(conn, label, key, branch=None, archived=False):
+    """Search box plus selectbox over matching jobs; returns the job number or None.
+
+    Only the top JOB_PICKER_LIMIT matches from the full-text index are sent to
+    the browser, optionally limited to one branch. Options are job numbers, so
+    job names containing " - " are displayed as-is and never parsed back.
+    ``archived`` adds matching archived jobs (archive.py) after the others.
+    """
+    search = st.text_input(
+        "Search jobs",
+        key=f"{key}_search",
+        placeholder="Job number, name, branch number or Salesforce ID",
+    )
+    matches = cache.read(conn, jobs.search_jobs, search, limit=JOB_PICKER_LIMIT, branch=branch)
+    if archived and len(matches) < JOB_PICKER_LIMIT:
+        matches += [
+            (job_number, f"{job_name} (archived)") for job_number, job_name in
+            cache.read(conn, archive.search_jobs, search, limit=JOB_PICKER_LIMIT - len(matches), branch=branch)
+        ]
+    if not matches:
+        st.info(f"No jobs match '{search}'." if search else "No jobs in this branch.")
+        return None
+    if len(matches) == JOB_PICKER_LIMIT:
+        st.caption(f"Showing the first {JOB_PICKER_LIMIT} matches. Refine the search to narrow the list.")
+
+    names = dict(matches)
+    return st.selectbox(
+        label,
+        list(names),
+        index=0,
+        format_func=lambda job_number: f"{job_number} - {names[job_number]}",
+        key=key,
+    )
+
+
+def page_cursor(key, scope):
+    """Return the keyset cursor the page shown under ``key`` starts after.
+
+    Keyset pages (wbs.load_window) are walked one step at a time, so the
+    session keeps the cursor of every page up to the current one and Previous
+    goes back to the last. A new ``scope`` (what is being paged: the job,
+    filters) starts again at the first page, cursor None.
+    """
+    state = st.session_state.get(key)
+    if state is None or state["scope"] != scope:
+        state = st.session_state[key] = {"scope": scope, "starts": [None]}
+    return state["starts"][-1]
+
+
+def pager(key, next_cursor, rows, page_size, total=None):
+    """Previous and Next buttons under a page from page_cursor(key); a click reruns the app.
+
+    ``rows`` is how many lines the current page holds and ``total`` the number
+    of lines being paged, if known.
+    """
+    starts = st.session_state[key]["starts"]
+    first = (len(starts) - 1) * page_size + 1
+    col1, col2, col3 = st.columns([1, 4, 1])
+    with col1:
+        if st.button("◀ Previous", key=f"{key}_previous", disabled=len(starts) == 1):
+            starts.pop()
+            st.rerun()
+    with col2:
+        st.caption(f"Page {len(starts):,}: lines {first:,}–{first + rows - 1:,}"
+                   + (f" of {total:,}" if total is not None else ""))
+    with col3:
+        if st.button("Next ▶", key=f"{key}_next", disabled=next_cursor is None):
+            starts.append(next_cursor)
+            st.rerun()
+
+
+def task_list(conn, kind, limit=3):
+    """Show the latest background tasks of one kind, polling while any is active.
+
+    While a task is queued or running only this fragment reruns, every
+    tasks.POLL_SECONDS. When the last one finishes the whole page reruns once,
+    so it shows what the task wrote.
+    """
+    import tasks
+
+    active = any(task["status"] in tasks.ACTIVE for task in tasks.recent(conn, kind, limit))
+    # The page's connection is only valid during this run; fragment reruns
+    # happen after the page has returned it, so they borrow their own.
+    page_conn = {"conn": conn}
+
+    @st.fragment(run_every=tasks.POLL_SECONDS if active else None)
+    def show():
+        if page_conn["conn"] is not None:
+            latest = tasks.recent(page_conn["conn"], kind, limit)
+        else:
+            with database.connection() as own:
+                latest = tasks.recent(own, kind, limit)
+        if active and not any(task["status"] in tasks.ACTIVE for task in latest):
+            st.rerun(scope="app")
+        for task in latest:
+            _task_status(task)
+
+    show()
+    page_conn["conn"] = None
+
+
+def _file_bytes(path):
+    """A file's contents, read when its download is requested and closed after."""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _task_status(task):
+    result = task["result"] or {}
+    label = f"**{task['label']}**"
+    if task["status"] == "queued":
+        st.info(f"⏳ {label}: waiting for a free worker")
+    elif task["status"] == "running":
+        st.progress(task["progress"] or 0.0, text=f"{label}: {task['message'] or 'running'}")
+    elif task["status"] == "failed":
+        st.error(f"❌ {label} failed: {task['message']}")
+    else:
+        st.success(f"✅ {label}: {result.get('summary', 'done')}")
+    path = result.get("file")
+    if path and os.path.exists(path):
+        st.download_button(
+            label=f"📥 Download {os.path.basename(path).split('-', 1)[1]}",
+            data=lambda: _file_bytes(path),
+            file_name=os.path.basename(path).split("-", 1)[1],
+            mime=result.get("mime"),
+            key=f"task_download_{task['id']}",
+        )
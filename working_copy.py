@@ -0,0 +1,212 @@
+"""A session's working copy of one job's WBS lines, edited on Create WBS.
+
+The page reads a job's lines once, into a WorkingCopy kept in the session, and
+shows them in the data editor. Each run hands the editor's pending edits to
+apply(), which looks only at the rows whose edits changed since the last run:
+their values are updated, the budget totals adjusted by the difference, and
+the row marked dirty if it no longer matches the database. A save writes just
+the dirty rows, and the page autosaves them once editing has paused for
+AUTOSAVE_SECONDS.
+
+The editor's edits are positions in the frame it was given (``shown``), which
+stays the same until the copy is saved or rebased. rebase() makes the copy's
+current lines the editor's new starting point, for when the editor's own
+state was dropped (its page was left) but the edits must not be.
+
+A job too large to load whole (wbs.WINDOW_LINES) is edited a page at a time:
+the copy then holds one page from wbs.load_window, and its totals are that
+page's. The job's totals are the saved ones (wbs.job_totals) plus
+unsaved_totals().
+"""
+import time
+
+import pandas as pd
+
+import wbs
+
+AUTOSAVE_SECONDS = 5
+TOTALS = wbs.TOTAL_LABELS
+# The job's change stamp (see snapshot.py): moves whenever its lines do.
+STAMP_SQL = "SELECT generation FROM wbs_changed_jobs WHERE job_number = ?"
+
+_POSITIONS = {label: i for i, label in enumerate(wbs.LABELS)}
+_TOTAL_POSITIONS = [_POSITIONS[label] for label in TOTALS]
+_KEY_POSITIONS = [_POSITIONS[label] for label in wbs.KEY_COLUMNS]
+
+
+def change_stamp(conn, job_number):
+    """Return the job's change stamp; a copy loaded at an older stamp is out of date."""
+    row = conn.execute(STAMP_SQL, (job_number,)).fetchone()
+    return row[0] if row else None
+
+
+def _normalize_value(label, value):
+    """One edited value as wbs._normalize stores it."""
+    if label in wbs.NUMERIC_COLUMNS:
+        number = pd.to_numeric(value, errors="coerce")
+        return 0.0 if pd.isna(number) else float(number)
+    return None if value is None or pd.isna(value) else value
+
+
+def _normalize_row(values):
+    """An added row ({label: value}, possibly partial) as a tuple of stored values."""
+    return tuple(_normalize_value(label, values.get(label)) for label in wbs.LABELS)
+
+
+def _is_blank(values):
+    return all(values[i] is None for i in _KEY_POSITIONS)
+
+
+class WorkingCopy:
+    """One job's lines as loaded, plus this session's unsaved edits to them."""
+
+    def __init__(self, job_number, loaded, key, stamp=None, cursor=None, next_cursor=None):
+        self.job_number = job_number
+        self.stamp = stamp
+        # For a page of a windowed job, the keyset cursors it and the next
+        # page start after (wbs.load_window).
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        # The lines as read from the database, by id: what dirty rows are
+        # compared with, and the versions a save is checked against.
+        rows = wbs._value_rows(wbs._normalize(loaded))
+        ids = loaded["id"].astype("int64").tolist()
+        self._loaded = dict(zip(ids, rows))
+        self._versions = dict(zip(ids, loaded["version"].astype("int64").tolist()))
+        # Lines deleted in an editor since rebased away, still to be deleted.
+        self._removed = set()
+        self.conflict = None
+        self.last_edit = None
+        self._show(loaded, key, rows)
+        self._loaded_totals = dict(self.totals)
+
+    def _show(self, frame, key, rows=None):
+        """Make ``frame`` what the editor starts from, under a new editor ``key``."""
+        self.shown = frame
+        self.key = key
+        self._ids = [None if pd.isna(row_id) else int(row_id) for row_id in frame["id"]]
+        self._rows = rows if rows is not None else wbs._value_rows(wbs._normalize(frame))
+        self._edited, self._deleted, self._added, self._added_rows = {}, set(), [], []
+        self.dirty = {pos for pos, (row_id, values) in enumerate(zip(self._ids, self._rows))
+                      if self._differs(row_id, values)}
+        self.totals = {label: sum(values[i] for values in self._rows)
+                       for label, i in zip(TOTALS, _TOTAL_POSITIONS)}
+
+    def __len__(self):
+        """The number of lines, counting added ones and not deleted ones."""
+        return len(self._ids) - len(self._deleted) + len(self._added_rows)
+
+    @property
+    def has_edits(self):
+        """Whether the editor holds edits relative to ``shown``."""
+        return bool(self._edited or self._deleted or self._added)
+
+    @property
+    def unsaved(self):
+        """How many lines a save would write."""
+        return (len(self.dirty) + len(self._removed)
+                + sum(not _is_blank(values) for values in self._added_rows))
+
+    def due(self, now=None):
+        """Whether the unsaved lines should be autosaved: editing paused for AUTOSAVE_SECONDS."""
+        now = time.monotonic() if now is None else now
+        return (self.unsaved > 0 and self.conflict is None and self.last_edit is not None
+                and now - self.last_edit >= AUTOSAVE_SECONDS)
+
+    def unsaved_totals(self):
+        """{label: how much the unsaved edits change the total}."""
+        return {label: self.totals[label] - self._loaded_totals[label] for label in TOTALS}
+
+    def _values(self, pos):
+        """A shown row's values with its edits applied."""
+        edits = self._edited.get(pos)
+        if not edits:
+            return self._rows[pos]
+        values = list(self._rows[pos])
+        for label, value in edits.items():
+            if label in _POSITIONS:
+                values[_POSITIONS[label]] = _normalize_value(label, value)
+        return tuple(values)
+
+    def _differs(self, row_id, values):
+        if row_id is None:
+            return not _is_blank(values)
+        return values != self._loaded.get(row_id)
+
+    def _count(self, values, sign):
+        for label, i in zip(TOTALS, _TOTAL_POSITIONS):
+            self.totals[label] += sign * values[i]
+
+    def apply(self, state):
+        """Bring the copy up to the editor's state; returns how many rows changed.
+
+        ``state`` is the data editor's session state: ``edited_rows`` (position
+        -> {label: value}), ``added_rows`` and ``deleted_rows``. Only rows whose
+        edits differ from the last call are recomputed.
+        """
+        edited = {int(pos): dict(edits) for pos, edits in state.get("edited_rows", {}).items()}
+        deleted = set(state.get("deleted_rows", []))
+        touched = {pos for pos in edited.keys() | self._edited.keys() if edited.get(pos) != self._edited.get(pos)}
+        touched |= deleted ^ self._deleted
+        for pos in touched:
+            if pos not in self._deleted:
+                self._count(self._values(pos), -1)
+        self._edited, self._deleted = edited, deleted
+        for pos in touched:
+            row_id = self._ids[pos]
+            if pos in deleted:
+                changed = row_id is not None
+            else:
+                values = self._values(pos)
+                self._count(values, 1)
+                changed = self._differs(row_id, values)
+            if changed:
+                self.dirty.add(pos)
+            else:
+                self.dirty.discard(pos)
+
+        added = [dict(values) for values in state.get("added_rows", [])]
+        if added != self._added:
+            for values in self._added_rows:
+                self._count(values, -1)
+            self._added, self._added_rows = added, [_normalize_row(values) for values in added]
+            for values in self._added_rows:
+                self._count(values, 1)
+            touched.add(None)
+
+        if touched:
+            self.last_edit = time.monotonic()
+        return len(touched)
+
+    def changes(self):
+        """The ChangeSet writing the unsaved lines, and nothing else."""
+        changes = wbs.ChangeSet()
+        for row_id in sorted(self._removed):
+            changes.deletes.append(row_id)
+            changes.versions[row_id] = self._versions[row_id]
+        for pos in sorted(self.dirty):
+            row_id = self._ids[pos]
+            values = None if pos in self._deleted else self._values(pos)
+            if values is None or _is_blank(values):
+                if row_id is not None:
+                    changes.deletes.append(row_id)
+                    changes.versions[row_id] = self._versions[row_id]
+            elif row_id is None:
+                changes.inserts.append(values)
+            else:
+                changes.updates.append(values + (row_id,))
+                changes.versions[row_id] = self._versions[row_id]
+        changes.inserts += [values for values in self._added_rows if not _is_blank(values)]
+        return changes
+
+    def rebase(self, key):
+        """Show the copy's current lines in a fresh editor (``key``), keeping them unsaved."""
+        live = [pos for pos in range(len(self._ids)) if pos not in self._deleted]
+        self._removed |= {self._ids[pos] for pos in self._deleted if self._ids[pos] is not None}
+        frame = pd.DataFrame([self._values(pos) for pos in live] + self._added_rows, columns=wbs.LABELS)
+        ids = [self._ids[pos] for pos in live] + [None] * len(self._added_rows)
+        frame.insert(0, "version", pd.array([self._versions.get(row_id) for row_id in ids], dtype="Int64"))
+        frame.insert(0, "id", pd.array(ids, dtype="Int64"))
+        for label in wbs.CATEGORY_COLUMNS:
+            frame[label] = pd.Categorical(frame[label], categories=self.shown[label].cat.categories)
+        self._show(frame, key)